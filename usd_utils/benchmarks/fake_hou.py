@@ -0,0 +1,348 @@
+import sys
+import types
+
+"""
+    Lightweight stand-in for the hou module, so the Houdini side of usd_utils can be timed outside a Houdini session.
+
+    It only models what the tools touch: a node tree with parms, inputs, flags and user data, node copies,
+    cooked geometry with string primitive attributes, InterruptableOperation and hou.ui. Nodes do not cook,
+    so the timings cover the python side of the tools (network building, metadata and texture handling),
+    not Houdini itself.
+
+    install() registers it as hou in sys.modules, it has to run before any usd_utils module using hou is imported.
+"""
+
+# Children created along with a node, by node type
+DEFAULT_CHILDREN = {"sopcreate": [("sopnet", "sopnet")],
+                    "sopnet": [("create", "geo")],
+                    "subnet": [("suboutput1", "suboutput")]}
+
+
+class Error(Exception):
+    pass
+
+
+class OperationInterrupted(Error):
+    pass
+
+
+class NodeType:
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+
+class Parm:
+    def __init__(self, node, name, value=""):
+        self._node = node
+        self._name = name
+        self._value = value
+
+    def name(self):
+        return self._name
+
+    def node(self):
+        return self._node
+
+    def set(self, value):
+        self._value = value
+
+    def eval(self):
+        return self._value
+
+    def evalAsString(self):
+        return str(self._value)
+
+    def pressButton(self):
+        self._node.pressed.append(self._name)
+
+
+class Attrib:
+    def __init__(self, name, values):
+        self._name = name
+        self._values = values
+
+    def name(self):
+        return self._name
+
+    def strings(self):
+        # String table of the attribute: its unique values in order of first use
+        return tuple(dict.fromkeys(self._values))
+
+
+class Geometry:
+    """
+    Cooked geometry holding primitive string attributes, e.g. {"shop_materialpath": [...]}.
+    """
+
+    def __init__(self, prim_string_attribs=None):
+        self.prim_string_attribs = prim_string_attribs or {}
+
+    def findPrimAttrib(self, name):
+        if name not in self.prim_string_attribs:
+            return None
+        return Attrib(name, self.prim_string_attribs[name])
+
+    def primStringAttribValues(self, name):
+        return tuple(self.prim_string_attribs[name])
+
+
+class Node:
+    def __init__(self, parent, type_name, name):
+        self._parent = parent
+        self._type = NodeType(type_name)
+        self._name = name
+        self._children = {}
+        self._inputs = []
+        self._parms = {}
+        self._user_data = {}
+        self._geometry = None
+        self._counters = {}
+        self.flags = {}
+        self.pressed = []
+
+        for child_name, child_type in DEFAULT_CHILDREN.get(type_name, []):
+            self._children[child_name] = Node(self, child_type, child_name)
+
+    # Hierarchy
+    def name(self):
+        return self._name
+
+    def path(self):
+        if self._parent is None:
+            return ""
+        return self._parent.path() + "/" + self._name
+
+    def type(self):
+        return self._type
+
+    def parent(self):
+        return self._parent
+
+    def children(self):
+        return tuple(self._children.values())
+
+    def allSubChildren(self):
+        nodes = []
+        for child in self._children.values():
+            nodes.append(child)
+            nodes.extend(child.allSubChildren())
+        return tuple(nodes)
+
+    def node(self, path):
+        current = self
+        for name in path.strip("/").split("/"):
+            if not name:
+                continue
+            current = current._children.get(name)
+            if current is None:
+                return None
+        return current
+
+    def _unique_name(self, name):
+        if name not in self._children:
+            return name
+        base = name.rstrip("0123456789")
+        number = self._counters.get(base, 1)
+        while base + str(number) in self._children:
+            number += 1
+        self._counters[base] = number
+        return base + str(number)
+
+    def createNode(self, type_name, node_name=None):
+        name = self._unique_name(node_name or type_name.split(":")[0] + "1")
+        node = Node(self, type_name, name)
+        self._children[name] = node
+        return node
+
+    def setName(self, name, unique_name=False):
+        siblings = self._parent._children
+        del siblings[self._name]
+        if unique_name:
+            name = self._parent._unique_name(name)
+        self._name = name
+        siblings[name] = self
+
+    def destroy(self):
+        for sibling in self._parent._children.values():
+            sibling._inputs = [None if node is self else node for node in sibling._inputs]
+        del self._parent._children[self._name]
+
+    # Wiring
+    def inputs(self):
+        return tuple(node for node in self._inputs if node is not None)
+
+    def input(self, index):
+        return self._inputs[index] if index < len(self._inputs) else None
+
+    def setInput(self, index, node):
+        while len(self._inputs) <= index:
+            self._inputs.append(None)
+        self._inputs[index] = node
+
+    def setNextInput(self, node):
+        self._inputs.append(node)
+
+    def inputIndex(self, input_name):
+        inputs = self._user_data.setdefault("__input_names", [])
+        if input_name not in inputs:
+            inputs.append(input_name)
+        return inputs.index(input_name)
+
+    def createOutputNode(self, type_name, node_name=None):
+        node = self._parent.createNode(type_name, node_name)
+        node.setInput(0, self)
+        return node
+
+    def createInputNode(self, index, type_name, node_name=None):
+        node = self._parent.createNode(type_name, node_name)
+        self.setInput(index, node)
+        return node
+
+    # Parameters and data
+    def parm(self, name):
+        parm = self._parms.get(name)
+        if parm is None:
+            parm = Parm(self, name)
+            self._parms[name] = parm
+        return parm
+
+    def parms(self):
+        return tuple(self._parms.values())
+
+    def userData(self, name):
+        return self._user_data.get(name)
+
+    def setUserData(self, name, value):
+        self._user_data[name] = value
+
+    def geometry(self):
+        return self._geometry
+
+    def setGeometry(self, geometry):
+        self._geometry = geometry
+
+    def stage(self):
+        # No USD stage is composed, LOP benchmarks only cover building the node networks
+        return None
+
+    def cook(self, force=False):
+        pass
+
+    # Flags and layout
+    def setDisplayFlag(self, on):
+        self.flags["display"] = on
+
+    def setMaterialFlag(self, on):
+        self.flags["material"] = on
+
+    def bypass(self, on):
+        self.flags["bypass"] = on
+
+    def hide(self, on):
+        self.flags["hidden"] = on
+
+    def layoutChildren(self, *args, **kwargs):
+        pass
+
+
+def _copy(node, parent, mapping):
+    copy = parent.createNode(node.type().name(), node.name())
+    copy._children = {}
+    mapping[node] = copy
+    for name, parm in node._parms.items():
+        copy._parms[name] = Parm(copy, name, parm._value)
+    copy._user_data = dict(node._user_data)
+    copy._geometry = node._geometry
+    copy.flags = dict(node.flags)
+    for child in node._children.values():
+        _copy(child, copy, mapping)
+    return copy
+
+
+class InterruptableOperation:
+    def __init__(self, operation_name, long_operation_name=None, open_interrupt_dialog=False):
+        self.operation_name = operation_name
+        self.long_operation_name = long_operation_name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def updateProgress(self, percentage=-1.0):
+        pass
+
+    def updateLongProgress(self, percentage=-1.0, long_op_status=None):
+        pass
+
+
+class _UI:
+    def __init__(self):
+        self.messages = []
+
+    def displayMessage(self, text, *args, **kwargs):
+        self.messages.append(text)
+        return 0
+
+
+class Hou(types.ModuleType):
+    """
+    The fake hou module. reset() starts from an empty scene with the /obj and /stage networks.
+    """
+
+    Error = Error
+    OperationInterrupted = OperationInterrupted
+    InterruptableOperation = InterruptableOperation
+    Geometry = Geometry
+
+    def __init__(self):
+        super(Hou, self).__init__("hou")
+        self.ui = _UI()
+        self.variables = {"HFS": "/opt/hfs"}
+        self.reset()
+
+    def reset(self):
+        self.root = Node(None, "root", "")
+        self.root.createNode("obj", "obj")
+        self.root.createNode("stage", "stage")
+        self.ui.messages = []
+
+    def node(self, path):
+        return self.root.node(path)
+
+    def pwd(self):
+        return self.root
+
+    def copyNodesTo(self, nodes, parent):
+        copies = []
+        for node in nodes:
+            mapping = {}
+            copy = _copy(node, parent, mapping)
+            # Connections inside the copied nodes follow the copies, the others are kept
+            for source, target in mapping.items():
+                target._inputs = [mapping.get(input_node, input_node) for input_node in source._inputs]
+            copies.append(copy)
+        return tuple(copies)
+
+    def isUIAvailable(self):
+        return False
+
+    def expandString(self, text):
+        for name, value in self.variables.items():
+            text = text.replace("$" + name, value)
+        return text
+
+
+def install():
+    """
+    Registers the fake module as hou and returns it, keeping an already installed one.
+    """
+    module = sys.modules.get("hou")
+    if not isinstance(module, Hou):
+        module = Hou()
+        sys.modules["hou"] = module
+    return module
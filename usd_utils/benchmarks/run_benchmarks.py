@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _benchmarks_dir)
+sys.path.insert(0, os.path.join(os.path.dirname(_benchmarks_dir), "src"))
+
+import fake_hou
+import synthetic
+
+hou = fake_hou.install()
+
+from usd_utils import (_catalog, _hou_extract_material_data, _hou_geo_import, _houdini_usd, _metadata_store,
+                       _record_log)
+
+"""
+    Benchmarks of the metadata I/O paths, ExtractMaterialsData and the LOP based importers on synthetic libraries,
+    with the fake hou module standing in for Houdini (see fake_hou), so they run in any python with usd-core.
+    The fake LOP nodes have no stage, so the importer benchmarks time building the networks, not composing
+    or saving the stage.
+
+    Results are saved as JSON, one file per run, outside the source tree (in <tmp>/usd_utils_benchmarks unless
+    --results-dir is given), and can be compared against a previous run to catch regressions:
+
+        python usd_utils/benchmarks/run_benchmarks.py --sizes 100 1000 10000
+        python usd_utils/benchmarks/run_benchmarks.py --compare <tmp>/usd_utils_benchmarks/<previous>.json
+"""
+
+SOURCE_TAG = "KB"
+DEFAULT_SIZES = (100, 1000, 10000)
+RESULTS_DIR = os.path.join(tempfile.gettempdir(), "usd_utils_benchmarks")
+
+
+class Library:
+    """
+    A synthetic library written to a temporary folder: metadata JSON, textures and an empty metadata to extract into.
+    """
+
+    def __init__(self, root, size):
+        self.root = root
+        self.size = size
+        self.library = synthetic.generate_library(root, size)
+        self.json_file = os.path.join(root, "assets_metadata.json")
+        synthetic.write_metadata(self.json_file, {SOURCE_TAG: self.library})
+
+    def empty_metadata(self, name):
+        """
+        Returns a fresh metadata file holding an empty library, removing its record log and catalog.
+        """
+        path = os.path.join(self.root, name)
+        for stale in (_record_log.log_path(path), os.path.splitext(path)[0] + ".db"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        if path.endswith(".db"):
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            synthetic.write_metadata(path, {SOURCE_TAG: {}})
+        _metadata_store.invalidate()
+        return path
+
+
+def reset_session():
+    """
+    Drops everything a Houdini session would keep between runs: nodes and cached files.
+    """
+    hou.reset()
+    _hou_geo_import.GeometryImport.texture_resolver.clear()
+    _metadata_store.invalidate()
+
+
+# Every benchmark prepares its inputs, untimed, and returns the operation to time
+
+def bench_load_json(library):
+    _metadata_store.invalidate()
+    return lambda: _metadata_store.load_metadata(library.json_file)
+
+
+def bench_load_json_cached(library):
+    _metadata_store.load_metadata(library.json_file)
+    return lambda: _metadata_store.load_metadata(library.json_file)
+
+
+def bench_list_assets(library):
+    metadata = _metadata_store.load_metadata(library.json_file)
+    return lambda: _metadata_store.list_assets(metadata, SOURCE_TAG)
+
+
+def bench_search_assets(library):
+    metadata = _metadata_store.load_metadata(library.json_file)
+    return lambda: list(_metadata_store.iter_assets(metadata, SOURCE_TAG, "asset000"))
+
+
+def bench_record_log_append(library):
+    path = library.empty_metadata("record_log.json")
+    record_log = _record_log.RecordLog(path)
+
+    def run():
+        for geometry_file, entry in library.library.items():
+            record_log.append(SOURCE_TAG, geometry_file, entry)
+    return run
+
+
+def bench_record_log_compact(library):
+    path = library.empty_metadata("record_log.json")
+    record_log = _record_log.RecordLog(path)
+    for geometry_file, entry in library.library.items():
+        record_log.append(SOURCE_TAG, geometry_file, entry)
+    return record_log.compact
+
+
+def bench_catalog_import(library):
+    path = library.empty_metadata("catalog_import.db")
+
+    def run():
+        catalog = _catalog.AssetCatalog(path)
+        catalog.import_json(library.json_file)
+        catalog.close()
+    return run
+
+
+def bench_catalog_read(library):
+    path = library.empty_metadata("catalog_read.db")
+    catalog = _catalog.AssetCatalog(path)
+    catalog.import_json(library.json_file)
+    catalog.close()
+    metadata = _metadata_store.load_metadata(path)
+
+    def run():
+        view = metadata[SOURCE_TAG]
+        for geometry_file, name in _metadata_store.list_assets(metadata, SOURCE_TAG):
+            view[geometry_file]
+    return run
+
+
+def bench_extract_materials(library):
+    reset_session()
+    path = library.empty_metadata("extracted.json")
+    merge = synthetic.build_scene(hou, library.library)
+    extract = _hou_extract_material_data.ExtractMaterialsData(path, SOURCE_TAG)
+
+    def run():
+        extract.get_geometry_data(merge)
+        extract.compact()
+    return run
+
+
+def bench_read_geo_file_shared(library):
+    reset_session()
+    top = synthetic.add_shared_layers(hou, synthetic.build_scene(hou, library.library))
+    extract = _hou_extract_material_data.ExtractMaterialsData(library.json_file, SOURCE_TAG)
+    return lambda: extract.read_geo_file(top)
+
+
+def bench_check_textures(library):
+    reset_session()
+    importer = _houdini_usd.KBGeometryImport(library.json_file, "mantra", SOURCE_TAG, True, True)
+    return lambda: importer.check_textures(list(library.library))
+
+
+def bench_convert_to_usd(library):
+    reset_session()
+    importer = _houdini_usd.KBGeometryImport(library.json_file, "mantra", SOURCE_TAG, True, True)
+    return importer.convert_to_usd
+
+
+BENCHMARKS = [("metadata.load_json", bench_load_json),
+              ("metadata.load_json_cached", bench_load_json_cached),
+              ("metadata.list_assets", bench_list_assets),
+              ("metadata.search_assets", bench_search_assets),
+              ("record_log.append", bench_record_log_append),
+              ("record_log.compact", bench_record_log_compact),
+              ("catalog.import_json", bench_catalog_import),
+              ("catalog.read_assets", bench_catalog_read),
+              ("extract.get_geometry_data", bench_extract_materials),
+              ("extract.read_geo_file_shared", bench_read_geo_file_shared),
+              ("import.check_textures", bench_check_textures),
+              ("import.convert_to_usd", bench_convert_to_usd)]
+
+
+def run_benchmark(function, library, repeat):
+    timings = []
+    for _ in range(repeat):
+        operation = function(library)
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(sizes, repeat=3, selected=None, tmp_root=None):
+    """
+    Runs the benchmarks at every size and returns their results.
+    """
+    results = []
+    for size in sizes:
+        root = tempfile.mkdtemp(prefix="usd_bench_{}_".format(size), dir=tmp_root)
+        try:
+            library = Library(root, size)
+            for name, function in BENCHMARKS:
+                if selected and not any(name.startswith(prefix) for prefix in selected):
+                    continue
+                timings = run_benchmark(function, library, repeat)
+                results.append({"name": name, "size": size, "best": min(timings),
+                                "median": statistics.median(timings), "repeat": repeat})
+                print("{:<28} {:>7} {:>10.4f}s".format(name, size, min(timings)))
+                sys.stdout.flush()
+        finally:
+            reset_session()
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def default_label():
+    """
+    Labels a run with the current commit, so results of different versions sit side by side.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=_benchmarks_dir,
+                                       stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+
+
+def save_results(results, label, path=None, results_dir=RESULTS_DIR):
+    path = path or os.path.join(results_dir, "{}.json".format(label))
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as output_file:
+        json.dump({"label": label, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "python": platform.python_version(), "platform": platform.platform(), "results": results},
+                  output_file, indent=4)
+    return path
+
+
+def compare(results, baseline, threshold=1.2, min_delta=0.001):
+    """
+    Returns a table of the results against a previous run and the benchmarks slower than threshold times the baseline.
+    Differences under min_delta seconds are timer noise and never reported.
+    """
+    previous = dict(((result["name"], result["size"]), result["best"]) for result in baseline["results"])
+    lines = ["{:<28} {:>7} {:>10} {:>10} {:>7}".format("benchmark", "size", "base (s)", "now (s)", "ratio")]
+    regressions = []
+    for result in results:
+        base = previous.get((result["name"], result["size"]))
+        if base is None:
+            continue
+        ratio = result["best"] / base if base else float("inf")
+        flag = ""
+        if ratio > threshold and result["best"] - base > min_delta:
+            regressions.append(result)
+            flag = "  slower"
+        lines.append("{:<28} {:>7} {:>10.4f} {:>10.4f} {:>6.2f}x{}".format(
+            result["name"], result["size"], base, result["best"], ratio, flag))
+    return "\n".join(lines), regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time usd_utils on synthetic libraries without Houdini.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Library sizes.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark, the best one is kept.")
+    parser.add_argument("--benchmark", action="append", dest="selected", default=[],
+                        help="Only run the benchmarks starting with this name. Can be repeated.")
+    parser.add_argument("--label", default=None, help="Name of the run. Defaults to the current commit.")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="Folder the results are saved to.")
+    parser.add_argument("--output", default=None,
+                        help="Results file. Defaults to <label>.json in the results folder.")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare with.")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Ratio to the previous run above which a benchmark is reported as slower.")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with an error if any benchmark is slower than the threshold.")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    label = args.label or default_label()
+    results = run(args.sizes, args.repeat, args.selected)
+    print("results saved to {}".format(save_results(results, label, args.output, args.results_dir)))
+
+    if args.compare:
+        with open(args.compare, "r") as read_file:
+            baseline = json.load(read_file)
+        table, regressions = compare(results, baseline, args.threshold)
+        print(table)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
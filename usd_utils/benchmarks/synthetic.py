@@ -0,0 +1,111 @@
+import json
+import os
+import random
+
+"""
+    Synthetic asset libraries with the shape of assets_metadata.json, and the Houdini scenes they are extracted from.
+
+    Assets are grouped into kits like the KitBash libraries, each asset uses a few materials drawn from a shared pool,
+    and every material has the texture set of a KitBash material. Texture files are written empty, so texture
+    lookups hit the file system as they would on a real library.
+"""
+
+TEXTURE_SUFFIXES = {"basecolor_texture": "basecolor",
+                    "rough_texture": "roughness",
+                    "metallic_texture": "metallic",
+                    "emitcolor_texture": "emissive",
+                    "opaccolor_texture": "opacity",
+                    "baseNormal_texture": "normal"}
+# Extra textures of the inputs schema, found next to the material textures
+EXTRA_SUFFIXES = ("ao", "height")
+
+
+def material_name(index):
+    return "KB3D_SYN_Material{:04d}".format(index)
+
+
+def asset_name(kit, index):
+    return "KB3D_SYN_Kit{:03d}_Asset{:05d}".format(kit, index)
+
+
+def generate_library(root, size, materials_per_asset=3, material_pool=200, assets_per_kit=100, seed=0,
+                     write_textures=True):
+    """
+    Returns the {geometry file: entry} library of size assets, under root.
+    """
+    rng = random.Random(seed)
+    texture_dir = os.path.join(root, "KB3DTextures", "4k").replace(os.sep, "/")
+    materials = {}
+    for index in range(material_pool):
+        name = material_name(index)
+        materials[name] = dict((slot, "{}/{}_{}.png".format(texture_dir, name, suffix))
+                               for slot, suffix in TEXTURE_SUFFIXES.items())
+
+    if write_textures:
+        os.makedirs(texture_dir, exist_ok=True)
+        for name, textures in materials.items():
+            paths = list(textures.values()) + ["{}/{}_{}.png".format(texture_dir, name, suffix)
+                                               for suffix in EXTRA_SUFFIXES]
+            for path in paths:
+                open(path, "a").close()
+
+    library = {}
+    names = list(materials)
+    for index in range(size):
+        kit = index // assets_per_kit
+        name = asset_name(kit, index)
+        geometry_file = "{}/kit_{:03d}/geo/{}.bgeo.sc".format(root.replace(os.sep, "/"), kit, name)
+        entry = {"asset_name": name, "materials": {}}
+        for mat in rng.sample(names, min(materials_per_asset, len(names))):
+            entry["materials"][mat] = {"shop_materialpath": "/obj/KB3D_Synthetic/matnet/" + mat,
+                                       "textures": dict(materials[mat])}
+        library[geometry_file] = entry
+    return library
+
+
+def write_metadata(path, metadata):
+    with open(path, "w") as output_file:
+        json.dump(metadata, output_file, indent=4)
+
+
+def build_scene(hou, library):
+    """
+    Builds the Houdini scene a library is extracted from: one file node per asset, merged into the returned node,
+    and the principled shaders of its materials.
+    """
+    obj = hou.node("/obj")
+    matnet = obj.createNode("subnet", "KB3D_Synthetic").createNode("matnet", "matnet")
+    shaders = {}
+    geo = obj.createNode("geo", "library")
+    merge = geo.createNode("merge")
+    for geometry_file, entry in library.items():
+        materials = []
+        for mat, material in entry["materials"].items():
+            if mat not in shaders:
+                shader = matnet.createNode("principledshader::2.0", mat)
+                for slot, texture in material["textures"].items():
+                    shader.parm(slot).set(texture)
+                shader.parm("dispTex_texture").set("")
+                shaders[mat] = shader
+            materials.append(material["shop_materialpath"])
+
+        file_sop = geo.createNode("file")
+        file_sop.parm("file").set(geometry_file)
+        # A few primitives per material, as cooked geometry has
+        file_sop.setGeometry(hou.Geometry({"shop_materialpath": [path for path in materials for _ in range(4)]}))
+        merge.setNextInput(file_sop)
+    return merge
+
+
+def add_shared_layers(hou, merge, layers=8):
+    """
+    Stacks layers of nodes above the merge node of build_scene, each wiring both of its inputs to the layer below,
+    so every path to the file nodes is shared 2 ** layers times. Returns the top node.
+    """
+    top = merge
+    for _ in range(layers):
+        switch = merge.parent().createNode("switch")
+        switch.setInput(0, top)
+        switch.setInput(1, top)
+        top = switch
+    return top
@@ -0,0 +1,170 @@
+import argparse
+import math
+import os
+import sys
+
+from pxr import Gf, Kind, Sdf, Tf, Usd, UsdGeom
+
+from usd_utils import _asset_paths, _build_manifest, _metadata_store
+
+"""
+    Library assembly export: one stage per source tag referencing every converted asset of the library,
+    laid out on a grid so a whole library can be opened for look-dev or review.
+
+    The layout only uses the bounds recorded in the build manifests when the assets were converted,
+    so no asset is opened to write the assembly. Assets without recorded bounds get a unit cell.
+
+    Example:
+        python -m usd_utils._assembly assets_metadata.json --source-tag KB
+"""
+
+
+def mesh_bounds(partitions):
+    """
+    Returns the [[min x, min y, min z], [max x, max y, max z]] of the partitions of a geometry reader,
+    or None if they have no points.
+    """
+    bbox_min = [float("inf")] * 3
+    bbox_max = [float("-inf")] * 3
+    for data in partitions.values():
+        for point in data["points"]:
+            for axis in range(3):
+                value = float(point[axis])
+                if value < bbox_min[axis]:
+                    bbox_min[axis] = value
+                if value > bbox_max[axis]:
+                    bbox_max[axis] = value
+    if bbox_min[0] == float("inf"):
+        return None
+    return [bbox_min, bbox_max]
+
+
+def read_bounds(usd_path):
+    """
+    Returns the bounds of a converted asset, from its extentsHint when it has one.
+    Used at conversion time by the converters that do not know the bounds of what they wrote.
+    """
+    stage = Usd.Stage.Open(usd_path, Usd.Stage.LoadNone)
+    main = stage.GetDefaultPrim()
+    for child in main.GetChildren():
+        extents = UsdGeom.ModelAPI(child).GetExtentsHint()
+        if extents:
+            return [list(extents[0]), list(extents[1])]
+
+    stage.Load()
+    bbox_cache = UsdGeom.BBoxCache(Usd.TimeCode.Default(), [UsdGeom.Tokens.default_, UsdGeom.Tokens.render])
+    box = bbox_cache.ComputeWorldBound(stage.GetDefaultPrim()).ComputeAlignedRange()
+    if box.IsEmpty():
+        return None
+    return [list(box.GetMin()), list(box.GetMax())]
+
+
+def assembly_path(output_paths, source_tag):
+    """
+    Returns the default assembly of a library: <source tag>_assembly.usd in the folder holding all its kits.
+    """
+    root = os.path.commonpath([os.path.dirname(path) for path in output_paths])
+    return root.replace(os.sep, "/") + "/" + source_tag + "_assembly.usd"
+
+
+def layout(bounds, spacing=1.0):
+    """
+    Places the assets on rows along X, rows stacked along Z, wrapping rows to keep the grid about square.
+    Returns the translation of every asset, putting its bounds minimum at its cell corner and on the ground.
+    """
+    sizes = []
+    for bbox in bounds:
+        if bbox is None:
+            sizes.append((1.0, 1.0))
+        else:
+            sizes.append((bbox[1][0] - bbox[0][0], bbox[1][2] - bbox[0][2]))
+    row_width = math.sqrt(sum((width + spacing) * (depth + spacing) for width, depth in sizes)) if sizes else 0.0
+
+    translations = []
+    x = z = row_depth = 0.0
+    for bbox, (width, depth) in zip(bounds, sizes):
+        if x > 0.0 and x + width > row_width:
+            x = 0.0
+            z += row_depth + spacing
+            row_depth = 0.0
+        bbox_min = bbox[0] if bbox is not None else [0.0, 0.0, 0.0]
+        translations.append((x - bbox_min[0], -bbox_min[1], z - bbox_min[2]))
+        x += width + spacing
+        row_depth = max(row_depth, depth)
+    return translations
+
+
+def write_assembly(json_file, source_tag, output_path=None, instanceable=True, spacing=1.0):
+    """
+    Writes the assembly stage of a library and returns its path and the number of referenced assets.
+    Assets that were not converted yet are left out.
+    """
+    metadata = _metadata_store.load_metadata(json_file)
+    assets = []
+    manifests = {}
+    for geometry_file, asset_name in _metadata_store.list_assets(metadata, source_tag):
+        usd_path = _asset_paths.usd_output_path(geometry_file, asset_name)
+        if not os.path.exists(usd_path):
+            continue
+        output_dir = os.path.dirname(usd_path)
+        manifest = manifests.get(output_dir)
+        if manifest is None:
+            manifest = _build_manifest.BuildManifest(output_dir)
+            manifests[output_dir] = manifest
+        assets.append((asset_name, usd_path, manifest.bounds(geometry_file)))
+    if not assets:
+        raise ValueError("No converted asset found for {}".format(source_tag))
+    if output_path is None:
+        output_path = assembly_path([usd_path for asset_name, usd_path, bbox in assets], source_tag)
+
+    layer = Sdf.Layer.FindOrOpen(output_path) if os.path.exists(output_path) else None
+    if layer is None:
+        layer = Sdf.Layer.CreateNew(output_path)
+    else:
+        layer.Clear()
+    stage = Usd.Stage.Open(layer, Usd.Stage.LoadNone)
+    UsdGeom.SetStageUpAxis(stage, UsdGeom.Tokens.y)
+    UsdGeom.SetStageMetersPerUnit(stage, 1.0)
+
+    root = UsdGeom.Xform.Define(stage, "/" + Tf.MakeValidIdentifier(source_tag))
+    Usd.ModelAPI(root.GetPrim()).SetKind(Kind.Tokens.assembly)
+    stage.SetDefaultPrim(root.GetPrim())
+
+    names = set()
+    translations = layout([bbox for asset_name, usd_path, bbox in assets], spacing)
+    for (asset_name, usd_path, bbox), translation in zip(assets, translations):
+        name = Tf.MakeValidIdentifier(asset_name)
+        while name in names:
+            name += "_"
+        names.add(name)
+
+        asset = UsdGeom.Xform.Define(stage, root.GetPath().AppendChild(name))
+        asset.AddTranslateOp().Set(Gf.Vec3d(*translation))
+        asset.GetPrim().GetReferences().AddReference(
+            _asset_paths.relative_path(usd_path, os.path.dirname(output_path)))
+        if bbox is not None:
+            UsdGeom.ModelAPI(asset.GetPrim()).SetExtentsHint([Gf.Vec3f(*bbox[0]), Gf.Vec3f(*bbox[1])])
+        asset.GetPrim().SetInstanceable(instanceable)
+
+    layer.Save()
+    return output_path, len(assets)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write one stage referencing every converted asset of a library.")
+    parser.add_argument("metadata", help="Path to the assets metadata file.")
+    parser.add_argument("--source-tag", required=True, help="Library tag, e.g. KB.")
+    parser.add_argument("--output", default=None,
+                        help="Assembly path. Defaults to <source tag>_assembly.usd in the folder holding the kits.")
+    parser.add_argument("--spacing", type=float, default=1.0, help="Gap between the assets.")
+    parser.add_argument("--no-instanceable", dest="instanceable", action="store_false",
+                        help="Reference the assets without making them instanceable.")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    output_path, count = write_assembly(args.metadata, args.source_tag, args.output, args.instanceable, args.spacing)
+    print("{} assets written to {}".format(count, output_path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import itertools
+import traceback
+
+from PySide2 import QtCore, QtGui
+
+from usd_utils import _metadata_store, _thumbnails
+
+"""
+    List model of the assets of one library, fetched from the metadata in pages as the view scrolls.
+    Filtering restarts the fetch from the metadata instead of creating or hiding widgets.
+
+    With a thumbnail cache (see _thumbnails), the previews of the rows being shown are looked up and read
+    in a thread pool and appear as they are loaded, so scrolling never waits on the disk.
+"""
+
+
+class _Signals(QtCore.QObject):
+    thumbnailLoaded = QtCore.Signal(str, QtGui.QImage)
+    thumbnailsRendered = QtCore.Signal(int, int)
+
+
+class _ThumbnailLoader(QtCore.QRunnable):
+    def __init__(self, cache, geometry_file, signals):
+        super(_ThumbnailLoader, self).__init__()
+        self.cache = cache
+        self.geometry_file = geometry_file
+        self.signals = signals
+
+    def run(self):
+        path = self.cache.lookup(self.geometry_file)
+        image = QtGui.QImage(path) if path is not None else QtGui.QImage()
+        self.signals.thumbnailLoaded.emit(self.geometry_file, image)
+
+
+class _ThumbnailRenderer(QtCore.QRunnable):
+    def __init__(self, cache, geometry_files, workers, interpreter, signals):
+        super(_ThumbnailRenderer, self).__init__()
+        self.cache = cache
+        self.geometry_files = geometry_files
+        self.workers = workers
+        self.interpreter = interpreter
+        self.signals = signals
+
+    def run(self):
+        try:
+            results = _thumbnails.render_thumbnails(self.cache, self.geometry_files, self.workers, self.interpreter)
+        except Exception:
+            traceback.print_exc()
+            self.signals.thumbnailsRendered.emit(0, len(self.geometry_files))
+            return
+        failed = sum(1 for result in results if result["status"] != "ok")
+        self.signals.thumbnailsRendered.emit(len(results) - failed, failed)
+
+
+class AssetListModel(QtCore.QAbstractListModel):
+    page_size = 200
+    thumbnailsRendered = QtCore.Signal(int, int)
+
+    def __init__(self, metadata, parent=None, thumbnails=None):
+        super(AssetListModel, self).__init__(parent)
+        self.metadata = metadata
+        self.source_tag = None
+        self.filter_text = ""
+        self.thumbnails = thumbnails
+        self._rows = []
+        self._row_of = {}
+        self._source = iter(())
+        self._next = None
+
+        # Loaded previews by geometry file, None while loading or for assets without one
+        self._previews = {}
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(4)
+        self._signals = _Signals(self)
+        self._signals.thumbnailLoaded.connect(self._onThumbnailLoaded)
+        self._signals.thumbnailsRendered.connect(self._onThumbnailsRendered)
+
+    def setLibrary(self, source_tag):
+        """
+        Shows the assets of another library, keeping the current filter.
+        """
+        self.source_tag = source_tag
+        self._restart()
+
+    def setFilter(self, text):
+        """
+        Shows only the assets whose name contains the given text.
+        """
+        if text == self.filter_text:
+            return
+        self.filter_text = text
+        self._restart()
+
+    def _restart(self):
+        self.beginResetModel()
+        self._rows = []
+        self._row_of = {}
+        if self.source_tag is None:
+            self._source = iter(())
+        else:
+            self._source = _metadata_store.iter_assets(self.metadata, self.source_tag, self.filter_text)
+        self._next = next(self._source, None)
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        geometry_file, asset_name = self._rows[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return asset_name
+        if role in (QtCore.Qt.UserRole, QtCore.Qt.ToolTipRole):
+            return geometry_file
+        if role == QtCore.Qt.DecorationRole and self.thumbnails is not None:
+            if geometry_file not in self._previews:
+                # Marked as loading until the loader reports back
+                self._previews[geometry_file] = None
+                self._pool.start(_ThumbnailLoader(self.thumbnails, geometry_file, self._signals))
+            return self._previews[geometry_file]
+        return None
+
+    def _onThumbnailLoaded(self, geometry_file, image):
+        if image.isNull():
+            return
+        self._previews[geometry_file] = QtGui.QPixmap.fromImage(image)
+        row = self._row_of.get(geometry_file)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+    def renderThumbnails(self, geometry_files, workers=1, interpreter=None):
+        """
+        Renders the missing thumbnails of the given assets in the background, see _thumbnails.render_thumbnails.
+        thumbnailsRendered is emitted with the number of rendered and failed thumbnails once done.
+        """
+        self._pool.start(_ThumbnailRenderer(self.thumbnails, list(geometry_files), workers, interpreter,
+                                            self._signals))
+
+    def _onThumbnailsRendered(self, rendered, failed):
+        # Assets without a preview are looked up again
+        self._previews = dict((geometry_file, preview) for geometry_file, preview in self._previews.items()
+                              if preview is not None)
+        if self._rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1), [QtCore.Qt.DecorationRole])
+        self.thumbnailsRendered.emit(rendered, failed)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._next is not None
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() or self._next is None:
+            return
+        page = [self._next] + list(itertools.islice(self._source, self.page_size - 1))
+        self._next = next(self._source, None)
+
+        self.beginInsertRows(QtCore.QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+        for geometry_file, asset_name in page:
+            self._row_of[geometry_file] = len(self._rows)
+            self._rows.append((geometry_file, asset_name))
+        self.endInsertRows()
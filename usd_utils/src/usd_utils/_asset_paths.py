@@ -0,0 +1,68 @@
+import os
+
+"""
+    Path helpers shared by the Houdini importers and the headless writer.
+    Kept free of hou and pxr imports so they can be used from any interpreter.
+"""
+
+
+def usd_output_path(geometry_file, asset_name):
+    """
+    Returns the .usd path of an asset: a "usd" folder next to the folder holding the geometry file.
+    """
+    output_path = geometry_file.split("/")
+    output_path = output_path[:len(output_path) - 2]
+    return "/".join(output_path) + "/" + "usd" + "/" + asset_name + ".usd"
+
+
+def shared_materials_path(usd_output_path):
+    """
+    Returns the shared materials layer used by the assets converted into the same usd folder.
+    """
+    return os.path.dirname(usd_output_path) + "/" + "materials.usd"
+
+
+def payload_path(usd_output_path):
+    """
+    Returns the geometry layer of an asset exported with payloads, in a "payload" folder next to its .usd.
+    """
+    directory, name = os.path.split(usd_output_path)
+    return directory + "/" + "payload" + "/" + name
+
+
+def proxy_path(usd_output_path):
+    """
+    Returns the proxy geometry layer of an asset, cached in a "proxy" folder next to its .usd.
+    """
+    directory, name = os.path.split(usd_output_path)
+    return directory + "/" + "proxy" + "/" + name
+
+
+def converted_texture_path(texture, texture_format):
+    """
+    Returns the converted file of a texture: a folder named after the format next to the texture,
+    keeping the texture name so patch_texture still derives the other maps from it.
+    """
+    directory, name = os.path.split(texture)
+    return directory + "/" + texture_format + "/" + name.split(".")[0] + "." + texture_format
+
+
+def relative_path(path, start):
+    """
+    Returns path relative to the start folder as a "./" anchored USD asset path,
+    or unchanged if it cannot be made relative (e.g. another drive).
+    """
+    try:
+        relative = os.path.relpath(path, start).replace(os.sep, "/")
+    except ValueError:
+        return path
+    return relative if relative.startswith("../") else "./" + relative
+
+
+def patch_texture(source_texture, target_text_name):
+    """
+    Generates a new texture filename by swapping the suffix.
+    """
+    _st_end = source_texture.split("/")[-1].split(".")[0].split("_")[-1]
+    texture = source_texture.replace(_st_end, target_text_name)
+    return texture
@@ -0,0 +1,405 @@
+import fnmatch
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from usd_utils import _asset_paths, _importers, _metadata_store, _profiling, _texture_resolver
+
+"""
+    Batch conversion of whole libraries.
+
+    Assets are sharded across a pool of worker processes. Every shard runs in its own interpreter
+    (plain python for the headless writer, hython for the LOP based importers), so each worker has its own
+    stage and a crash only affects the shard it happened in. Results are gathered into a per-asset report.
+
+    With a memory limit, a worker whose resident memory stays above it once the converter caches are released
+    stops after the asset it is on, and a fresh worker carries on with the assets the first one did not report,
+    its results file acting as the checkpoint. Assets whose conversion left the worker larger by more than the leak
+    threshold are listed in the report.
+
+    This module is also the worker entry point:
+        python -m usd_utils._batch <shard.json>
+"""
+
+BACKENDS = _importers.BACKENDS
+# Exit code of a worker stopping at its memory limit, the remaining assets go to a new worker
+RECYCLE_EXIT_CODE = 75
+MB = 1024 * 1024
+TEXTURE_SCHEMA = os.path.normpath(os.path.join(os.path.dirname(__file__), "inputs_schema.json"))
+
+
+def select_assets(metadata, source_tag, patterns=None):
+    """
+    Returns the geometry files of a library whose asset name or path matches any of the given patterns.
+    """
+    assets = _metadata_store.list_assets(metadata, source_tag)
+    if not patterns:
+        return [geometry_file for geometry_file, asset_name in assets]
+    return [geometry_file for geometry_file, asset_name in assets
+            if any(fnmatch.fnmatch(asset_name, pattern) or fnmatch.fnmatch(geometry_file, pattern)
+                   for pattern in patterns)]
+
+
+def filter_assets(metadata, source_tag, geometry_files, patterns=None):
+    """
+    Returns the given geometry files whose asset name or path matches any of the patterns, all of them without any.
+    """
+    if not patterns:
+        return list(geometry_files)
+    library = metadata[source_tag]
+    return [geometry_file for geometry_file in geometry_files
+            if any(fnmatch.fnmatch(library[geometry_file]["asset_name"], pattern)
+                   or fnmatch.fnmatch(geometry_file, pattern) for pattern in patterns)]
+
+
+def check_textures(json_file, source_tag, assets, options):
+    """
+    Returns the missing textures of the given assets keyed by geometry file,
+    listing every texture directory of the batch once in parallel.
+    """
+    metadata = _metadata_store.load_metadata(json_file)
+    extra_names = _texture_resolver.extra_texture_names(TEXTURE_SCHEMA, source_tag,
+                                                        options.get("add_extra_tex", False),
+                                                        options.get("add_displacement", False))
+    return _texture_resolver.missing_textures(_texture_resolver.TextureResolver(), metadata[source_tag], assets,
+                                              extra_names)
+
+
+def shard(assets, workers):
+    """
+    Splits the assets into at most the given number of shards, round robin.
+    """
+    workers = max(1, min(workers, len(assets)))
+    return [assets[i::workers] for i in range(workers)]
+
+
+def create_converter(backend, json_file, source_tag, options):
+    """
+    Creates the object whose create_main_template converts a single asset.
+    The library must declare support for the backend in its importer, see _importers.
+    """
+    importer = _importers.get_importer(source_tag)
+    if backend == "headless":
+        if backend not in importer.backends:
+            raise ValueError("{} does not support the headless backend".format(source_tag))
+        from usd_utils import _usd_writer
+        return _usd_writer.USDWriter(json_file, options.get("import_render", importer.import_render), source_tag,
+                                     options.get("add_displacement", False), options.get("add_extra_tex", False),
+                                     shared_materials=options.get("shared_materials", False),
+                                     proxy_ratios=options.get("proxy_ratios"),
+                                     payload=options.get("payload", False),
+                                     geometry_cache=options.get("geometry_cache", False))
+
+    return _importers.create_importer(json_file, source_tag, options.get("import_render"),
+                                      options.get("add_displacement", False), options.get("add_extra_tex", False),
+                                      backend=backend, execute_rop=True,
+                                      shared_materials=options.get("shared_materials", False),
+                                      proxy_ratios=options.get("proxy_ratios"),
+                                      payload=options.get("payload", False),
+                                      geometry_cache=options.get("geometry_cache", False))
+
+
+def asset_bounds(converter, geometry_file, output_path):
+    """
+    Returns the bounds of a converted asset, as computed by the converter or read back from its output.
+    """
+    bounds = getattr(converter, "bounds", {}).get(geometry_file)
+    if bounds is None:
+        from usd_utils import _assembly
+        bounds = _assembly.read_bounds(output_path)
+    return bounds
+
+
+def convert_asset(converter, geometry_file):
+    """
+    Converts a single asset and returns its result record. Never raises.
+    """
+    result = {"geometry_file": geometry_file, "status": "ok", "error": None}
+    start = time.time()
+    try:
+        result["asset_name"] = converter.metadata_read[converter.source_tag][geometry_file]["asset_name"]
+        result["output"] = _asset_paths.usd_output_path(geometry_file, result["asset_name"])
+        with _profiling.stage("convert_asset", geometry_file):
+            converter.create_main_template(geometry_file)
+            result["output_size"] = os.path.getsize(result["output"])
+            with _profiling.stage("asset_bounds", geometry_file):
+                result["bounds"] = asset_bounds(converter, geometry_file, result["output"])
+    except Exception:
+        result["status"] = "failed"
+        result["error"] = traceback.format_exc()
+    result["elapsed"] = time.time() - start
+    return result
+
+
+def release_memory(converter, full=False):
+    """
+    Drops what a converter keeps cached between assets, see release_memory of the converters.
+    Returns the resident memory of the process afterwards.
+    """
+    release = getattr(converter, "release_memory", None)
+    if release is not None:
+        release(full)
+    if full:
+        _metadata_store.invalidate()
+    gc.collect()
+    return _profiling.rss()
+
+
+def run_shard(spec):
+    """
+    Converts every asset of a shard, one after another, in the current process.
+    Each result is appended to the shard results file as soon as it is known, one JSON object per line,
+    with the resident memory of the worker after the asset and how much it grew during its conversion.
+    With profiling on, every result carries the stage records of its asset.
+
+    Past the memory limit of the spec (MB) every cache is released, and if that is not enough the shard stops
+    after the current asset, leaving the rest to another worker (see main).
+    """
+    if spec.get("profile"):
+        _profiling.start()
+    try:
+        converter = create_converter(spec["backend"], spec["json_file"], spec["source_tag"], spec["options"])
+        error = None
+    except Exception:
+        converter = None
+        error = traceback.format_exc()
+
+    memory_limit = spec.get("memory_limit")
+    results = []
+    with open(spec["results_file"], "a") as results_file:
+        rss = release_memory(converter)
+        for index, geometry_file in enumerate(spec["assets"], 1):
+            if converter is None:
+                result = {"geometry_file": geometry_file, "status": "failed", "error": error, "elapsed": 0.0}
+            else:
+                result = convert_asset(converter, geometry_file)
+                before, rss = rss, release_memory(converter)
+                if rss is not None:
+                    result["rss"] = rss
+                    result["rss_growth"] = rss - before
+                if memory_limit and rss is not None and rss > memory_limit * MB and index < len(spec["assets"]):
+                    rss = release_memory(converter, full=True)
+                    result["recycled_worker"] = rss > memory_limit * MB
+            if spec.get("profile"):
+                result["profile"] = _profiling.take()
+            results_file.write(json.dumps(result) + "\n")
+            results_file.flush()
+            print("{} {}".format(geometry_file, result["status"]))
+            sys.stdout.flush()
+            results.append(result)
+
+            if result.get("recycled_worker"):
+                print("{:.0f}MB resident over the {}MB limit, recycling the worker".format(rss / MB, memory_limit))
+                break
+    return results
+
+
+def read_results(path):
+    """
+    Reads the results a shard worker wrote so far.
+    A line the worker is still writing, or that was cut short when it was killed, is left out.
+    """
+    results = []
+    if os.path.exists(path):
+        with open(path, "r") as read_file:
+            for line in read_file:
+                if not line.endswith("\n"):
+                    continue
+                try:
+                    results.append(json.loads(line))
+                except ValueError:
+                    continue
+    return results
+
+
+def check_backend(backend, assets, interpreter=None):
+    """
+    Raises a ValueError before any worker starts if the headless workers cannot read the geometry of the assets:
+    plain python workers only read OBJ and USD geometry without Houdini, see _geometry_reader.
+    """
+    if backend != "headless" or interpreter is not None:
+        return
+    from usd_utils import _geometry_reader
+    if _geometry_reader.hou_available():
+        return
+    needs_hou = [geometry_file for geometry_file in assets if _geometry_reader.needs_hou(geometry_file)]
+    if needs_hou:
+        raise ValueError("{} asset(s) need Houdini to read their geometry, e.g. {}. Run the headless workers "
+                         "in hython with --interpreter hython, or use --backend hython".format(
+                             len(needs_hou), needs_hou[0]))
+
+
+def worker_command(backend, interpreter, spec_file):
+    """
+    Returns the command running a shard worker in the interpreter of the given backend.
+    """
+    if interpreter is None:
+        interpreter = sys.executable if backend == "headless" else "hython"
+    return [interpreter, "-m", "usd_utils._batch", spec_file]
+
+
+def worker_env():
+    """
+    Returns the environment of a shard worker, with this package importable.
+    """
+    env = dict(os.environ)
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join([src_dir] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    return env
+
+
+def write_shard_spec(tmp_dir, index, backend, json_file, source_tag, options, assets, profile=False,
+                     memory_limit=None):
+    """
+    Writes the description of a shard for a worker process and returns (spec, spec file).
+    """
+    spec_file = os.path.join(tmp_dir, "shard_{}.json".format(index))
+    spec = {"backend": backend, "json_file": json_file, "source_tag": source_tag,
+            "options": options, "assets": assets, "profile": profile, "memory_limit": memory_limit,
+            "results_file": os.path.join(tmp_dir, "results_{}.jsonl".format(index))}
+    with open(spec_file, "w") as output_file:
+        json.dump(spec, output_file)
+    return spec, spec_file
+
+
+def remaining_assets(spec):
+    """
+    Returns the assets of a shard its workers did not report on yet.
+    """
+    done = set(result["geometry_file"] for result in read_results(spec["results_file"]))
+    return [geometry_file for geometry_file in spec["assets"] if geometry_file not in done]
+
+
+def run_worker(command, spec, spec_file=None):
+    """
+    Runs a shard worker and returns one result per asset of the shard, assets the worker did not report on
+    counted as failed. Also runs the workers of other batch tools writing results the same way,
+    e.g. _thumbnails and _geometry_cache.
+
+    :param command: Command running the worker.
+    :param spec: Shard spec, with the assets and the results file the worker appends to.
+    :param spec_file: File the worker reads the spec from. Given, workers stopping at their memory limit
+        are replaced until the shard is done.
+    """
+    assets = spec["assets"]
+    while True:
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=worker_env(),
+                                 universal_newlines=True)
+        remaining = remaining_assets(spec)
+        if process.returncode != RECYCLE_EXIT_CODE or spec_file is None or not remaining:
+            break
+        print("shard {}: worker recycled, {} assets left".format(os.path.basename(spec_file), len(remaining)))
+        spec = dict(spec, assets=remaining)
+        with open(spec_file, "w") as output_file:
+            json.dump(spec, output_file)
+    results = read_results(spec["results_file"])
+
+    # Anything the worker did not report on was lost with the process
+    done = set(result["geometry_file"] for result in results)
+    for geometry_file in assets:
+        if geometry_file not in done:
+            results.append({"geometry_file": geometry_file, "status": "failed", "elapsed": 0.0,
+                            "error": "worker exited with code {}\n{}".format(process.returncode,
+                                                                             process.stdout[-2000:])})
+    return results
+
+
+def run_batch(json_file, source_tag, assets, backend="headless", workers=1, interpreter=None, options=None,
+              profile=False, memory_limit=None, leak_threshold=64):
+    """
+    Converts the given assets in a pool of worker processes and returns the batch report.
+    With profile, the workers record per-stage timings, see _profiling.
+    With memory_limit (MB), workers are recycled when they grow past it, see run_shard.
+    Assets whose conversion grew the worker by more than leak_threshold (MB) are listed under leaks.
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend {}, expected one of {}".format(backend, ", ".join(BACKENDS)))
+    check_backend(backend, assets, interpreter)
+    options = options or {}
+    json_file = os.path.abspath(json_file)
+    start = time.time()
+
+    # Missing textures are known before any worker starts
+    missing_textures = check_textures(json_file, source_tag, assets, options)
+
+    results = []
+    shards = shard(assets, workers) if assets else []
+    with tempfile.TemporaryDirectory(prefix="usd_batch_") as tmp_dir:
+        jobs = []
+        with ThreadPoolExecutor(max_workers=max(1, len(shards))) as pool:
+            for index, shard_assets in enumerate(shards):
+                spec, spec_file = write_shard_spec(tmp_dir, index, backend, json_file, source_tag, options,
+                                                   shard_assets, profile, memory_limit)
+                command = worker_command(backend, interpreter, spec_file)
+                jobs.append(pool.submit(run_worker, command, spec, spec_file))
+            for job in jobs:
+                results.extend(job.result())
+
+    results.sort(key=lambda result: result["geometry_file"])
+    return {"json_file": json_file, "source_tag": source_tag, "backend": backend, "workers": len(shards),
+            "elapsed": time.time() - start,
+            "succeeded": sum(1 for result in results if result["status"] == "ok"),
+            "failed": sum(1 for result in results if result["status"] != "ok"),
+            "missing_textures": missing_textures,
+            "memory_limit": memory_limit,
+            "recycled_workers": sum(1 for result in results if result.get("recycled_worker")),
+            "leaks": find_leaks(results, leak_threshold),
+            "assets": results}
+
+
+def find_leaks(results, threshold):
+    """
+    Returns {geometry file: growth in MB} of the assets whose conversion grew the worker by more than threshold MB,
+    once its caches were released.
+    """
+    return dict((result["geometry_file"], round(result["rss_growth"] / MB, 1)) for result in results
+                if result.get("rss_growth", 0) > threshold * MB)
+
+
+def format_summary(report):
+    """
+    Returns a human readable summary table of a batch report.
+    """
+    lines = ["{:<8} {:>9}  {}".format("status", "time (s)", "asset")]
+    for result in report["assets"]:
+        lines.append("{:<8} {:>9.2f}  {}".format(result["status"], result["elapsed"],
+                                                 result.get("asset_name", result["geometry_file"])))
+    lines.append("{} succeeded, {} failed in {:.2f}s with {} worker(s)".format(
+        report["succeeded"], report["failed"], report["elapsed"], report["workers"]))
+    if report.get("missing_textures"):
+        lines.append("{} missing textures in {} asset(s), see missing_textures in the report".format(
+            sum(len(textures) for textures in report["missing_textures"].values()),
+            len(report["missing_textures"])))
+    if report.get("skipped"):
+        lines.append("{} skipped, inputs unchanged since the last build".format(len(report["skipped"])))
+    if report.get("recycled_workers"):
+        lines.append("{} worker(s) recycled at the {}MB memory limit".format(report["recycled_workers"],
+                                                                            report["memory_limit"]))
+    for geometry_file, growth in sorted(report.get("leaks", {}).items()):
+        lines.append("possible leak: {} kept {:.1f}MB after conversion".format(geometry_file, growth))
+    return "\n".join(lines)
+
+
+def write_report(report, path):
+    with open(path, "w") as output_file:
+        json.dump(report, output_file, indent=4)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    with open(argv[0], "r") as read_file:
+        spec = json.load(read_file)
+    results = run_shard(spec)
+    # Fewer results than assets means the shard stopped at its memory limit
+    if len(results) < len(spec["assets"]):
+        sys.exit(RECYCLE_EXIT_CODE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+
+from usd_utils import _asset_paths, _importers, _texture_resolver
+
+"""
+    Build manifest used to skip assets whose inputs have not changed since their .usd was written.
+
+    A manifest lives next to the converted files, in the "usd" folder of create_usd_rop, and records for every asset
+    a hash of its metadata entry, the mtime and size of its geometry file, of every texture of its materials entry
+    and of the extra textures the options pick up next to them, of the schema files and the converter options
+    it was built with. With shared materials, the signatures of its materials in
+    the shared materials layer are recorded too, so an asset whose shared materials were removed or rewritten
+    is built again. The bounds of the built asset are kept along with them,
+    so a library can be laid out without opening its assets (see _assembly).
+"""
+
+MANIFEST_NAME = "usd_build_manifest.json"
+# customData key of the signature stamped on every material of a shared materials layer
+SIGNATURE_KEY = "usd_utils:signature"
+
+_script_dir = os.path.dirname(__file__)
+TEXTURE_SCHEMA = os.path.normpath(os.path.join(_script_dir, "inputs_schema.json"))
+SCHEMA_FILES = [os.path.normpath(os.path.join(_script_dir, "parameters_schema.json")), TEXTURE_SCHEMA]
+
+
+def file_signature(path):
+    """
+    Returns the [mtime, size] of a file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def shared_material_signatures(layer_path):
+    """
+    Returns the signature of every material of a shared materials layer, by name. Empty if there is no layer.
+    """
+    if not os.path.exists(layer_path):
+        return {}
+    from pxr import Sdf
+    layer = Sdf.Layer.OpenAsAnonymous(layer_path)
+    materials = layer.GetPrimAtPath("/materials") if layer is not None else None
+    if materials is None:
+        return {}
+    return dict((prim.name, prim.customData.get(SIGNATURE_KEY)) for prim in materials.nameChildren)
+
+
+def entry_hash(entry):
+    """
+    Returns the digest of a metadata entry, independent of its key order.
+    """
+    return hashlib.sha1(json.dumps(entry, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def asset_fingerprint(geometry_file, entry, options, extra_textures=()):
+    """
+    Collects everything the conversion of an asset depends on.
+    extra_textures are the extra textures found next to the textures of its materials, see extra_textures.
+    """
+    textures = {}
+    for material in entry["materials"].values():
+        for texture in material["textures"].values():
+            textures[texture] = file_signature(texture)
+
+    return {"entry": entry_hash(entry),
+            "geometry": file_signature(geometry_file),
+            "textures": textures,
+            "extra_textures": dict((texture, file_signature(texture)) for texture in extra_textures),
+            "schemas": dict((path, file_signature(path)) for path in SCHEMA_FILES),
+            "options": options}
+
+
+def extra_textures(entry, extra_names, resolver):
+    """
+    Returns the extra textures found on disk for the materials of an entry, derived from the first texture
+    of every material the same way the converters add them.
+    """
+    found = set()
+    for material in entry["materials"].values():
+        if not material["textures"] or not extra_names:
+            continue
+        source = list(material["textures"].values())[0]
+        for name in extra_names:
+            texture = resolver.resolve_variant(source, name)
+            if texture is not None:
+                found.add(texture)
+    return sorted(found)
+
+
+class BuildManifest:
+    """
+    Build records of the assets converted into a single output folder.
+
+    :param output_dir: Folder holding the converted .usd files.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.records = {}
+        self.changed = False
+        if os.path.exists(self.path):
+            with open(self.path, "r") as read_file:
+                self.records = json.load(read_file)
+
+    def is_stale(self, geometry_file, fingerprint, output_path):
+        """
+        Returns True if the asset was never built, its output is missing or any of its inputs changed.
+        """
+        if not os.path.exists(output_path):
+            return True
+        record = self.records.get(geometry_file)
+        if record is None:
+            return True
+        return dict((key, value) for key, value in record.items() if key != "bounds") != fingerprint
+
+    def record(self, geometry_file, fingerprint, bounds=None):
+        self.records[geometry_file] = dict(fingerprint, bounds=bounds) if bounds is not None else fingerprint
+        self.changed = True
+
+    def bounds(self, geometry_file):
+        """
+        Returns the bounds recorded with the last build of an asset, or None.
+        """
+        return self.records.get(geometry_file, {}).get("bounds")
+
+    def save(self):
+        """
+        Writes the manifest, replacing the previous one only once it is complete.
+        """
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as output_file:
+            json.dump(self.records, output_file, indent=4)
+        os.replace(tmp_path, self.path)
+
+
+class IncrementalBuild:
+    """
+    Splits assets into stale and up to date ones and records the successful builds,
+    using one manifest per output folder.
+
+    :param metadata: Parsed assets metadata.
+    :param source_tag: Library tag of the assets.
+    :param options: Converter options the assets are built with.
+    """
+
+    def __init__(self, metadata, source_tag, options):
+        self.metadata = metadata
+        self.source_tag = source_tag
+        self.options = options
+        self.manifests = {}
+        self.fingerprints = {}
+        self.resolver = _texture_resolver.TextureResolver()
+        self.extra_names = _texture_resolver.extra_texture_names(TEXTURE_SCHEMA, source_tag,
+                                                                 options.get("add_extra_tex", False),
+                                                                 options.get("add_displacement", False))
+        # Material signatures of the shared materials layers, read once before and once after the builds
+        self._shared_layers = {}
+        self._recording = False
+
+    def output_path(self, geometry_file):
+        return _asset_paths.usd_output_path(geometry_file, self.metadata[self.source_tag][geometry_file]["asset_name"])
+
+    def manifest(self, geometry_file):
+        output_dir = os.path.dirname(self.output_path(geometry_file))
+        manifest = self.manifests.get(output_dir)
+        if manifest is None:
+            manifest = BuildManifest(output_dir)
+            self.manifests[output_dir] = manifest
+        return manifest
+
+    def shared_materials(self, geometry_file):
+        """
+        Returns the signatures its shared materials layer holds for the materials of an asset.
+        """
+        layer_path = _asset_paths.shared_materials_path(self.output_path(geometry_file))
+        signatures = self._shared_layers.get(layer_path)
+        if signatures is None:
+            signatures = shared_material_signatures(layer_path)
+            self._shared_layers[layer_path] = signatures
+        return dict((mat, signatures.get(mat)) for mat in self.metadata[self.source_tag][geometry_file]["materials"])
+
+    def fingerprint(self, geometry_file):
+        entry = self.metadata[self.source_tag][geometry_file]
+        fingerprint = asset_fingerprint(geometry_file, entry, self.options,
+                                        extra_textures(entry, self.extra_names, self.resolver))
+        importer = _importers.registry().get(self.source_tag)
+        if importer is not None:
+            fingerprint["importer"] = importer.settings()
+        if self.options.get("shared_materials"):
+            fingerprint["shared_materials"] = self.shared_materials(geometry_file)
+        return fingerprint
+
+    def split(self, assets):
+        """
+        Returns the (stale, skipped) geometry files of the given assets.
+        """
+        stale = []
+        skipped = []
+        for geometry_file in assets:
+            fingerprint = self.fingerprint(geometry_file)
+            self.fingerprints[geometry_file] = fingerprint
+            output_path = self.output_path(geometry_file)
+            # The proxy and geometry layers are written next to the outputs and must exist as well
+            layers = []
+            if self.options.get("proxy_ratios"):
+                layers.append(_asset_paths.proxy_path(output_path))
+            if self.options.get("payload"):
+                layers.append(_asset_paths.payload_path(output_path))
+            missing_layer = not all(os.path.exists(layer) for layer in layers)
+            if missing_layer or self.manifest(geometry_file).is_stale(geometry_file, fingerprint, output_path):
+                stale.append(geometry_file)
+            else:
+                skipped.append(geometry_file)
+        return stale, skipped
+
+    def record(self, geometry_file, bounds=None):
+        """
+        Records a successful build with the fingerprint taken before it started and the bounds of the asset.
+        The shared materials are read again, as the build itself updates them.
+        """
+        fingerprint = self.fingerprints.get(geometry_file)
+        if fingerprint is None:
+            fingerprint = self.fingerprint(geometry_file)
+        elif self.options.get("shared_materials"):
+            if not self._recording:
+                self._shared_layers = {}
+                self._recording = True
+            fingerprint = dict(fingerprint, shared_materials=self.shared_materials(geometry_file))
+        self.manifest(geometry_file).record(geometry_file, fingerprint, bounds)
+
+    def save(self):
+        for manifest in self.manifests.values():
+            if manifest.changed:
+                manifest.save()
@@ -0,0 +1,239 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections.abc import Mapping
+
+"""
+    SQLite asset catalog with the same logical schema as assets_metadata.json:
+        source_tag -> geometry file -> {"asset_name", "materials": {name: {"shop_materialpath", "textures"}}}
+
+    Assets are indexed by source tag, asset name and texture path, so listing a library or adding one asset
+    does not require parsing or rewriting every library.
+
+    One-time import of an existing JSON file:
+        python -m usd_utils._catalog assets_metadata.json assets_metadata.db
+"""
+
+CATALOG_EXTENSIONS = (".db", ".sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    id INTEGER PRIMARY KEY,
+    source_tag TEXT NOT NULL,
+    geometry_file TEXT NOT NULL,
+    asset_name TEXT NOT NULL,
+    UNIQUE (source_tag, geometry_file)
+);
+CREATE INDEX IF NOT EXISTS assets_name ON assets (source_tag, asset_name);
+
+CREATE TABLE IF NOT EXISTS materials (
+    id INTEGER PRIMARY KEY,
+    asset_id INTEGER NOT NULL REFERENCES assets (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    shop_materialpath TEXT
+);
+CREATE INDEX IF NOT EXISTS materials_asset ON materials (asset_id);
+
+CREATE TABLE IF NOT EXISTS textures (
+    id INTEGER PRIMARY KEY,
+    material_id INTEGER NOT NULL REFERENCES materials (id) ON DELETE CASCADE,
+    slot TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS textures_material ON textures (material_id);
+CREATE INDEX IF NOT EXISTS textures_path ON textures (path);
+
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def is_catalog(path):
+    """
+    Returns True if the metadata path points to a catalog rather than a JSON file.
+    """
+    return os.path.splitext(path)[1].lower() in CATALOG_EXTENSIONS
+
+
+class AssetCatalog:
+    """
+    Read and write access to a catalog file. Created if it does not exist.
+
+    :param path: Path to the SQLite catalog.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def libraries(self):
+        """
+        Returns the source tags present in the catalog.
+        """
+        with self._lock:
+            rows = self.connection.execute("SELECT DISTINCT source_tag FROM assets ORDER BY source_tag").fetchall()
+        return [row[0] for row in rows]
+
+    def has_library(self, source_tag):
+        with self._lock:
+            return self.connection.execute("SELECT 1 FROM assets WHERE source_tag = ? LIMIT 1",
+                                           (source_tag,)).fetchone() is not None
+
+    def assets(self, source_tag):
+        """
+        Returns the (geometry file, asset name) pairs of a library, sorted by geometry file.
+        """
+        with self._lock:
+            return self.connection.execute(
+                "SELECT geometry_file, asset_name FROM assets WHERE source_tag = ? ORDER BY geometry_file",
+                (source_tag,)).fetchall()
+
+    def iter_assets(self, source_tag, text=""):
+        """
+        Lazily iterates the (geometry file, asset name) pairs of a library sorted by geometry file,
+        keeping only assets whose name contains the given text, case insensitive.
+        """
+        pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._lock:
+            cursor = self.connection.execute(
+                "SELECT geometry_file, asset_name FROM assets WHERE source_tag = ? AND asset_name LIKE ? ESCAPE '\\' "
+                "ORDER BY geometry_file", (source_tag, pattern))
+        return iter(cursor)
+
+    def count(self, source_tag):
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM assets WHERE source_tag = ?",
+                                           (source_tag,)).fetchone()[0]
+
+    def get_asset(self, source_tag, geometry_file):
+        """
+        Returns the metadata entry of an asset, or None if it is not in the catalog.
+        """
+        with self._lock:
+            row = self.connection.execute("SELECT id, asset_name FROM assets WHERE source_tag = ? AND geometry_file = ?",
+                                          (source_tag, geometry_file)).fetchone()
+            if row is None:
+                return None
+            rows = self.connection.execute(
+                "SELECT materials.name, materials.shop_materialpath, textures.slot, textures.path "
+                "FROM materials LEFT JOIN textures ON textures.material_id = materials.id "
+                "WHERE materials.asset_id = ? ORDER BY materials.id, textures.id", (row[0],)).fetchall()
+
+        materials = {}
+        for name, shop_materialpath, slot, path in rows:
+            material = materials.setdefault(name, {"shop_materialpath": shop_materialpath, "textures": {}})
+            if slot is not None:
+                material["textures"][slot] = path
+        return {"asset_name": row[1], "materials": materials}
+
+    def revision(self):
+        """
+        Returns the number of asset writes the catalog went through, so readers can tell it changed.
+        """
+        with self._lock:
+            row = self.connection.execute("SELECT value FROM info WHERE key = 'revision'").fetchone()
+        return row[0] if row is not None else 0
+
+    def add_asset(self, source_tag, geometry_file, entry, commit=True):
+        """
+        Adds an asset, replacing any previous entry of the same geometry file.
+        """
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.execute("UPDATE info SET value = value + 1 WHERE key = 'revision'")
+            if cursor.rowcount == 0:
+                cursor.execute("INSERT INTO info (key, value) VALUES ('revision', 1)")
+            cursor.execute("DELETE FROM assets WHERE source_tag = ? AND geometry_file = ?", (source_tag, geometry_file))
+            cursor.execute("INSERT INTO assets (source_tag, geometry_file, asset_name) VALUES (?, ?, ?)",
+                           (source_tag, geometry_file, entry["asset_name"]))
+            asset_id = cursor.lastrowid
+            for name, material in entry["materials"].items():
+                cursor.execute("INSERT INTO materials (asset_id, name, shop_materialpath) VALUES (?, ?, ?)",
+                               (asset_id, name, material.get("shop_materialpath")))
+                material_id = cursor.lastrowid
+                cursor.executemany("INSERT INTO textures (material_id, slot, path) VALUES (?, ?, ?)",
+                                   [(material_id, slot, path) for slot, path in material["textures"].items()])
+            if commit:
+                self.connection.commit()
+
+    def import_json(self, json_file):
+        """
+        Imports every library of a JSON metadata file in a single transaction.
+        """
+        with open(json_file, "r") as read_file:
+            read = json.load(read_file)
+        with self._lock:
+            for source_tag, library in read.items():
+                for geometry_file, entry in library.items():
+                    self.add_asset(source_tag, geometry_file, entry, commit=False)
+            self.connection.commit()
+
+
+class LibraryView(Mapping):
+    """
+    Read-only mapping of geometry file -> metadata entry for one library of a catalog.
+    Entries are queried on access.
+    """
+
+    def __init__(self, catalog, source_tag):
+        self.catalog = catalog
+        self.source_tag = source_tag
+
+    def __getitem__(self, geometry_file):
+        entry = self.catalog.get_asset(self.source_tag, geometry_file)
+        if entry is None:
+            raise KeyError(geometry_file)
+        return entry
+
+    def __iter__(self):
+        return iter([geometry_file for geometry_file, asset_name in self.catalog.assets(self.source_tag)])
+
+    def __len__(self):
+        return self.catalog.count(self.source_tag)
+
+    def asset_names(self):
+        return self.catalog.assets(self.source_tag)
+
+
+class CatalogView(Mapping):
+    """
+    Read-only mapping of source tag -> LibraryView, usable wherever the parsed JSON metadata is.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def __getitem__(self, source_tag):
+        if not self.catalog.has_library(source_tag):
+            raise KeyError(source_tag)
+        return LibraryView(self.catalog, source_tag)
+
+    def __iter__(self):
+        return iter(self.catalog.libraries())
+
+    def __len__(self):
+        return len(self.catalog.libraries())
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    json_file, catalog_file = argv[0], argv[1]
+    catalog = AssetCatalog(catalog_file)
+    catalog.import_json(json_file)
+    print("{} imported into {}".format(json_file, catalog_file))
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from usd_utils import _hashed_cache, _importers, _metadata_store
+
+"""
+    Geometry pre-pass baking every geometry file of a library into a normalised cache the importers read directly,
+    so the path wrangle and the attribute delete of GeometryImport.create_sop_read are cooked once per asset
+    instead of on every load and export.
+
+    A cached file has the path attribute set by the wrangle snippet of its library, every attribute but
+    KEEP_ATTRIBS removed (shop_materialpath included) and its primitives sorted by path, so material partitions
+    are contiguous. Files are cached next to the metadata, in <metadata>.geometry_cache, named after the content hash
+    of the source geometry and a digest of the bake settings, so a file is only baked again once its source or
+    the settings change. Content hashes are cached on the mtime and size of the geometry files.
+
+    Baking needs hython and runs in batch worker processes:
+        python -m usd_utils._geometry_cache assets_metadata.json --source-tag KB --workers 8
+"""
+
+# Path wrangle of the KitBash importer, the partitioning the headless geometry reader follows as well
+PATH_WRANGLE_CODE = "string split[] = split(s@shop_materialpath, '/');\ns@path = split[-1];"
+KEEP_ATTRIBS = ("P", "N", "uv", "path")
+CACHE_VERSION = 1
+
+
+def cache_dir(json_file):
+    """
+    Returns the geometry cache folder of a metadata file.
+    """
+    return os.path.splitext(json_file)[0] + ".geometry_cache"
+
+
+def library_wrangle_code(source_tag):
+    """
+    Returns the path wrangle snippet the geometry of a library is baked with: the one declared by its importer,
+    the KitBash one otherwise.
+    """
+    importer = _importers.registry().get(source_tag)
+    if importer is not None and importer.wrangle_code is not None:
+        return importer.wrangle_code
+    return PATH_WRANGLE_CODE
+
+
+def settings_key(wrangle_code, keep_attribs=KEEP_ATTRIBS):
+    """
+    Returns the digest of the bake settings, part of the name of every cached file.
+    """
+    settings = json.dumps([CACHE_VERSION, wrangle_code, sorted(keep_attribs)])
+    return hashlib.sha1(settings.encode("utf-8")).hexdigest()[:12]
+
+
+class GeometryCache(_hashed_cache.HashedCache):
+    """
+    Baked geometry keyed by the content hash of its source file and the bake settings.
+
+    :param path: Cache folder.
+    :param keep_attribs: Attributes kept in the baked files.
+    """
+
+    def __init__(self, path, keep_attribs=KEEP_ATTRIBS):
+        super(GeometryCache, self).__init__(path)
+        self.keep_attribs = tuple(keep_attribs)
+
+    def target_name(self, digest, wrangle_code=PATH_WRANGLE_CODE):
+        return "{}_{}.bgeo.sc".format(digest, settings_key(wrangle_code, self.keep_attribs))
+
+
+_networks = {}
+
+
+def bake_network(wrangle_code, keep_attribs=KEEP_ATTRIBS):
+    """
+    Returns the (file, output) SOPs of the network baking geometry with the given settings, built once per session.
+    """
+    import hou
+
+    key = settings_key(wrangle_code, keep_attribs)
+    network = _networks.get(key)
+    if network is None:
+        geo = hou.node("/obj").createNode("geo", "geometry_prepass_" + key)
+        file_sop = geo.createNode("file")
+
+        attrib_wrangle = file_sop.createOutputNode("attribwrangle")
+        attrib_wrangle.parm("class").set(1)
+        attrib_wrangle.parm("snippet").set(wrangle_code)
+
+        pattern = " ".join(["*"] + ["^" + name for name in keep_attribs])
+        delete = attrib_wrangle.createOutputNode("attribdelete")
+        for parm_name in ("ptdel", "vtxdel", "primdel", "dtldel"):
+            delete.parm(parm_name).set(pattern)
+
+        sort = delete.createOutputNode("sort")
+        sort.parm("primsort").set("attribute")
+        sort.parm("primattrib").set("path")
+
+        network = (file_sop, sort.createOutputNode("output"))
+        _networks[key] = network
+    return network
+
+
+def bake_geometry(geometry_file, target, wrangle_code=PATH_WRANGLE_CODE, keep_attribs=KEEP_ATTRIBS):
+    """
+    Cooks a geometry file through the bake network and writes the result to target.
+    """
+    file_sop, output = bake_network(wrangle_code, keep_attribs)
+    file_sop.parm("file").set(geometry_file)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Written under a temporary name with the same extensions, so the format is picked the same way
+    tmp_path = os.path.join(os.path.dirname(target), "tmp{}_{}".format(os.getpid(), os.path.basename(target)))
+    output.geometry().saveToFile(tmp_path)
+    os.replace(tmp_path, target)
+
+
+def run_shard(spec):
+    """
+    Bakes every geometry file of a shard in the current process, appending one result per asset
+    to the shard results file, the same way the batch conversion workers do.
+    """
+    with open(spec["results_file"], "a") as results_file:
+        for geometry_file in spec["assets"]:
+            result = {"geometry_file": geometry_file, "status": "ok", "error": None}
+            start = time.time()
+            try:
+                bake_geometry(geometry_file, spec["targets"][geometry_file], spec["wrangle_code"],
+                              spec["keep_attribs"])
+            except Exception:
+                result["status"] = "failed"
+                result["error"] = traceback.format_exc()
+            result["elapsed"] = time.time() - start
+            results_file.write(json.dumps(result) + "\n")
+            results_file.flush()
+
+
+def worker_command(interpreter, spec_file):
+    return [interpreter or "hython", "-m", "usd_utils._geometry_cache", "--worker", spec_file]
+
+
+def bake_library(cache, geometry_files, wrangle_code=PATH_WRANGLE_CODE, workers=1, interpreter=None):
+    """
+    Bakes the geometry files missing from the cache in a pool of worker processes and returns
+    the per-asset results. Files already baked with the same settings are not baked again.
+    """
+    from usd_utils import _batch
+
+    missing = cache.missing(geometry_files, wrangle_code)
+    cache.save()
+    assets = sorted(missing)
+    results = []
+    shards = _batch.shard(assets, workers) if assets else []
+    with tempfile.TemporaryDirectory(prefix="usd_geometry_cache_") as tmp_dir:
+        jobs = []
+        with ThreadPoolExecutor(max_workers=max(1, len(shards))) as pool:
+            for index, shard_assets in enumerate(shards):
+                spec_file = os.path.join(tmp_dir, "shard_{}.json".format(index))
+                spec = {"wrangle_code": wrangle_code, "keep_attribs": list(cache.keep_attribs),
+                        "assets": shard_assets,
+                        "targets": dict((geometry_file, missing[geometry_file]) for geometry_file in shard_assets),
+                        "results_file": os.path.join(tmp_dir, "results_{}.jsonl".format(index))}
+                with open(spec_file, "w") as output_file:
+                    json.dump(spec, output_file)
+                jobs.append(pool.submit(_batch.run_worker, worker_command(interpreter, spec_file), spec))
+            for job in jobs:
+                results.extend(job.result())
+    results.sort(key=lambda result: result["geometry_file"])
+    return results
+
+
+def format_summary(results, total, elapsed):
+    failed = [result for result in results if result["status"] != "ok"]
+    lines = ["geometry bake failed {}\n{}".format(result["geometry_file"], result["error"]) for result in failed]
+    lines.append("{} geometry files baked, {} failed, {} up to date in {:.2f}s".format(
+        len(results) - len(failed), len(failed), total - len(results), elapsed))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "--worker":
+        with open(argv[1], "r") as read_file:
+            run_shard(json.load(read_file))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Bake the geometry of a metadata library into the geometry cache.")
+    parser.add_argument("metadata", help="Path to the assets metadata file.")
+    parser.add_argument("--source-tag", required=True, help="Library tag, e.g. KB.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--interpreter", default=None, help="Interpreter running the workers. Defaults to hython.")
+    args = parser.parse_args(argv)
+
+    metadata = _metadata_store.load_metadata(args.metadata)
+    assets = [geometry_file for geometry_file, asset_name in _metadata_store.list_assets(metadata, args.source_tag)]
+    cache = GeometryCache(cache_dir(args.metadata))
+    start = time.time()
+    results = bake_library(cache, assets, library_wrangle_code(args.source_tag), args.workers, args.interpreter)
+    print(format_summary(results, len(assets), time.time() - start))
+    return 1 if any(result["status"] != "ok" for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
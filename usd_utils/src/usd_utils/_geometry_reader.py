@@ -0,0 +1,175 @@
+import importlib.util
+import os
+
+"""
+    Default geometry reader of the headless writer, choosing a reader by file type.
+
+    OBJ and USD geometry is read in plain python (usd-core for USD), so the headless backend converts it
+    without Houdini. Anything else, e.g. .bgeo.sc files and the baked files of the geometry cache, goes through
+    _hou_geometry_reader, which needs hython.
+
+    Partitions follow the ones of _hou_geometry_reader: polygons are grouped by the last component of their
+    material, usemtl for OBJ and the bound material for USD, and polygons without material go to "mesh".
+"""
+
+HOU_FREE_EXTENSIONS = (".obj", ".usd", ".usda", ".usdc")
+
+
+def needs_hou(geometry_file):
+    """
+    Returns True if the geometry file can only be read through hou.
+    """
+    return os.path.splitext(geometry_file)[1].lower() not in HOU_FREE_EXTENSIONS
+
+
+def hou_available():
+    return importlib.util.find_spec("hou") is not None
+
+
+class _Partitions:
+    """
+    Polygons grouped by partition name, each partition with its own compact point list.
+    """
+
+    def __init__(self, with_st):
+        self.with_st = with_st
+        self.partitions = {}
+        self._point_maps = {}
+
+    def add_face(self, name, point_keys, position, st=None):
+        """
+        Adds a polygon to a partition. Its points are given as keys, mapped to their position by position,
+        so points shared by several polygons are only added once per partition.
+        """
+        name = name.split("/")[-1] or "mesh"
+        mesh = self.partitions.get(name)
+        if mesh is None:
+            mesh = {"points": [], "face_vertex_counts": [], "face_vertex_indices": [],
+                    "st": [] if self.with_st else None}
+            self.partitions[name] = mesh
+            self._point_maps[name] = {}
+        point_map = self._point_maps[name]
+
+        mesh["face_vertex_counts"].append(len(point_keys))
+        for index, key in enumerate(point_keys):
+            local = point_map.get(key)
+            if local is None:
+                local = len(mesh["points"])
+                point_map[key] = local
+                mesh["points"].append(tuple(position(key)))
+            mesh["face_vertex_indices"].append(local)
+            if self.with_st:
+                mesh["st"].append(tuple(st[index]) if st is not None else (0.0, 0.0))
+
+
+def _obj_index(token, count):
+    index = int(token)
+    return index - 1 if index > 0 else count + index
+
+
+def read_obj(geometry_file):
+    """
+    Reads the polygons of an OBJ file, partitioned by their usemtl material.
+    """
+    positions = []
+    uvs = []
+    faces = []
+    material = ""
+    with open(geometry_file, "r") as read_file:
+        for line in read_file:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == "v":
+                positions.append(tuple(float(value) for value in fields[1:4]))
+            elif fields[0] == "vt":
+                uvs.append(tuple(float(value) for value in fields[1:3]))
+            elif fields[0] == "usemtl":
+                material = fields[1] if len(fields) > 1 else ""
+            elif fields[0] == "f":
+                points = []
+                face_uvs = []
+                for vertex in fields[1:]:
+                    tokens = vertex.split("/")
+                    points.append(_obj_index(tokens[0], len(positions)))
+                    if len(tokens) > 1 and tokens[1]:
+                        face_uvs.append(uvs[_obj_index(tokens[1], len(uvs))])
+                faces.append((material, points, face_uvs if len(face_uvs) == len(points) else None))
+
+    partitions = _Partitions(with_st=bool(uvs))
+    for name, points, face_uvs in faces:
+        partitions.add_face(name, points, positions.__getitem__, face_uvs)
+    return partitions.partitions
+
+
+def _material_name(binding_api):
+    material = binding_api.ComputeBoundMaterial()[0]
+    return material.GetPrim().GetName() if material else ""
+
+
+def read_usd(geometry_file):
+    """
+    Reads the meshes of a USD file in world space, partitioned by their bound material.
+    Faces of material GeomSubsets take the material of their subset.
+    """
+    from pxr import Usd, UsdGeom, UsdShade
+
+    stage = Usd.Stage.Open(geometry_file)
+    meshes = [UsdGeom.Mesh(prim) for prim in stage.Traverse() if prim.IsA(UsdGeom.Mesh)]
+    partitions = _Partitions(with_st=any(UsdGeom.PrimvarsAPI(mesh).HasPrimvar("st") for mesh in meshes))
+    for mesh_index, mesh in enumerate(meshes):
+        prim = mesh.GetPrim()
+        transform = mesh.ComputeLocalToWorldTransform(Usd.TimeCode.Default())
+        positions = [tuple(transform.Transform(point)) for point in mesh.GetPointsAttr().Get() or []]
+        counts = mesh.GetFaceVertexCountsAttr().Get() or []
+        indices = mesh.GetFaceVertexIndicesAttr().Get() or []
+
+        face_materials = [_material_name(UsdShade.MaterialBindingAPI(prim))] * len(counts)
+        for subset in UsdShade.MaterialBindingAPI(prim).GetMaterialBindSubsets():
+            name = _material_name(UsdShade.MaterialBindingAPI(subset.GetPrim()))
+            for face in subset.GetIndicesAttr().Get() or []:
+                face_materials[face] = name
+
+        st = None
+        primvar = UsdGeom.PrimvarsAPI(mesh).GetPrimvar("st")
+        if primvar and primvar.HasValue():
+            values = primvar.ComputeFlattened()
+            if primvar.GetInterpolation() in (UsdGeom.Tokens.vertex, UsdGeom.Tokens.varying):
+                st = [values[index] for index in indices]
+            elif primvar.GetInterpolation() == UsdGeom.Tokens.faceVarying:
+                st = list(values)
+
+        # Points are keyed by mesh as well, so meshes sharing a partition never share points
+        def position(key, positions=positions):
+            return positions[key[1]]
+
+        start = 0
+        for face, count in enumerate(counts):
+            points = [(mesh_index, index) for index in indices[start:start + count]]
+            face_st = st[start:start + count] if st is not None else None
+            partitions.add_face(face_materials[face], points, position, face_st)
+            start += count
+    return partitions.partitions
+
+
+def read_geometry(geometry_file, partition_attrib="shop_materialpath"):
+    """
+    Returns the partitions of a geometry file, see _hou_geometry_reader.read_geometry for their layout.
+    partition_attrib is only used by the hou reader, OBJ and USD files are partitioned by material.
+    """
+    extension = os.path.splitext(geometry_file)[1].lower()
+    if extension == ".obj":
+        return read_obj(geometry_file)
+    if extension in HOU_FREE_EXTENSIONS:
+        return read_usd(geometry_file)
+    if not hou_available():
+        raise ValueError("Reading {} needs Houdini: run the workers in hython or convert the geometry to "
+                         "{}".format(geometry_file, "/".join(HOU_FREE_EXTENSIONS)))
+    from usd_utils import _hou_geometry_reader
+    return _hou_geometry_reader.read_geometry(geometry_file, partition_attrib)
+
+
+# Baked files of the geometry cache are .bgeo.sc, so USDWriter only reads them through this reader
+# when hou is there to read them, see _geometry_cache
+if hou_available():
+    read_geometry.partition_attrib = "shop_materialpath"
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+    Content hashing shared by the on-disk caches (texture conversions, geometry cache, thumbnails).
+
+    Content hashes are cached on the mtime and size of their files, so unchanged files are not read again.
+    HashedCache is a cache folder of files derived from source files and named after the content hash
+    of their source, so identical sources share one file and a file is only made again once its source changes.
+    The hashes of the sources are saved in the index.json of the folder.
+"""
+
+INDEX_NAME = "index.json"
+
+
+def content_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as read_file:
+        for chunk in iter(lambda: read_file.read(1048576), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class ContentHashes:
+    """
+    Content hashes of files keyed by path, each one cached with the mtime and size it was computed for.
+
+    :param hashes: Saved hashes as {path: [[mtime, size], digest]}.
+    """
+
+    def __init__(self, hashes=None):
+        self.hashes = dict(hashes or {})
+        self.changed = False
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Returns the content hash of a file, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature = [stat.st_mtime_ns, stat.st_size]
+        with self._lock:
+            cached = self.hashes.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = content_hash(path)
+        with self._lock:
+            self.hashes[path] = [signature, digest]
+            self.changed = True
+        return digest
+
+    def snapshot(self):
+        """
+        Returns a copy of the hashes to save, clearing the changed flag.
+        """
+        with self._lock:
+            self.changed = False
+            return dict(self.hashes)
+
+
+class HashedCache:
+    """
+    Cache folder of files derived from source files. Subclasses name the derived files in target_name,
+    from the content hash of the source and their settings.
+
+    :param path: Cache folder.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        hashes = None
+        index_file = os.path.join(path, INDEX_NAME)
+        if os.path.exists(index_file):
+            with open(index_file, "r") as read_file:
+                hashes = json.load(read_file)
+        self.hashes = ContentHashes(hashes)
+
+    def target_name(self, digest, *settings):
+        raise NotImplementedError
+
+    def target_path(self, source_file, *settings):
+        """
+        Returns where the file derived from a source file is cached, or None if the source file does not exist.
+        """
+        digest = self.hashes.get(source_file)
+        if digest is None:
+            return None
+        return os.path.join(self.path, self.target_name(digest, *settings)).replace(os.sep, "/")
+
+    def lookup(self, source_file, *settings):
+        """
+        Returns the cached file derived from a source file, or None if it was not made yet.
+        """
+        path = self.target_path(source_file, *settings)
+        return path if path is not None and os.path.exists(path) else None
+
+    def missing(self, source_files, *settings, workers=8):
+        """
+        Returns {source file: target path} of the files to make, one source file per content.
+        Sources are hashed in a thread pool.
+        """
+        def target_path(source_file):
+            return self.target_path(source_file, *settings)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            paths = dict(zip(source_files, pool.map(target_path, source_files)))
+        missing = {}
+        targets = set()
+        for source_file, path in paths.items():
+            if path is not None and path not in targets and not os.path.exists(path):
+                targets.add(path)
+                missing[source_file] = path
+        return missing
+
+    def save(self):
+        if not self.hashes.changed:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        index_file = os.path.join(self.path, INDEX_NAME)
+        tmp_path = index_file + ".tmp"
+        with open(tmp_path, "w") as output_file:
+            json.dump(self.hashes.snapshot(), output_file)
+        os.replace(tmp_path, index_file)
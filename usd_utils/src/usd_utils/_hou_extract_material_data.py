@@ -1,9 +1,14 @@
-import json
+import collections
 
 import hou
 
+from usd_utils import _catalog, _metadata_store, _record_log, _texture_usage
+
 """
     This class extracts material metadata from selected geometry in a Houdini scene and saves it as JSON.
+    Every asset is appended to the record log of the JSON file as soon as it is read (see _record_log),
+    compact() merges the log back into the JSON file.
+    The texture usage index of the metadata (see _texture_usage) is updated along with every asset.
 
     :param json_file: Path to the JSON metadata file to read from and write to.
     :param source_tag: Identifier tag for the source (e.g., 'MS', 'KB') to separate assets from different libraries
@@ -18,75 +23,65 @@ class ExtractMaterialsData:
     def read_geo_file(self, node):
         """
         Traverse the node graph from the given starting node and collect all file nodes.
+        Every node is visited once, so file nodes shared by several branches are collected once.
         """
-        queue = [node]
+        queue = collections.deque([node])
+        visited = {node}
         files = []
-        while len(queue) > 0:
-            current = queue.pop(0)
+        while queue:
+            current = queue.popleft()
             if current.type().name() == "file":  # could be added another option to read from different types of file
                 files.append(current)
             for node in current.inputs():
-                queue.append(node)
+                if node not in visited:
+                    visited.add(node)
+                    queue.append(node)
         return files
 
     def get_geometry_data(self, node):
         """
         Extract geometry and material texture data from file nodes,
-        updates or creates metadata entries in the JSON file.
+        updates or creates metadata entries in the catalog or the record log of the JSON file.
         """
-        # open json file
-        with open(self.metadata, "r") as read_file:
-            read = json.load(read_file)
+        # Every asset is written as soon as it is read, so an interrupted extraction keeps what it already read
+        catalog = None
+        record_log = None
+        if _catalog.is_catalog(self.metadata):
+            catalog = _metadata_store.open_catalog(self.metadata)[0]
+        else:
+            record_log = _record_log.RecordLog(self.metadata)
+        usage = _texture_usage.open_index(self.metadata)
 
         files = self.read_geo_file(node)
+        # Textures of every material node read so far, shared by all files using the material
+        shaders = {}
         with hou.InterruptableOperation("Performing Tasks", long_operation_name="Saving geometry data",
                                         open_interrupt_dialog=True) as op:
 
-            for file in files:
+            for index, file in enumerate(files):
                 geometry_file = file.parm("file").evalAsString()
-                op.updateLongProgress(files.index(file) / float(len(files))), "{}/{}".format(files.index(file) + 1,
-                                                                                             len(files))
+                op.updateLongProgress(index / float(len(files)), "{}/{}".format(index + 1, len(files)))
 
                 # Getting geo name
                 geo_name = self.get_geometry_name(node, geometry_file, self.source_tag)
 
-                try:
-                    # Writing geometry file name and initializing textures dictionary
-                    read[self.source_tag][geometry_file] = {"asset_name": geo_name, "materials": {}}
-                except:
-                    read[self.source_tag] = {geometry_file: {}}
-                    read[self.source_tag][geometry_file] = {"asset_name": geo_name, "materials": {}}
-
-                # Packing geo based on material path
-                pack_all = node.input(files.index(file)).createOutputNode(
-                    "pack")
-                pack_all.parm("packbyname").set(True)
-                pack_all.parm("nameattribute").set("shop_materialpath")
-                pack_all.parm("transfer_attributes").set("shop_materialpath")
-                hou_geo = pack_all.geometry()
-
-                # Getting textures data
-                for mat in hou_geo.primStringAttribValues("shop_materialpath"):
-                    if hou.node(mat).type().name() == "principledshader::2.0":
-                        shader = hou.node(mat)
-                    else:
-                        shader = hou.node(mat + "/principledshader1")
+                # Initializing geometry entry and textures dictionary
+                entry = {"asset_name": geo_name, "materials": {}}
 
+                # Unique material paths used by the cooked geometry, in the order of the attribute string table
+                hou_geo = node.input(index).geometry()
+                for mat in self.get_material_paths(hou_geo):
                     mat_name = mat.split("/")[-1]
-                    read[self.source_tag][geometry_file]["materials"][mat_name] = {"shop_materialpath": mat,
-                                                                                   "textures": {}}
-
-                    for parm in shader.parms():
-                        if parm.name().endswith("texture"):
-                            if parm.evalAsString() != "":
-                                read[self.source_tag][geometry_file]["materials"][mat_name]["textures"][
-                                    parm.name()] = parm.evalAsString()
+                    entry["materials"][mat_name] = {"shop_materialpath": mat,
+                                                    "textures": dict(self.get_material_textures(mat, shaders))}
 
-                # Pack remove
-                pack_all.destroy()
-            # Writing json file
-            with open(self.metadata, "w") as output_file:
-                json.dump(read, output_file, indent=4)
+                if catalog is not None:
+                    catalog.add_asset(self.source_tag, geometry_file, entry)
+                else:
+                    record_log.append(self.source_tag, geometry_file, entry)
+                usage.update_asset(self.source_tag, geometry_file, entry, commit=False)
+        usage.commit()
+        usage.close()
 
         if hou.isUIAvailable():
             if len(files) > 1:
@@ -96,6 +91,56 @@ class ExtractMaterialsData:
                 text = "{} asset added to metadata".format(len(files))
                 hou.ui.displayMessage(text)
 
+    def compact(self):
+        """
+        Merges the record log into the JSON file, catalogs need no compaction.
+        """
+        if _catalog.is_catalog(self.metadata):
+            return
+        usage = _texture_usage.TextureUsageIndex(self.metadata)
+        current = usage.is_current()
+        if _record_log.RecordLog(self.metadata).compact():
+            _metadata_store.invalidate(self.metadata)
+            # Compaction moves the assets into the JSON file without changing them
+            if current:
+                usage.mark_current()
+        usage.close()
+
+    def get_material_paths(self, hou_geo):
+        """
+        Returns the unique shop_materialpath values used by the primitives of a geometry, in the order of the
+        string table of the attribute.
+        """
+        if hou_geo is None:
+            return []
+        attrib = hou_geo.findPrimAttrib("shop_materialpath")
+        if attrib is None:
+            return []
+        # The string table can keep strings no primitive uses any more, e.g. after a blast,
+        # which would add materials for nothing
+        used = set(hou_geo.primStringAttribValues("shop_materialpath"))
+        return [mat for mat in attrib.strings() if mat and mat in used]
+
+    def get_material_textures(self, mat, shaders):
+        """
+        Returns the non-empty texture parameters of a material, reading its shader parameters only once.
+        """
+        textures = shaders.get(mat)
+        if textures is None:
+            if hou.node(mat).type().name() == "principledshader::2.0":
+                shader = hou.node(mat)
+            else:
+                shader = hou.node(mat + "/principledshader1")
+
+            textures = {}
+            for parm in shader.parms():
+                if parm.name().endswith("texture"):
+                    value = parm.evalAsString()
+                    if value != "":
+                        textures[parm.name()] = value
+            shaders[mat] = textures
+        return textures
+
     def get_geometry_name(self, node, geometry_file, source_tag):
         """
          Extracts asset name from the geometry file path.
@@ -3,6 +3,9 @@ import os
 
 import hou
 
+from usd_utils import (_asset_paths, _geometry_cache, _importers, _metadata_store, _texture_resolver,
+                       _usd_writer)
+
 """
  Base class to import geometry and material data from JSON metadata into Houdini, 
     build a USD pipeline with geometry, materials, and optionally execute a USD ROP.
@@ -12,12 +15,23 @@ import hou
     :param source_tag: Tag representing the source of metadata entries (e.g., 'MS', 'KB').
     :param add_displacement: If True, adds displacement textures to materials.
     :param add_extra_tex: If True, adds extra textures based on schema.
+    :param shared_materials: If True, materials are written once to a shared materials layer and referenced.
+    :param proxy_ratios: Ratios of faces kept by the proxy geometry, no proxy geometry if empty.
+    :param payload: If True, the geometry is written to a separate layer and loaded as a payload.
+    :param geometry_cache: If True, geometry baked by the geometry pre-pass is read instead of the source files.
 
 """
 
 
 class GeometryImport:
-    def __init__(self, json_file, import_render, source_tag, add_displacement=False, add_extra_tex=False):
+    template_library_name = "material_templates"
+    # Python Script LOP holding the instanced references of the converted assets
+    instances_node_name = "asset_instances"
+    # Cached texture directory listings, shared by all importers
+    texture_resolver = _texture_resolver.TextureResolver()
+
+    def __init__(self, json_file, import_render, source_tag, add_displacement=False, add_extra_tex=False,
+                 shared_materials=False, proxy_ratios=None, payload=False, geometry_cache=False):
         self.stage_path = "stage/"
         self.metadata = json_file
         self.import_render = import_render
@@ -34,9 +48,19 @@ class GeometryImport:
         self.wrangle_code = ""
         self.add_extra_tex = add_extra_tex
         self.add_displacement = add_displacement
-
-        with open(self.metadata, "r") as read_file:
-            self.metadata_read = json.load(read_file)
+        self.shared_materials = shared_materials
+        self.proxy_ratios = list(proxy_ratios or [])
+        self.payload = payload
+        # Material networks built by this importer, keyed by material_layout. They depend on its options,
+        # so they are not shared with other importers
+        self.material_templates = {}
+        self._template_library = None
+        # Baked geometry read instead of the source files when available, see _geometry_cache
+        self.geometry_cache = None
+        if geometry_cache:
+            self.geometry_cache = _geometry_cache.GeometryCache(_geometry_cache.cache_dir(json_file))
+
+        self.metadata_read = _metadata_store.load_metadata(self.metadata)
 
         # Create main usd template based on json file data
 
@@ -47,6 +71,22 @@ class GeometryImport:
         """
         pass
 
+    def count_nodes(self):
+        """
+        Returns the number of nodes under the stage network, used as a profiling counter.
+        """
+        return len(hou.node(self.stage_path).allSubChildren())
+
+    def release_memory(self, full=False):
+        """
+        Clears the cooked SOP geometry Houdini keeps after an asset was written, called between assets of a batch.
+        With full, the cached texture directory listings are dropped as well.
+        The material templates are kept, they are reused by the next assets.
+        """
+        hou.hscript("sopcache -c")
+        if full:
+            self.texture_resolver.clear()
+
     def create_graft_stages(self):
         """
         Creates Graft Stage node
@@ -58,6 +98,7 @@ class GeometryImport:
         """
         Creates a SOP Create node. Populates it with File, Attribute Wrangle, Delete, and Output sub-nodes.
         Imports a .bgeo file and populates the corresponding parameters accordingly.
+        Geometry baked by the geometry cache already has its path attribute, and is read by the File node alone.
         """
         # create Sop read
         sop_create = hou.node(self.stage_path).createNode("sopcreate",
@@ -71,9 +112,16 @@ class GeometryImport:
         sop_create.parm("enable_subsetgroups").set(True)
         sop_create.parm("subsetgroups").set("*")
 
+        cached = None
+        if self.geometry_cache is not None:
+            cached = self.geometry_cache.lookup(geometry_file, wrangle_code)
+
         # create file sop
         file_sop = hou.node(sop_create.path() + "/sopnet/create").createNode("file")
-        file_sop.parm("file").set(geometry_file)
+        file_sop.parm("file").set(cached or geometry_file)
+        if cached is not None:
+            file_sop.createOutputNode("output")
+            return sop_create
 
         # attrib wrangle
         attrib_wrangle = file_sop.createOutputNode("attribwrangle")
@@ -112,12 +160,7 @@ class GeometryImport:
         Creates LOP USD OUT node
         """
         usd_rop = hou.node(self.stage_path).createNode("usd_rop")
-        output_path = geometry_file.split("/")
-
-        output_path = output_path[:len(output_path) - 2]
-
-        output_path = "/".join(output_path) + "/" + "usd" + "/" + metadata[source_tag][geometry_file][
-            "asset_name"] + ".usd"
+        output_path = _asset_paths.usd_output_path(geometry_file, metadata[source_tag][geometry_file]["asset_name"])
         usd_rop.parm("lopoutput").set(output_path)
         return usd_rop
 
@@ -125,12 +168,12 @@ class GeometryImport:
         """
         Builds a materialx shader network inside the materiallibrary node,
         wiring textures based on parameters and texture schemas.
+        Materials with a texture slot layout that was already built are copied from its template
+        and only get their file parameters changed.
         """
 
         # Read schema to convert Mantra texture entries to MaterialX
-        with open(self.parameters_scheme, "r") as scheme_file:
-            scheme_read = json.load(scheme_file)
-        schema = scheme_read[self.import_render]
+        schema = _importers.texture_slots(self.source_tag, self.import_render, self.parameters_scheme)
 
         mat_lib_path = hou.node(mat_lib.path())
 
@@ -138,6 +181,18 @@ class GeometryImport:
 
         # Create a MaterialX node for each material, generate textures, and connect everything accordingly
         for mat in _materials:
+            textures = _materials[mat]["textures"]
+            layout = self.material_layout(textures)
+            template = self.material_templates.get(layout)
+            if template is not None and hou.node(template["path"]) is not None:
+                mat_x = hou.copyNodesTo([hou.node(template["path"])], mat_lib_path)[0]
+                mat_x.setName(mat, unique_name=True)
+                for node_name, source in template["files"].items():
+                    hou.node(mat_x.path() + "/" + node_name).parm("file").set(self.template_texture(textures, source))
+                continue
+
+            # Texture nodes of the network and where their file comes from, to reuse it as a template
+            files = {}
             mat_x = mat_lib_path.createNode("subnet", mat)
             mat_x.setMaterialFlag(True)
             output = hou.node(mat_x.path() + "/suboutput1")
@@ -145,46 +200,232 @@ class GeometryImport:
             mtlx_diplacement = output.createInputNode(1, "mtlxdisplacement")
             mat_properties = output.createInputNode(2, "kma_material_properties")
 
-            for texture in _materials[mat]["textures"]:
+            for texture in textures:
+                # Skipped textures get no node, an unwired one would keep its file in the template
+                if texture not in schema:
+                    print("texture skipped {}".format(textures[texture]))
+                    continue
                 texture_node = hou.node(mat_x.path()).createNode("mtlximage")
                 try:
                     input = mtlx_st_surface.inputIndex(schema[texture])
                     mtlx_st_surface.setInput(input, texture_node)
-                    texture_node.parm("file").set(_materials[mat]["textures"][texture])
-                except:
-                    print("texture skipped {}".format(format(_materials[mat]["textures"][texture])))
+                except hou.Error:
+                    texture_node.destroy()
+                    print("texture skipped {}".format(textures[texture]))
+                    continue
+                texture_node.parm("file").set(textures[texture])
+                files[texture_node.name()] = ("slot", texture)
 
             # If add extra textures set to True AO and displacement textures will be created based on texture schema
-
+            # Only extra textures found on disk are added
+            extras = self.extra_textures(textures)
             if self.add_extra_tex or self.add_displacement:
-                with open(self.texture_schema, "r") as tex_schema_file:
-                    tex_schema_read = json.load(tex_schema_file)
+                tex_schema_read = _importers.texture_inputs(self.source_tag, self.texture_schema)
 
             if self.add_extra_tex:
-                tex_schema = tex_schema_read[self.source_tag]["surface"]
+                tex_schema = tex_schema_read.get("surface", {})
                 for name in tex_schema:
-                    _tex_data = list(_materials[mat]["textures"].items())[0]
-                    new_tex = self.patch_texture(_tex_data[1], name)
-                    self.add_texture(new_tex, mat_x, mtlx_st_surface, tex_schema[name])
+                    if name not in extras:
+                        continue
+                    texture_node = self.add_texture(extras[name], mat_x, mtlx_st_surface, tex_schema[name])
+                    files[texture_node.name()] = ("extra", name)
             if self.add_displacement:
-                tex_schema = tex_schema_read[self.source_tag]["displacement"]
+                tex_schema = tex_schema_read.get("displacement", {})
                 for name in tex_schema:
-                    _tex_data = list(_materials[mat]["textures"].items())[0]
-                    new_tex = self.patch_texture(_tex_data[1], name)
-                    self.add_texture(new_tex, mat_x, mtlx_diplacement, tex_schema[name])
+                    if name not in extras:
+                        continue
+                    texture_node = self.add_texture(extras[name], mat_x, mtlx_diplacement, tex_schema[name])
+                    files[texture_node.name()] = ("extra", name)
                     mtlx_diplacement.parm("scale").set(0.01)
             mat_x.layoutChildren()
+
+            template_node = hou.copyNodesTo([mat_x], self.template_library())[0]
+            self.material_templates[layout] = {"path": template_node.path(), "files": files}
         mat_lib.layoutChildren()
 
+    def create_shared_material_refs(self, geometry_file):
+        """
+        Writes the missing materials of the asset to its shared materials layer and creates
+        a Python Script LOP referencing each of them under /main/materials.
+        """
+        writer = _usd_writer.USDWriter(self.metadata, self.import_render, self.source_tag, self.add_displacement,
+                                       self.add_extra_tex, shared_materials=True,
+                                       geometry_cache=self.geometry_cache)
+        asset_name = self.metadata_read[self.source_tag][geometry_file]["asset_name"]
+        layer_path = writer.write_shared_materials(geometry_file,
+                                                   _asset_paths.usd_output_path(geometry_file, asset_name))
+        _materials = list(self.metadata_read[self.source_tag][geometry_file]["materials"].keys())
+
+        mat_refs = hou.node(self.stage_path).createNode("pythonscript", "shared_materials")
+        mat_refs.parm("python").set(
+            "from pxr import UsdShade\n"
+            "stage = hou.pwd().editableStage()\n"
+            "for mat in {!r}:\n"
+            "    material = UsdShade.Material.Define(stage, '/main/materials/' + mat)\n"
+            "    material.GetPrim().GetReferences().AddReference({!r}, '/materials/' + mat)\n".format(_materials,
+                                                                                                  layer_path))
+        return mat_refs
+
+    def create_payload_refs(self, geometry_file):
+        """
+        Writes the geometry layer of the asset and creates a Python Script LOP loading it as a payload
+        at /main/<asset>/<asset>, with the asset kind and extentsHint set on /main/<asset>.
+        """
+        writer = _usd_writer.USDWriter(self.metadata, self.import_render, self.source_tag, self.add_displacement,
+                                       self.add_extra_tex, payload=True,
+                                       geometry_cache=self.geometry_cache)
+        asset_name = self.metadata_read[self.source_tag][geometry_file]["asset_name"]
+        layer_path = writer.write_payload_layer(geometry_file, asset_name,
+                                                _asset_paths.usd_output_path(geometry_file, asset_name))
+
+        payload_refs = hou.node(self.stage_path).createNode("pythonscript", asset_name)
+        payload_refs.parm("python").set(
+            "from pxr import Kind, Usd, UsdGeom\n"
+            "stage = hou.pwd().editableStage()\n"
+            "asset = UsdGeom.Xform.Define(stage, {asset!r})\n"
+            "Usd.ModelAPI(asset.GetPrim()).SetKind(Kind.Tokens.component)\n"
+            "root = UsdGeom.Xform.Define(stage, {root!r})\n"
+            "root.GetPrim().GetPayloads().AddPayload({layer!r}, root.GetPath())\n"
+            "model = UsdGeom.ModelAPI(asset.GetPrim())\n"
+            "bbox_cache = UsdGeom.BBoxCache(Usd.TimeCode.Default(), [UsdGeom.Tokens.default_, UsdGeom.Tokens.render])\n"
+            "model.SetExtentsHint(model.ComputeExtentsHint(bbox_cache))\n".format(
+                asset="/main/" + asset_name, root="/main/{0}/{0}".format(asset_name), layer=layer_path))
+        return payload_refs
+
+    def create_proxy_refs(self, geometry_file):
+        """
+        Writes the proxy layer of the asset, unless it is up to date, and creates a Python Script LOP
+        referencing it at /main/<asset>/proxy with purpose proxy, giving the render geometry purpose render.
+        """
+        writer = _usd_writer.USDWriter(self.metadata, self.import_render, self.source_tag, self.add_displacement,
+                                       self.add_extra_tex, proxy_ratios=self.proxy_ratios,
+                                       geometry_cache=self.geometry_cache)
+        asset_name = self.metadata_read[self.source_tag][geometry_file]["asset_name"]
+        layer_path = writer.write_proxy_layer(geometry_file, _asset_paths.usd_output_path(geometry_file, asset_name))
+
+        proxy_refs = hou.node(self.stage_path).createNode("pythonscript", "proxy_geometry")
+        proxy_refs.parm("python").set(
+            "from pxr import UsdGeom\n"
+            "stage = hou.pwd().editableStage()\n"
+            "render = UsdGeom.Imageable(stage.GetPrimAtPath({render!r}))\n"
+            "render.CreatePurposeAttr(UsdGeom.Tokens.render)\n"
+            "proxy = UsdGeom.Xform.Define(stage, {proxy!r})\n"
+            "proxy.CreatePurposeAttr(UsdGeom.Tokens.proxy)\n"
+            "proxy.GetPrim().GetReferences().AddReference({layer!r})\n"
+            "render.CreateProxyPrimRel().SetTargets([proxy.GetPath()])\n".format(
+                render="/main/{0}/{0}".format(asset_name), proxy="/main/{}/proxy".format(asset_name),
+                layer=layer_path))
+        return proxy_refs
+
+    def create_instance_refs(self, geometry_files):
+        """
+        References the converted .usd files of the assets at /main/<asset> as instanceable prims,
+        so repeated assets share a single prototype instead of being cooked again.
+        Every call adds one instance per asset to the same Python Script LOP, which is returned.
+        """
+        instance_refs = hou.node(self.stage_path + self.instances_node_name)
+        if instance_refs is None:
+            instance_refs = hou.node(self.stage_path).createNode("pythonscript", self.instances_node_name)
+            instance_refs.parm("python").set(
+                "import json\n"
+                "from pxr import Kind, Usd, UsdGeom\n"
+                "stage = hou.pwd().editableStage()\n"
+                "main = UsdGeom.Xform.Define(stage, '/main')\n"
+                "Usd.ModelAPI(main.GetPrim()).SetKind(Kind.Tokens.assembly)\n"
+                "for prim_path, layer in json.loads(hou.pwd().userData('instances') or '[]'):\n"
+                "    prim = UsdGeom.Xform.Define(stage, prim_path).GetPrim()\n"
+                "    prim.GetReferences().AddReference(layer)\n"
+                "    prim.SetInstanceable(True)\n")
+            instance_refs.setDisplayFlag(True)
+
+        instances = json.loads(instance_refs.userData("instances") or "[]")
+        prim_paths = set(prim_path for prim_path, layer in instances)
+        for geometry_file in geometry_files:
+            asset_name = self.metadata_read[self.source_tag][geometry_file]["asset_name"]
+            prim_path = "/main/" + asset_name
+            copy = 0
+            while prim_path in prim_paths:
+                copy += 1
+                prim_path = "/main/{}_{}".format(asset_name, copy)
+            prim_paths.add(prim_path)
+            instances.append([prim_path, _asset_paths.usd_output_path(geometry_file, asset_name)])
+        instance_refs.setUserData("instances", json.dumps(instances))
+        # User data changes do not dirty the node
+        instance_refs.cook(force=True)
+        return instance_refs
+
+    def material_layout(self, textures):
+        """
+        Key of the material templates: everything but the texture file paths that shapes a material network.
+        """
+        return (self.source_tag, self.import_render, tuple(sorted(textures)), self.add_extra_tex,
+                self.add_displacement, tuple(self.extra_textures(textures)))
+
+    def extra_textures(self, textures):
+        """
+        Returns the extra textures of a material found on disk, keyed by their inputs schema name.
+        They are derived from the first texture of the material.
+        """
+        if not textures:
+            return {}
+        source = list(textures.values())[0]
+        extras = {}
+        for name in _texture_resolver.extra_texture_names(self.texture_schema, self.source_tag, self.add_extra_tex,
+                                                          self.add_displacement):
+            texture = self.texture_resolver.resolve_variant(source, name)
+            if texture is not None:
+                extras[name] = texture
+        return extras
+
+    def check_textures(self, geometry_files, refresh=True):
+        """
+        Checks every texture of the given assets, listing each texture directory once, before anything is built.
+        Returns the missing textures keyed by geometry file.
+
+        :param refresh: If True, the cached directory listings are checked against the disk once first.
+            The checks of single assets during a batch pass False and reuse the listings of the batch.
+        """
+        if refresh:
+            self.texture_resolver.refresh()
+        extra_names = _texture_resolver.extra_texture_names(self.texture_schema, self.source_tag,
+                                                            self.add_extra_tex, self.add_displacement)
+        return _texture_resolver.missing_textures(self.texture_resolver, self.metadata_read[self.source_tag],
+                                                  geometry_files, extra_names)
+
+    def template_library(self):
+        """
+        Returns the hidden material library holding the material templates of this importer, creating it if needed.
+        It is not connected to anything, so it never ends up in a stage. A library left by a previous importer
+        is replaced, its templates may have been built with other options.
+        """
+        template_lib = hou.node(self.stage_path + self.template_library_name)
+        if template_lib is not None and self._template_library is None:
+            template_lib.destroy()
+            template_lib = None
+        if template_lib is None:
+            template_lib = hou.node(self.stage_path).createNode("materiallibrary", self.template_library_name)
+            template_lib.bypass(True)
+            template_lib.hide(True)
+            self._template_library = template_lib.path()
+        return template_lib
+
+    def template_texture(self, textures, source):
+        """
+        Returns the file of a template texture node: a texture of the material, or an extra texture
+        derived from its first one.
+        """
+        kind, name = source
+        if kind == "slot":
+            return textures[name]
+        return self.texture_resolver.resolve_variant(list(textures.values())[0], name)
+
         # Texture name editing
 
     def patch_texture(self, source_texture, target_text_name):
         """
         Generates a new texture filename by swapping the suffix.
         """
-        _st_end = source_texture.split("/")[-1].split(".")[0].split("_")[-1]
-        texture = source_texture.replace(_st_end, target_text_name)
-        return texture
+        return _asset_paths.patch_texture(source_texture, target_text_name)
 
     def add_texture(self, texture, mat, mtlx_node, mtlx_input_name):
         """
@@ -194,6 +435,7 @@ class GeometryImport:
         texture_node.parm("file").set(texture)
         input_d = mtlx_node.inputIndex(mtlx_input_name)
         mtlx_node.setInput(input_d, texture_node)
+        return texture_node
 
     def convert_to_usd(self, remove_template=True):
         """
@@ -201,12 +443,14 @@ class GeometryImport:
         optionally cleaning up the stage after each.
 
         """
-        with open(self.metadata, "r") as read_file:
-            read = json.load(read_file)
-        geo_files = list(read.keys())
+        self.metadata_read = _metadata_store.load_metadata(self.metadata)
+        geo_files = list(self.metadata_read[self.source_tag].keys())
+        # Texture directories are listed in parallel up front, the templates then reuse the listings
+        self.check_textures(geo_files)
         stage = hou.node(self.stage_path)
         for file in geo_files:
             self.create_main_template(file)
             if remove_template is True:
                 for child in stage.children():
-                    child.destroy()
+                    if child.name() != self.template_library_name:
+                        child.destroy()
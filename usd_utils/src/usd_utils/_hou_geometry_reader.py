@@ -0,0 +1,68 @@
+import hou
+
+"""
+    Reads a geometry file into plain python mesh data without creating any nodes.
+    Works in hython without a Houdini UI.
+
+    Polygons are split into partitions named after the last component of their shop_materialpath,
+    the same way the attribwrangle created by GeometryImport.create_sop_read sets the path attribute.
+"""
+
+
+def read_geometry(geometry_file, partition_attrib="shop_materialpath"):
+    """
+    Loads a geometry file and returns its polygons grouped by partition name:
+        {partition: {"points": [(x, y, z), ...], "face_vertex_counts": [...], "face_vertex_indices": [...],
+                     "st": [(u, v), ...] or None}}
+    """
+    geo = hou.Geometry()
+    geo.loadFromFile(geometry_file)
+
+    positions = geo.pointFloatAttribValues("P")
+    prims = geo.prims()
+    if geo.findPrimAttrib(partition_attrib) is not None:
+        names = geo.primStringAttribValues(partition_attrib)
+    else:
+        names = [""] * len(prims)
+
+    uv_attrib = geo.findVertexAttrib("uv")
+    uv_on_points = False
+    if uv_attrib is None:
+        uv_attrib = geo.findPointAttrib("uv")
+        uv_on_points = uv_attrib is not None
+
+    partitions = {}
+    point_maps = {}
+    for prim, name in zip(prims, names):
+        if prim.type() != hou.primType.Polygon:
+            continue
+        name = name.split("/")[-1] or "mesh"
+        mesh = partitions.get(name)
+        if mesh is None:
+            mesh = {"points": [], "face_vertex_counts": [], "face_vertex_indices": [],
+                    "st": [] if uv_attrib is not None else None}
+            partitions[name] = mesh
+            point_maps[name] = {}
+        point_map = point_maps[name]
+
+        vertices = prim.vertices()
+        mesh["face_vertex_counts"].append(len(vertices))
+        for vertex in vertices:
+            point = vertex.point()
+            number = point.number()
+            local = point_map.get(number)
+            if local is None:
+                local = len(mesh["points"])
+                point_map[number] = local
+                mesh["points"].append(tuple(positions[number * 3:number * 3 + 3]))
+            mesh["face_vertex_indices"].append(local)
+            if uv_attrib is not None:
+                uv = point.attribValue(uv_attrib) if uv_on_points else vertex.attribValue(uv_attrib)
+                mesh["st"].append((uv[0], uv[1]))
+
+    return partitions
+
+
+# Partition attribute read by default. Readers declaring it take partition_attrib as a keyword argument,
+# which lets USDWriter read the geometry cache with them, see _geometry_cache
+read_geometry.partition_attrib = "shop_materialpath"
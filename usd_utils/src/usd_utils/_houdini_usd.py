@@ -1,11 +1,6 @@
-import json
-from importlib import reload
-
 import hou
 
-from usd_utils import _hou_geo_import
-
-reload(_hou_geo_import)
+from usd_utils import _geometry_cache, _hou_geo_import, _profiling
 
 """
  Geometry import class for KitBash library that builds a USD stage from metadata,
@@ -17,14 +12,19 @@ reload(_hou_geo_import)
     :param add_displacement: If True, includes displacement textures.
     :param add_extra_tex: If True, includes additional textures based on schema.
     :param execute_rop: If True, executes the USD ROP after building.
+    :param shared_materials: If True, references materials from the shared materials layer.
+    :param proxy_ratios: Ratios of faces kept by the proxy geometry, no proxy geometry if empty.
+    :param payload: If True, the geometry is loaded as a payload from its own layer.
+    :param geometry_cache: If True, geometry baked by the geometry pre-pass is read instead of the source files.
 """
 
 
 class KBGeometryImport(_hou_geo_import.GeometryImport):
     def __init__(self, json_file, import_render, source_tag, add_displacement=True, add_extra_tex=False,
-                 execute_rop=False):
-        super().__init__(json_file, import_render, source_tag, add_displacement, add_extra_tex)
-        self.wrangle_code = "string split[] = split(s@shop_materialpath, '/');\ns@path = split[-1];"
+                 execute_rop=False, shared_materials=False, proxy_ratios=None, payload=False, geometry_cache=False):
+        super().__init__(json_file, import_render, source_tag, add_displacement, add_extra_tex, shared_materials,
+                         proxy_ratios, payload, geometry_cache)
+        self.wrangle_code = _geometry_cache.PATH_WRANGLE_CODE
         self.source_tag = source_tag
         self.import_render = import_render
         self.execute_rop = execute_rop
@@ -37,45 +37,76 @@ class KBGeometryImport(_hou_geo_import.GeometryImport):
             Optionally executes and cleans up the network.
 
         """
-        with open(self.metadata, "r") as read_file:
-            read = json.load(read_file)
-
-        sop_create = self.create_sop_read(geometry_file, read, self.wrangle_code)
-        prim = self.create_prim()
-
-        # Create graft stages
-        graft_stages = self.create_graft_stages()
-        graft_stages.setInput(0, prim)
-        graft_stages.setNextInput(sop_create)
+        read = self.metadata_read
+        nodes = self.count_nodes
 
-        mat_lib = self.create_material_lib()
-        mat_lib.setInput(0, graft_stages)
-        self.create_materialx_shader(geometry_file, mat_lib)
-        assign_mat = mat_lib.createOutputNode("assignmaterial")
+        # Missing textures are reported before any node is created
+        with _profiling.stage("check_textures", geometry_file):
+            for texture in self.check_textures([geometry_file], refresh=False).get(geometry_file, []):
+                print("texture missing {}".format(texture))
 
-        _materials = list(read[self.source_tag][geometry_file]["materials"].keys())
-        assign_mat.parm("nummaterials").set(len(_materials))
-
-        for mat in _materials:
-            mat_path = ("/main/"
-                        + "materials"
+        asset_name = read[self.source_tag][geometry_file]["asset_name"]
+        prim = self.create_prim()
+        with _profiling.stage("create_sop_read", geometry_file, nodes=nodes):
+            if self.payload:
+                # The geometry is not cooked in the network, only loaded as a payload
+                graft_stages = None
+                sop_create = self.create_payload_refs(geometry_file)
+                sop_create.setInput(0, prim)
+                stage_input = sop_create
+                geometry_name = asset_name
+            else:
+                sop_create = self.create_sop_read(geometry_file, read, self.wrangle_code)
+
+                # Create graft stages
+                graft_stages = self.create_graft_stages()
+                graft_stages.setInput(0, prim)
+                graft_stages.setNextInput(sop_create)
+                stage_input = graft_stages
+                geometry_name = sop_create.name()
+
+        # Reduced geometry for the viewport, referenced next to the render geometry
+        proxy_refs = None
+        if self.proxy_ratios:
+            with _profiling.stage("create_proxy", geometry_file, nodes=nodes):
+                proxy_refs = self.create_proxy_refs(geometry_file)
+                proxy_refs.setInput(0, stage_input)
+                stage_input = proxy_refs
+
+        with _profiling.stage("create_materialx_shader", geometry_file, nodes=nodes):
+            if self.shared_materials:
+                mat_lib = self.create_shared_material_refs(geometry_file)
+            else:
+                mat_lib = self.create_material_lib()
+                self.create_materialx_shader(geometry_file, mat_lib)
+            mat_lib.setInput(0, stage_input)
+            assign_mat = mat_lib.createOutputNode("assignmaterial")
+
+            _materials = list(read[self.source_tag][geometry_file]["materials"].keys())
+            assign_mat.parm("nummaterials").set(len(_materials))
+
+            for number, mat in enumerate(_materials, 1):
+                mat_path = ("/main/"
+                            + "materials"
+                            + "/"
+                            + mat
+                            )
+                prim_path = (
+                        prim.parm("primpath").evalAsString()
+                        + "/"
+                        + geometry_name
+                        + "/"
+                        + geometry_name
                         + "/"
                         + mat
-                        )
-            prim_path = (
-                    prim.parm("primpath").evalAsString()
-                    + "/"
-                    + sop_create.name()
-                    + "/"
-                    + sop_create.name()
-                    + "/"
-                    + mat
-                    + "*"  # added to make the same material library work with destruction
-            )
-
-            assign_mat.parm("primpattern{}".format(_materials.index(mat) + 1)).set(prim_path)
-            assign_mat.parm("matspecpath{}".format(_materials.index(mat) + 1)).set(mat_path)
-            assign_mat.setDisplayFlag(True)
+                        + "*"  # added to make the same material library work with destruction
+                )
+                if proxy_refs is not None:
+                    prim_path += " /main/{}/proxy/{}*".format(asset_name, mat)
+
+                assign_mat.parm("primpattern{}".format(number)).set(prim_path)
+                assign_mat.parm("matspecpath{}".format(number)).set(mat_path)
+                assign_mat.setDisplayFlag(True)
 
         usd_rop = self.create_usd_rop(geometry_file, read, self.source_tag)
         usd_rop.setInput(0, assign_mat)
@@ -85,11 +116,18 @@ class KBGeometryImport(_hou_geo_import.GeometryImport):
         """
 
         if self.execute_rop:
-            usd_rop.parm("execute").pressButton()
-            sop_create.destroy()
-            prim.destroy()
-            mat_lib.destroy()
-            graft_stages.destroy()
-            assign_mat.destroy()
-            usd_rop.destroy()
+            # Geometry is cooked and the stage composed and written by the ROP
+            with _profiling.stage("usd_rop_execute", geometry_file, nodes=nodes,
+                                  prims=lambda: sum(1 for _ in assign_mat.stage().Traverse())):
+                usd_rop.parm("execute").pressButton()
+            with _profiling.stage("cleanup", geometry_file):
+                sop_create.destroy()
+                prim.destroy()
+                mat_lib.destroy()
+                if graft_stages is not None:
+                    graft_stages.destroy()
+                if proxy_refs is not None:
+                    proxy_refs.destroy()
+                assign_mat.destroy()
+                usd_rop.destroy()
             print("{} converted to usd".format(geometry_file))
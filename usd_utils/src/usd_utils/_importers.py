@@ -0,0 +1,192 @@
+import importlib
+import os
+import threading
+
+from usd_utils import _metadata_store
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:
+    importlib_metadata = None
+
+"""
+    Registry of the importers building USD templates for each library, keyed by source tag.
+
+    An importer is declared with an Importer entry: the GeometryImport subclass building its LOP networks,
+    given as "module:Class" so it is only imported when first used, and the settings it is created with.
+    KitBash is built in, other libraries are added by any installed package declaring Importer objects
+    in the "usd_utils.importers" entry point group, e.g. in its pyproject.toml:
+
+        [project.entry-points."usd_utils.importers"]
+        MS = "megascans_usd.importer:IMPORTER"
+
+    The schema settings of a library can be declared on its Importer as well, so a new library needs no edit
+    to parameters_schema.json or inputs_schema.json: texture_slots maps the texture parameters of its materials
+    to MaterialX inputs, texture_inputs lists its extra textures the same way inputs_schema.json does.
+
+        IMPORTER = Importer("MS", "Megascans", "megascans_usd.importer:MSGeometryImport",
+                            texture_slots={"albedo_texture": "base_color", "roughness_texture": "specular_roughness"},
+                            texture_inputs={"surface": {}, "displacement": {"Displacement": "displacement"}})
+
+    Entry points are read once, on the first lookup.
+"""
+
+ENTRY_POINT_GROUP = "usd_utils.importers"
+# Conversion backends, the headless writer and the LOP based importers run in hython
+BACKENDS = ("headless", "hython")
+_script_dir = os.path.dirname(__file__)
+PARAMETERS_SCHEMA = os.path.normpath(os.path.join(_script_dir, "parameters_schema.json"))
+TEXTURE_SCHEMA = os.path.normpath(os.path.join(_script_dir, "inputs_schema.json"))
+
+
+class Importer:
+    """
+    Declaration of the importer of a library.
+
+    :param source_tag: Metadata library tag, e.g. 'KB'.
+    :param label: Name of the library shown in the tools.
+    :param importer_class: GeometryImport subclass as "module:Class", imported on first use.
+    :param import_render: Render setup of the library, section of parameters_schema.json.
+    :param wrangle_code: Attribute wrangle snippet setting the path attribute, overrides the one of the class.
+    :param backends: Conversion backends the library supports, see BACKENDS. Only hython by default:
+        the headless writer partitions geometry like KitBash and does not run the importer class.
+    :param texture_slots: Texture parameters of the materials mapped to MaterialX inputs,
+        overrides the import_render section of parameters_schema.json.
+    :param texture_inputs: Extra textures as {"surface": {name: input}, "displacement": {name: input}},
+        overrides the section of the library in inputs_schema.json.
+    """
+
+    def __init__(self, source_tag, label, importer_class, import_render="mantra", wrangle_code=None,
+                 backends=("hython",), texture_slots=None, texture_inputs=None):
+        self.source_tag = source_tag
+        self.label = label
+        self.importer_class = importer_class
+        self.import_render = import_render
+        self.wrangle_code = wrangle_code
+        self.backends = tuple(backends)
+        self.texture_slots = texture_slots
+        self.texture_inputs = texture_inputs
+        self._class = None
+
+    def settings(self):
+        """
+        Returns the settings the converted assets depend on, part of their build fingerprint.
+        """
+        return {"importer_class": self.importer_class, "import_render": self.import_render,
+                "wrangle_code": self.wrangle_code, "texture_slots": self.texture_slots,
+                "texture_inputs": self.texture_inputs}
+
+    def load(self):
+        """
+        Imports the GeometryImport subclass of the library, once.
+        """
+        if self._class is None:
+            module_name, _, class_name = self.importer_class.partition(":")
+            self._class = getattr(importlib.import_module(module_name), class_name)
+        return self._class
+
+    def create(self, json_file, import_render=None, add_displacement=True, add_extra_tex=False, **kwargs):
+        """
+        Creates the importer of the library, keyword arguments are passed to its class.
+        """
+        importer = self.load()(json_file, import_render or self.import_render, self.source_tag, add_displacement,
+                               add_extra_tex, **kwargs)
+        if self.wrangle_code is not None:
+            importer.wrangle_code = self.wrangle_code
+        return importer
+
+
+BUILTIN_IMPORTERS = [Importer("KB", "KitBash", "usd_utils._houdini_usd:KBGeometryImport", backends=BACKENDS)]
+
+_registry = None
+_lock = threading.Lock()
+
+
+def _entry_points():
+    if importlib_metadata is None:
+        return []
+    try:
+        return list(importlib_metadata.entry_points(group=ENTRY_POINT_GROUP))
+    except TypeError:
+        # Before python 3.10 entry points come grouped in a dict
+        return list(importlib_metadata.entry_points().get(ENTRY_POINT_GROUP, []))
+
+
+def registry():
+    """
+    Returns the importers by source tag, reading the installed entry points the first time.
+    A broken entry point is reported and skipped, so it does not take the other libraries down.
+    """
+    global _registry
+    with _lock:
+        if _registry is None:
+            importers = dict((importer.source_tag, importer) for importer in BUILTIN_IMPORTERS)
+            for entry_point in _entry_points():
+                try:
+                    importer = entry_point.load()
+                except Exception as error:
+                    print("importer {} skipped: {}".format(entry_point.name, error))
+                    continue
+                importers[importer.source_tag] = importer
+            _registry = importers
+        return _registry
+
+
+def register(importer):
+    """
+    Adds or replaces the importer of a library for this session.
+    """
+    registry()[importer.source_tag] = importer
+
+
+def get_importer(source_tag):
+    """
+    Returns the Importer of a library.
+    """
+    importer = registry().get(source_tag)
+    if importer is None:
+        raise ValueError("No importer registered for {}, expected one of {}".format(
+            source_tag, ", ".join(sorted(registry()))))
+    return importer
+
+
+def library_label(source_tag):
+    """
+    Returns the name of a library shown in the tools, its tag if it has no importer.
+    """
+    importer = registry().get(source_tag)
+    return importer.label if importer is not None else source_tag
+
+
+def create_importer(json_file, source_tag, import_render=None, add_displacement=True, add_extra_tex=False,
+                    backend="hython", **kwargs):
+    """
+    Creates the importer of a library, checking it supports the backend it is used with.
+    """
+    importer = get_importer(source_tag)
+    if backend not in importer.backends:
+        raise ValueError("{} does not support the {} backend, only {}".format(
+            source_tag, backend, ", ".join(importer.backends)))
+    return importer.create(json_file, import_render, add_displacement, add_extra_tex, **kwargs)
+
+
+def texture_slots(source_tag, import_render, parameters_schema=PARAMETERS_SCHEMA):
+    """
+    Returns the MaterialX inputs of the texture parameters of a library: declared by its importer,
+    the import_render section of parameters_schema.json otherwise.
+    """
+    importer = registry().get(source_tag)
+    if importer is not None and importer.texture_slots is not None:
+        return importer.texture_slots
+    return _metadata_store.load_schema(parameters_schema, import_render)
+
+
+def texture_inputs(source_tag, texture_schema=TEXTURE_SCHEMA):
+    """
+    Returns the extra textures of a library as {"surface": {...}, "displacement": {...}}: declared by its importer,
+    its section of inputs_schema.json otherwise.
+    """
+    importer = registry().get(source_tag)
+    if importer is not None and importer.texture_inputs is not None:
+        return importer.texture_inputs
+    return _metadata_store.load_json(texture_schema).get(source_tag, {})
@@ -0,0 +1,213 @@
+import collections
+import os
+import shutil
+import tempfile
+
+from PySide2 import QtCore
+
+from usd_utils import _batch
+
+"""
+    Conversion job queue running the batch shard workers (see _batch) as out-of-process QProcess workers,
+    so the Houdini session stays usable while assets are converted.
+
+    Every worker converts a small chunk of assets and appends one result per asset as it finishes,
+    which the queue picks up to report per-asset progress through Qt signals.
+
+    :param json_file: Path to the metadata file.
+    :param source_tag: Library tag of the assets.
+    :param options: Converter options passed to the workers.
+    :param backend: "headless" or "hython", see _batch.BACKENDS.
+    :param interpreter: Interpreter running the workers, defaults to the backend one.
+    :param max_workers: Number of worker processes running at the same time.
+    :param chunk_size: Number of assets converted by a single worker process.
+    :param memory_limit: Resident memory (MB) past which a worker stops, its remaining assets are queued again.
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class ConversionJob:
+    def __init__(self, geometry_file):
+        self.geometry_file = geometry_file
+        self.status = QUEUED
+        self.attempts = 0
+        self.elapsed = 0.0
+        self.output = None
+        self.output_size = 0
+        self.bounds = None
+        self.error = None
+
+
+class ConversionQueue(QtCore.QObject):
+    jobStarted = QtCore.Signal(str)
+    jobFinished = QtCore.Signal(str)
+    jobFailed = QtCore.Signal(str, str)
+    progressChanged = QtCore.Signal(int, int)
+    queueFinished = QtCore.Signal()
+
+    def __init__(self, json_file, source_tag, options, backend="hython", interpreter=None, max_workers=2,
+                 chunk_size=4, memory_limit=None, parent=None):
+        super(ConversionQueue, self).__init__(parent)
+        self.json_file = os.path.abspath(json_file)
+        self.source_tag = source_tag
+        self.options = options
+        self.backend = backend
+        self.interpreter = interpreter
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.memory_limit = memory_limit
+
+        self.jobs = collections.OrderedDict()
+        self.pending = collections.deque()
+        self.workers = []
+        self._shard_index = 0
+        self._cancelling = False
+        self._tmp_dir = None
+
+    def submit(self, geometry_files):
+        """
+        Adds assets to the queue and starts workers for them.
+        """
+        for geometry_file in geometry_files:
+            job = self.jobs.get(geometry_file)
+            if job is not None and job.status in (QUEUED, RUNNING):
+                continue
+            if job is None:
+                job = ConversionJob(geometry_file)
+                self.jobs[geometry_file] = job
+            job.status = QUEUED
+            job.error = None
+            self.pending.append(geometry_file)
+        self._cancelling = False
+        self._emitProgress()
+        self._startWorkers()
+
+    def retry(self):
+        """
+        Queues every failed or cancelled asset again.
+        """
+        self.submit([job.geometry_file for job in self.jobs.values() if job.status in (FAILED, CANCELLED)])
+
+    def cancel(self):
+        """
+        Drops the pending assets and kills the running workers.
+        Assets a worker did not report on are marked as cancelled.
+        """
+        self._cancelling = True
+        while self.pending:
+            self.jobs[self.pending.popleft()].status = CANCELLED
+        for worker in list(self.workers):
+            worker["process"].kill()
+        self._emitProgress()
+
+    def isRunning(self):
+        return bool(self.workers or self.pending)
+
+    def counts(self):
+        return collections.Counter(job.status for job in self.jobs.values())
+
+    def _emitProgress(self):
+        finished = sum(1 for job in self.jobs.values() if job.status in (DONE, FAILED, CANCELLED))
+        self.progressChanged.emit(finished, len(self.jobs))
+
+    def _startWorkers(self):
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix="usd_queue_")
+
+        while self.pending and len(self.workers) < self.max_workers:
+            assets = []
+            while self.pending and len(assets) < self.chunk_size:
+                assets.append(self.pending.popleft())
+
+            spec, spec_file = _batch.write_shard_spec(self._tmp_dir, self._shard_index, self.backend,
+                                                      self.json_file, self.source_tag, self.options, assets,
+                                                      memory_limit=self.memory_limit)
+            self._shard_index += 1
+            command = _batch.worker_command(self.backend, self.interpreter, spec_file)
+
+            process = QtCore.QProcess(self)
+            environment = QtCore.QProcessEnvironment()
+            for key, value in _batch.worker_env().items():
+                environment.insert(key, value)
+            process.setProcessEnvironment(environment)
+            process.setProcessChannelMode(QtCore.QProcess.MergedChannels)
+
+            worker = {"process": process, "spec": spec, "reported": set()}
+            process.readyReadStandardOutput.connect(lambda w=worker: self._onOutput(w))
+            process.finished.connect(lambda code, status, w=worker: self._onWorkerFinished(w, code))
+            process.errorOccurred.connect(lambda error, w=worker: self._onWorkerError(w, error))
+            self.workers.append(worker)
+
+            for geometry_file in assets:
+                job = self.jobs[geometry_file]
+                job.status = RUNNING
+                job.attempts += 1
+                self.jobStarted.emit(geometry_file)
+            process.start(command[0], command[1:])
+
+    def _collect(self, worker):
+        for result in _batch.read_results(worker["spec"]["results_file"]):
+            geometry_file = result["geometry_file"]
+            if geometry_file in worker["reported"]:
+                continue
+            worker["reported"].add(geometry_file)
+
+            job = self.jobs[geometry_file]
+            job.elapsed = result["elapsed"]
+            job.output = result.get("output")
+            job.output_size = result.get("output_size", 0)
+            job.bounds = result.get("bounds")
+            if result["status"] == "ok":
+                job.status = DONE
+                self.jobFinished.emit(geometry_file)
+            else:
+                job.status = FAILED
+                job.error = result["error"]
+                self.jobFailed.emit(geometry_file, job.error)
+            self._emitProgress()
+
+    def _onOutput(self, worker):
+        worker["process"].readAllStandardOutput()
+        self._collect(worker)
+
+    def _onWorkerError(self, worker, error):
+        # A worker that could not start never emits finished
+        if error == QtCore.QProcess.FailedToStart:
+            self._onWorkerFinished(worker, -1)
+
+    def _onWorkerFinished(self, worker, exit_code):
+        if worker not in self.workers:
+            return
+        self._collect(worker)
+        unreported = [geometry_file for geometry_file in worker["spec"]["assets"]
+                      if geometry_file not in worker["reported"]]
+        if exit_code == _batch.RECYCLE_EXIT_CODE and not self._cancelling:
+            # The worker stopped at its memory limit, a fresh one picks up where it left off
+            for geometry_file in reversed(unreported):
+                self.jobs[geometry_file].status = QUEUED
+                self.pending.appendleft(geometry_file)
+            unreported = []
+        for geometry_file in unreported:
+            job = self.jobs[geometry_file]
+            if self._cancelling:
+                job.status = CANCELLED
+            else:
+                job.status = FAILED
+                job.error = "worker exited with code {}".format(exit_code)
+                self.jobFailed.emit(geometry_file, job.error)
+        self._emitProgress()
+
+        self.workers.remove(worker)
+        worker["process"].deleteLater()
+        if not self._cancelling:
+            self._startWorkers()
+
+        if not self.workers and (self._cancelling or not self.pending):
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+            self.queueFinished.emit()
@@ -0,0 +1,105 @@
+import math
+
+"""
+    Mesh reduction used to generate proxy geometry, in plain python so it runs in any interpreter.
+
+    Points are clustered on a regular grid and every cluster is replaced by the average of its points.
+    Faces collapsing to fewer than three distinct points are dropped. The grid resolution is searched so the
+    result keeps about the requested ratio of the faces, which is fast and robust for viewport proxies,
+    without the quality of an edge collapse reduction.
+"""
+
+
+def _cluster(points, face_vertex_counts, face_vertex_indices, bbox_min, cell_size):
+    cells = {}
+    point_cells = []
+    for x, y, z in points:
+        key = (int((x - bbox_min[0]) / cell_size), int((y - bbox_min[1]) / cell_size),
+               int((z - bbox_min[2]) / cell_size))
+        cell = cells.get(key)
+        if cell is None:
+            cell = [len(cells), 0.0, 0.0, 0.0, 0]
+            cells[key] = cell
+        cell[1] += x
+        cell[2] += y
+        cell[3] += z
+        cell[4] += 1
+        point_cells.append(cell[0])
+
+    counts = []
+    indices = []
+    offset = 0
+    for count in face_vertex_counts:
+        face = []
+        for index in face_vertex_indices[offset:offset + count]:
+            cell = point_cells[index]
+            if not face or face[-1] != cell:
+                face.append(cell)
+        offset += count
+        if len(face) > 1 and face[0] == face[-1]:
+            face.pop()
+        if len(set(face)) < 3:
+            continue
+        counts.append(len(face))
+        indices.extend(face)
+
+    centers = [None] * len(cells)
+    for index, x, y, z, number in cells.values():
+        centers[index] = (x / number, y / number, z / number)
+    return centers, counts, indices
+
+
+def _compact(points, face_vertex_indices):
+    """
+    Drops the points no face uses.
+    """
+    remap = {}
+    indices = []
+    for index in face_vertex_indices:
+        local = remap.get(index)
+        if local is None:
+            local = len(remap)
+            remap[index] = local
+        indices.append(local)
+    compacted = [None] * len(remap)
+    for index, local in remap.items():
+        compacted[local] = points[index]
+    return compacted, indices
+
+
+def decimate(points, face_vertex_counts, face_vertex_indices, ratio, iterations=6):
+    """
+    Returns (points, face_vertex_counts, face_vertex_indices) of a reduced mesh keeping about ratio of the faces.
+    """
+    if ratio >= 1.0 or not face_vertex_counts:
+        return list(points), list(face_vertex_counts), list(face_vertex_indices)
+
+    bbox_min = [min(point[axis] for point in points) for axis in range(3)]
+    bbox_max = [max(point[axis] for point in points) for axis in range(3)]
+    size = max(bbox_max[axis] - bbox_min[axis] for axis in range(3)) or 1.0
+    target = max(1, int(len(face_vertex_counts) * ratio))
+
+    # Faces of a surface grow with the square of the grid resolution, which drives the search,
+    # keeping the result with the most faces not over the target
+    resolution = max(1, int(math.sqrt(target)))
+    best = None
+    for _ in range(iterations):
+        result = _cluster(points, face_vertex_counts, face_vertex_indices, bbox_min, size / resolution)
+        faces = len(result[1])
+        if faces <= target and (best is None or faces > len(best[1])):
+            best = result
+        if faces == 0:
+            next_resolution = resolution * 2
+        else:
+            next_resolution = max(1, int(resolution * math.sqrt(target / float(faces))))
+            if faces > target:
+                next_resolution = min(next_resolution, resolution - 1)
+        if next_resolution == resolution or next_resolution < 1:
+            break
+        resolution = next_resolution
+    if best is None:
+        best = _cluster(points, face_vertex_counts, face_vertex_indices, bbox_min, size)
+
+    centers, counts, indices = best
+    centers, indices = _compact(centers, indices)
+    return centers, counts, indices
@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+
+from usd_utils import _catalog, _record_log
+
+"""
+    Process-wide store for the metadata and schema JSON files.
+
+    Every file is parsed once and shared by all readers until its modification time or size changes,
+    or until it is explicitly invalidated. Returned data is shared, callers must not modify it in place.
+
+    Metadata stored in an asset catalog (see _catalog) is returned as a read-only mapping with the same layout,
+    backed by a single catalog connection per file.
+    JSON metadata is returned with its record log (see _record_log) folded in, cached until either file changes.
+"""
+
+_cache = {}
+_folded = {}
+_catalogs = {}
+_lock = threading.Lock()
+
+
+def default_metadata_path():
+    """
+    Returns the metadata shipped with the tools: the asset catalog if one was imported, the JSON file otherwise.
+    """
+    script_dir = os.path.dirname(__file__)
+    catalog_path = os.path.normpath(os.path.join(script_dir, "assets_metadata.db"))
+    if os.path.exists(catalog_path):
+        return catalog_path
+    return os.path.normpath(os.path.join(script_dir, "assets_metadata.json"))
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _log_key(record_log):
+    keys = []
+    for path in (record_log.path + ".compacting", record_log.path):
+        keys.append(_file_key(path) if os.path.exists(path) else None)
+    return tuple(keys)
+
+
+def load_json(path):
+    """
+    Returns the parsed content of a JSON file, parsing it only if it is not cached or changed on disk.
+    """
+    path = os.path.normpath(os.path.abspath(path))
+    key = _file_key(path)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+    with open(path, "r") as read_file:
+        data = json.load(read_file)
+
+    with _lock:
+        _cache[path] = (key, data)
+    return data
+
+
+def load_metadata(path):
+    """
+    Returns the assets metadata stored in the given file.
+    """
+    if _catalog.is_catalog(path):
+        return open_catalog(path)[1]
+
+    path = os.path.normpath(os.path.abspath(path))
+    record_log = _record_log.RecordLog(path)
+    if not record_log.exists():
+        return load_json(path)
+
+    snapshot = load_json(path)
+    key = (_file_key(path), _log_key(record_log))
+    with _lock:
+        cached = _folded.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+    data = record_log.fold(snapshot)
+    with _lock:
+        _folded[path] = (key, data)
+    return data
+
+
+def open_catalog(path):
+    """
+    Returns the shared (AssetCatalog, CatalogView) pair of a catalog file.
+    """
+    path = os.path.normpath(os.path.abspath(path))
+    with _lock:
+        cached = _catalogs.get(path)
+        if cached is None:
+            catalog = _catalog.AssetCatalog(path)
+            cached = (catalog, _catalog.CatalogView(catalog))
+            _catalogs[path] = cached
+    return cached
+
+
+def list_assets(metadata, source_tag):
+    """
+    Returns the (geometry file, asset name) pairs of a library sorted by geometry file,
+    with a single query when the metadata is a catalog.
+    """
+    library = metadata[source_tag]
+    if isinstance(library, _catalog.LibraryView):
+        return library.asset_names()
+    return [(geometry_file, library[geometry_file]["asset_name"]) for geometry_file in sorted(library.keys())]
+
+
+def iter_assets(metadata, source_tag, text=""):
+    """
+    Lazily iterates the (geometry file, asset name) pairs of a library sorted by geometry file,
+    keeping only assets whose name contains the given text, case insensitive.
+    """
+    library = metadata[source_tag]
+    if isinstance(library, _catalog.LibraryView):
+        return library.catalog.iter_assets(source_tag, text)
+    text = text.lower()
+    return ((geometry_file, library[geometry_file]["asset_name"]) for geometry_file in sorted(library.keys())
+            if text in library[geometry_file]["asset_name"].lower())
+
+
+def load_schema(path, section):
+    """
+    Returns a single section of a schema file, e.g. the "mantra" entry of parameters_schema.json.
+    """
+    return load_json(path)[section]
+
+
+def invalidate(path=None):
+    """
+    Drops the cached content of a file, or of every file if no path is given.
+    Must be called by anything rewriting a file that may be read again in the same session.
+    Catalogs are always read live and need no invalidation.
+    """
+    with _lock:
+        if path is None:
+            _cache.clear()
+            _folded.clear()
+        else:
+            path = os.path.normpath(os.path.abspath(path))
+            _cache.pop(path, None)
+            _folded.pop(path, None)
@@ -0,0 +1,185 @@
+import contextlib
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+"""
+    Per-stage conversion profiling: wall time, memory and node or prim counts of every stage of every asset.
+
+    Stages are marked with the stage context manager, which does nothing until profiling is started,
+    so the converters can stay instrumented at no cost:
+
+        with _profiling.stage("create_sop_read", geometry_file, nodes=count_nodes):
+            ...
+
+    Keyword arguments are counters, callables evaluated when the stage ends. Counters passed to start
+    are evaluated at the end of every stage. Records export as JSON lines or as a Chrome trace
+    (chrome://tracing, Perfetto), and summary_table aggregates them per stage.
+"""
+
+_records = None
+_counters = {}
+_depth = 0
+
+
+def start(**counters):
+    """
+    Starts recording stages in this process, discarding anything recorded before.
+    """
+    global _records, _counters, _depth
+    _records = []
+    _counters = counters
+    _depth = 0
+
+
+def stop():
+    """
+    Stops recording and returns the records.
+    """
+    global _records
+    records = take()
+    _records = None
+    return records
+
+
+def enabled():
+    return _records is not None
+
+
+def take():
+    """
+    Returns the records collected so far and clears them, recording goes on.
+    """
+    records = list(_records or [])
+    if _records is not None:
+        del _records[:]
+    return records
+
+
+def rss():
+    """
+    Returns the resident memory of this process in bytes, or None where it cannot be read.
+    """
+    try:
+        with open("/proc/self/statm", "r") as read_file:
+            return int(read_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """
+    Returns the peak resident memory of this process in bytes, or None where it cannot be read.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@contextlib.contextmanager
+def stage(name, asset=None, **counters):
+    """
+    Records the wall time, memory and counters of the wrapped block.
+    """
+    global _depth
+    if _records is None:
+        yield
+        return
+
+    records = _records
+    peak_before = peak_rss()
+    start_time = time.time()
+    start_clock = time.perf_counter()
+    _depth += 1
+    try:
+        yield
+    finally:
+        _depth -= 1
+        record = {"name": name, "asset": asset, "pid": os.getpid(), "depth": _depth, "start": start_time,
+                  "elapsed": time.perf_counter() - start_clock, "rss": rss(), "peak_rss": peak_rss()}
+        # Growth of the process peak, telling which stage raised it
+        record["peak_rss_growth"] = (record["peak_rss"] - peak_before
+                                     if record["peak_rss"] is not None and peak_before is not None else None)
+        for counter_name, counter in list(_counters.items()) + list(counters.items()):
+            try:
+                record[counter_name] = counter()
+            except Exception:
+                record[counter_name] = None
+        records.append(record)
+
+
+def write_jsonl(records, path):
+    with open(path, "w") as output_file:
+        for record in records:
+            output_file.write(json.dumps(record) + "\n")
+
+
+def read_jsonl(path):
+    records = []
+    with open(path, "r") as read_file:
+        for line in read_file:
+            if line.strip():
+                records.append(json.loads(line))
+    return records
+
+
+def chrome_trace(records):
+    """
+    Returns the records as Chrome trace events, one complete event per stage and one track per process.
+    """
+    events = []
+    origin = min(record["start"] for record in records) if records else 0.0
+    for record in records:
+        args = dict((key, value) for key, value in record.items()
+                    if key not in ("name", "pid", "depth", "start", "elapsed"))
+        events.append({"name": record["name"], "cat": "conversion", "ph": "X", "pid": record["pid"], "tid": 0,
+                       "ts": (record["start"] - origin) * 1e6, "dur": record["elapsed"] * 1e6, "args": args})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(records, path):
+    with open(path, "w") as output_file:
+        json.dump(chrome_trace(records), output_file)
+
+
+def summary(records):
+    """
+    Aggregates the records per stage name, in the order the stages first ran.
+    """
+    stages = {}
+    for record in sorted(records, key=lambda record: (record["start"], record["depth"])):
+        entry = stages.get(record["name"])
+        if entry is None:
+            entry = {"name": record["name"], "depth": record["depth"], "calls": 0, "total": 0.0, "max": 0.0,
+                     "peak_rss": None}
+            stages[record["name"]] = entry
+        entry["calls"] += 1
+        entry["total"] += record["elapsed"]
+        entry["max"] = max(entry["max"], record["elapsed"])
+        if record.get("peak_rss") is not None:
+            entry["peak_rss"] = max(entry["peak_rss"] or 0, record["peak_rss"])
+    return list(stages.values())
+
+
+def summary_table(records):
+    """
+    Returns a human readable table of the time spent per stage, with its share of the top level stages.
+    """
+    entries = summary(records)
+    top_total = sum(record["elapsed"] for record in records if record["depth"] == 0) or 1.0
+    lines = ["{:<32} {:>6} {:>10} {:>9} {:>9} {:>7} {:>10}".format(
+        "stage", "calls", "total (s)", "mean (s)", "max (s)", "share", "peak (MB)")]
+    for entry in entries:
+        peak = "{:.1f}".format(entry["peak_rss"] / 1048576.0) if entry["peak_rss"] is not None else "-"
+        lines.append("{:<32} {:>6} {:>10.3f} {:>9.3f} {:>9.3f} {:>6.1f}% {:>10}".format(
+            "  " * entry["depth"] + entry["name"], entry["calls"], entry["total"], entry["total"] / entry["calls"],
+            entry["max"], 100.0 * entry["total"] / top_total, peak))
+    return "\n".join(lines)
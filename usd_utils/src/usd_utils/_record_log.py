@@ -0,0 +1,105 @@
+import json
+import os
+
+"""
+    Append-only log of metadata records stored next to a JSON metadata snapshot.
+
+    Every extracted asset is appended as one JSON object per line as soon as it is known, so an interrupted
+    extraction keeps what it already wrote. Readers fold the log over the snapshot to get the current view,
+    and compaction merges it back into the snapshot.
+
+    :param json_file: Path to the JSON metadata snapshot.
+"""
+
+
+def log_path(json_file):
+    """
+    Returns the record log of a JSON metadata snapshot.
+    """
+    return os.path.splitext(json_file)[0] + ".records.jsonl"
+
+
+class RecordLog:
+    def __init__(self, json_file):
+        self.json_file = json_file
+        self.path = log_path(json_file)
+
+    def append(self, source_tag, geometry_file, entry):
+        """
+        Appends the metadata entry of one asset and makes sure it reached the disk.
+        """
+        record = {"source_tag": source_tag, "geometry_file": geometry_file, "entry": entry}
+        line = json.dumps(record) + "\n"
+        with open(self.path, "a+b") as log_file:
+            # A line cut short by a crash is terminated so it does not swallow this record
+            if log_file.seek(0, os.SEEK_END) > 0:
+                log_file.seek(-1, os.SEEK_END)
+                if log_file.read(1) != b"\n":
+                    line = "\n" + line
+            log_file.write(line.encode("utf-8"))
+            log_file.flush()
+            os.fsync(log_file.fileno())
+
+    def records(self):
+        """
+        Iterates the records of the log, oldest first, including a log left behind by an interrupted compaction.
+        A last line cut short by a crash is ignored.
+        """
+        for path in (self.path + ".compacting", self.path):
+            for record in self._read(path):
+                yield record
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as log_file:
+            for line in log_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                yield record
+
+    def exists(self):
+        return os.path.exists(self.path) or os.path.exists(self.path + ".compacting")
+
+    def fold(self, metadata):
+        """
+        Returns the metadata with the log applied, later records replacing earlier entries.
+        The given metadata is not modified, only the libraries touched by the log are copied.
+        """
+        view = dict(metadata)
+        copied = set()
+        for record in self.records():
+            source_tag = record["source_tag"]
+            if source_tag not in copied:
+                view[source_tag] = dict(view.get(source_tag, {}))
+                copied.add(source_tag)
+            view[source_tag][record["geometry_file"]] = record["entry"]
+        return view
+
+    def compact(self):
+        """
+        Merges the log into the snapshot and removes it.
+        The log is moved aside first so records appended meanwhile go to a new log,
+        and the snapshot is replaced only once the merged one is completely written.
+        """
+        if not self.exists():
+            return False
+        if os.path.exists(self.path) and not os.path.exists(self.path + ".compacting"):
+            os.replace(self.path, self.path + ".compacting")
+
+        read = {}
+        if os.path.exists(self.json_file):
+            with open(self.json_file, "r") as read_file:
+                read = json.load(read_file)
+        view = dict(read)
+        for record in self._read(self.path + ".compacting"):
+            view.setdefault(record["source_tag"], {})[record["geometry_file"]] = record["entry"]
+
+        tmp_path = self.json_file + ".tmp"
+        with open(tmp_path, "w") as output_file:
+            json.dump(view, output_file, indent=4)
+        os.replace(tmp_path, self.json_file)
+        os.remove(self.path + ".compacting")
+        return True
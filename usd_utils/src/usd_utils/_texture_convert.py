@@ -0,0 +1,332 @@
+import argparse
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from usd_utils import (_asset_paths, _catalog, _hashed_cache, _metadata_store, _record_log, _texture_resolver,
+                       _texture_usage)
+
+"""
+    Optional preprocessing stage converting the textures of a library to tiled, mipmapped formats
+    (.tx with OpenImageIO maketx, .rat with Houdini imaketx) before the assets are converted to USD.
+
+    Every unique texture is converted once in a pool of worker processes. Conversions are cached by content hash
+    in an index next to the metadata file, so a texture is not converted again until its content changes and
+    identical textures stored in several places are converted only once, then linked or copied. The metadata
+    entries are then rewritten to point at the converted files, written next to the sources
+    (see _asset_paths.converted_texture_path).
+
+    Converters are callables taking (source, target). Any "module:function" name can be used besides the
+    built-in ones of CONVERTERS.
+
+    Example:
+        python -m usd_utils._texture_convert assets_metadata.json --source-tag KB --format tx --workers 8
+"""
+
+TEXTURE_FORMATS = ("tx", "rat")
+DEFAULT_CONVERTERS = {"tx": "maketx", "rat": "imaketx"}
+
+
+def maketx(source, target):
+    """
+    Converts a texture to a tiled, mipmapped .tx with OpenImageIO, through its python module if available.
+    """
+    try:
+        import OpenImageIO
+    except ImportError:
+        subprocess.run(["maketx", source, "-o", target], check=True, capture_output=True)
+        return
+    if not OpenImageIO.ImageBufAlgo.make_texture(OpenImageIO.MakeTxTexture, source, target):
+        raise RuntimeError(OpenImageIO.geterror())
+
+
+def imaketx(source, target):
+    """
+    Converts a texture to a tiled, mipmapped .rat with the imaketx tool of Houdini.
+    """
+    subprocess.run(["imaketx", source, target], check=True, capture_output=True)
+
+
+CONVERTERS = {"maketx": maketx, "imaketx": imaketx}
+
+
+def get_converter(name):
+    """
+    Returns a built-in converter or imports a "module:function" one.
+    """
+    if name in CONVERTERS:
+        return CONVERTERS[name]
+    module_name, _, function_name = name.partition(":")
+    if not function_name:
+        raise ValueError("Unknown texture converter {}, expected one of {} or module:function".format(
+            name, ", ".join(CONVERTERS)))
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def index_path(json_file):
+    """
+    Returns the conversion index of a metadata file.
+    """
+    return os.path.splitext(json_file)[0] + ".textures.json"
+
+
+class TextureIndex:
+    """
+    Content hashes of the source textures, cached on their mtime and size so unchanged files are not read again,
+    and the content every converted file was made from.
+
+    :param path: Path to the index file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        read = {}
+        if os.path.exists(path):
+            with open(path, "r") as read_file:
+                read = json.load(read_file)
+        self.sources = _hashed_cache.ContentHashes(read.get("sources"))
+        self.targets = read.get("targets", {})
+        self._by_key = {}
+        for target, key in self.targets.items():
+            self._by_key.setdefault(key, []).append(target)
+
+    def source_hash(self, path):
+        """
+        Returns the content hash of a texture, or None if it does not exist.
+        """
+        return self.sources.get(path)
+
+    def is_current(self, target, key):
+        return self.targets.get(target) == key and os.path.exists(target)
+
+    def find(self, key):
+        """
+        Returns an existing converted file made from the given content, or None.
+        """
+        for target in self._by_key.get(key, []):
+            if self.targets.get(target) == key and os.path.exists(target):
+                return target
+        return None
+
+    def record(self, target, key):
+        self.targets[target] = key
+        self._by_key.setdefault(key, []).append(target)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as output_file:
+            json.dump({"sources": self.sources.snapshot(), "targets": self.targets}, output_file, indent=4)
+        os.replace(tmp_path, self.path)
+
+
+def _write_atomic(target, write):
+    """
+    Writes a file through a temporary one next to it, so the target only appears once it is complete.
+    """
+    target_dir, target_name = os.path.split(target)
+    tmp_target = os.path.join(target_dir, ".{}.{}".format(os.getpid(), target_name))
+    os.makedirs(target_dir, exist_ok=True)
+    try:
+        write(tmp_target)
+        os.replace(tmp_target, target)
+    finally:
+        if os.path.exists(tmp_target):
+            os.remove(tmp_target)
+
+
+def _convert(converter_name, source, target):
+    """
+    Converts a single texture in a worker process.
+    """
+    start = time.time()
+    try:
+        converter = get_converter(converter_name)
+        _write_atomic(target, lambda tmp_target: converter(source, tmp_target))
+    except Exception:
+        return source, target, traceback.format_exc(), time.time() - start
+    return source, target, None, time.time() - start
+
+
+def _copy_converted(converted_file, target):
+    """
+    Reuses a converted file for another texture with the same content, hard linked when possible.
+    """
+    def write(tmp_target):
+        try:
+            os.link(converted_file, tmp_target)
+        except OSError:
+            shutil.copy2(converted_file, tmp_target)
+    _write_atomic(target, write)
+
+
+def convert_textures(textures, index, texture_format="tx", converter=None, workers=None):
+    """
+    Converts the given textures and returns ({source: converted file}, {source: error}).
+    Textures already in the format and missing textures are left out.
+    """
+    if texture_format not in TEXTURE_FORMATS:
+        raise ValueError("Unknown texture format {}, expected one of {}".format(texture_format,
+                                                                                ", ".join(TEXTURE_FORMATS)))
+    converter = converter or DEFAULT_CONVERTERS[texture_format]
+    get_converter(converter)
+    textures = [texture for texture in dict.fromkeys(textures)
+                if not texture.lower().endswith("." + texture_format)]
+
+    # Hashing is I/O bound, a thread pool is enough
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        digests = dict(zip(textures, pool.map(index.source_hash, textures)))
+
+    converted = {}
+    failed = {}
+    by_key = {}
+    for texture in textures:
+        if digests[texture] is None:
+            continue
+        key = digests[texture] + "." + texture_format
+        target = _asset_paths.converted_texture_path(texture, texture_format)
+        if index.is_current(target, key):
+            converted[texture] = target
+        else:
+            by_key.setdefault(key, []).append(texture)
+
+    # One conversion per content, the other textures with the same content reuse its result
+    jobs = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for key, sources in by_key.items():
+            if index.find(key) is None:
+                target = _asset_paths.converted_texture_path(sources[0], texture_format)
+                jobs[key] = pool.submit(_convert, converter, sources[0], target)
+        for key, job in jobs.items():
+            source, target, error, elapsed = job.result()
+            if error is not None:
+                for texture in by_key[key]:
+                    failed[texture] = error
+            else:
+                index.record(target, key)
+
+    for key, sources in by_key.items():
+        converted_file = index.find(key)
+        if converted_file is None:
+            continue
+        for texture in sources:
+            target = _asset_paths.converted_texture_path(texture, texture_format)
+            if target != converted_file:
+                try:
+                    _copy_converted(converted_file, target)
+                except OSError:
+                    failed[texture] = traceback.format_exc()
+                    continue
+                index.record(target, key)
+            converted[texture] = target
+    index.save()
+    return converted, failed
+
+
+def library_textures(library, geometry_files, extra_names=(), resolver=None):
+    """
+    Returns the unique textures of the given assets, with the extra textures the importers derive from them.
+    """
+    resolver = resolver or _texture_resolver.TextureResolver()
+    textures = {}
+    for geometry_file in geometry_files:
+        for material in library[geometry_file]["materials"].values():
+            material_textures = list(material["textures"].values())
+            textures.update(dict.fromkeys(material_textures))
+            for name in extra_names if material_textures else ():
+                extra = resolver.resolve_variant(material_textures[0], name)
+                if extra is not None:
+                    textures[extra] = None
+    return list(textures)
+
+
+def rewrite_metadata(json_file, source_tag, geometry_files, converted):
+    """
+    Points the textures of the given assets to their converted files and returns the number of updated assets.
+    Only the changed assets are written: into the catalog, or into the record log of a JSON file, then compacted.
+    The texture usage index follows every written asset.
+    """
+    library = _metadata_store.load_metadata(json_file)[source_tag]
+    catalog = _metadata_store.open_catalog(json_file)[0] if _catalog.is_catalog(json_file) else None
+    record_log = None if catalog is not None else _record_log.RecordLog(json_file)
+    usage = _texture_usage.open_index(json_file)
+
+    updated = 0
+    for geometry_file in geometry_files:
+        entry = library[geometry_file]
+        materials = {}
+        for name, material in entry["materials"].items():
+            textures = dict((slot, converted.get(texture, texture)) for slot, texture in material["textures"].items())
+            materials[name] = dict(material, textures=textures)
+        new_entry = dict(entry, materials=materials)
+        if new_entry == entry:
+            continue
+        if catalog is not None:
+            catalog.add_asset(source_tag, geometry_file, new_entry)
+        else:
+            record_log.append(source_tag, geometry_file, new_entry)
+        usage.update_asset(source_tag, geometry_file, new_entry)
+        updated += 1
+
+    if record_log is not None and record_log.compact():
+        _metadata_store.invalidate(json_file)
+        usage.mark_current()
+    usage.close()
+    return updated
+
+
+def preprocess(json_file, source_tag, geometry_files, texture_format="tx", converter=None, workers=None,
+               add_extra_tex=False, add_displacement=False):
+    """
+    Converts the textures of the given assets and rewrites their metadata entries.
+    Returns a report with the converted and failed textures.
+    """
+    start = time.time()
+    library = _metadata_store.load_metadata(json_file)[source_tag]
+    texture_schema = os.path.normpath(os.path.join(os.path.dirname(__file__), "inputs_schema.json"))
+    extra_names = _texture_resolver.extra_texture_names(texture_schema, source_tag, add_extra_tex, add_displacement)
+    textures = library_textures(library, geometry_files, extra_names)
+
+    index = TextureIndex(index_path(json_file))
+    converted, failed = convert_textures(textures, index, texture_format, converter, workers)
+    updated = rewrite_metadata(json_file, source_tag, geometry_files, converted)
+    return {"textures": len(textures), "converted": converted, "failed": failed, "updated_assets": updated,
+            "elapsed": time.time() - start}
+
+
+def format_summary(report):
+    lines = ["texture failed {}\n{}".format(texture, error) for texture, error in sorted(report["failed"].items())]
+    lines.append("{} textures, {} converted or cached, {} failed, {} assets updated in {:.2f}s".format(
+        report["textures"], len(report["converted"]), len(report["failed"]), report["updated_assets"],
+        report["elapsed"]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the textures of a metadata library to tiled, "
+                                                 "mipmapped files and point the metadata at them.")
+    parser.add_argument("metadata", help="Path to the assets metadata file.")
+    parser.add_argument("--source-tag", required=True, help="Library tag to convert, e.g. KB.")
+    parser.add_argument("--format", choices=TEXTURE_FORMATS, default="tx", help="Texture format to convert to.")
+    parser.add_argument("--converter", default=None,
+                        help="Converter name or module:function. Defaults to maketx for tx, imaketx for rat.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--add-displacement", action="store_true", help="Convert displacement textures too.")
+    parser.add_argument("--add-extra-tex", action="store_true", help="Convert extra textures based on schema too.")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    metadata = _metadata_store.load_metadata(args.metadata)
+    assets = [geometry_file for geometry_file, asset_name in _metadata_store.list_assets(metadata, args.source_tag)]
+    report = preprocess(args.metadata, args.source_tag, assets, args.format, args.converter, args.workers,
+                        args.add_extra_tex, args.add_displacement)
+    print(format_summary(report))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import collections
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from usd_utils import _asset_paths, _importers
+
+"""
+    Texture lookups backed by a cache of directory listings.
+
+    Every texture directory is listed once and the listing is reused without touching the disk again
+    until refresh() is called, so checking a batch costs one stat per directory instead of one per texture.
+    After a refresh each directory is checked once more, with a single stat, and only listed again if it changed.
+    Batches list their directories in parallel in a thread pool, which matters on network storage.
+
+    Extra textures from inputs_schema.json ("ao", "height", "Displacement", ...) are resolved
+    from the listing as well: the guessed name of patch_texture first, then a texture with the same
+    name in another case or with another of TEXTURE_EXTENSIONS, the same extension first, then in
+    the order of TEXTURE_EXTENSIONS.
+
+    :param max_workers: Number of directories listed at the same time.
+"""
+
+# Texture files the extra textures are resolved to when their guessed name does not exist, by preference
+TEXTURE_EXTENSIONS = (".tx", ".rat", ".exr", ".tif", ".tiff", ".png", ".jpg", ".jpeg", ".tga", ".hdr")
+
+_Listing = collections.namedtuple("_Listing", ["mtime", "files", "stems", "generation"])
+
+
+def _split_name(name):
+    stem, extension = os.path.splitext(name)
+    return stem.lower(), extension.lower()
+
+
+class TextureResolver:
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._listings = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Checks every cached directory again on its next lookup, called at the start of a batch.
+        """
+        with self._lock:
+            self._generation += 1
+
+    def listing(self, directory):
+        """
+        Returns the listing of a directory. A cached listing is returned as is until the next refresh,
+        then checked once and listed again only if the directory changed. Missing directories have an empty listing.
+        """
+        with self._lock:
+            cached = self._listings.get(directory)
+            generation = self._generation
+        if cached is not None and cached.generation == generation:
+            return cached
+
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        if cached is not None and cached.mtime == mtime:
+            listing = cached._replace(generation=generation)
+        elif mtime is None:
+            listing = _Listing(None, frozenset(), {}, generation)
+        else:
+            try:
+                names = sorted(os.listdir(directory))
+            except OSError:
+                names = []
+            stems = {}
+            for name in names:
+                stem, extension = _split_name(name)
+                if extension in TEXTURE_EXTENSIONS:
+                    stems.setdefault(stem, []).append(name)
+            listing = _Listing(mtime, frozenset(names), stems, generation)
+        with self._lock:
+            self._listings[directory] = listing
+        return listing
+
+    def prefetch(self, paths):
+        """
+        Lists the directories of the given files in parallel.
+        """
+        directories = {os.path.dirname(path) for path in paths}
+        if len(directories) < 2:
+            for directory in directories:
+                self.listing(directory)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(directories))) as pool:
+            list(pool.map(self.listing, directories))
+
+    def exists(self, path):
+        directory, name = os.path.split(path)
+        return name in self.listing(directory).files
+
+    def missing(self, paths):
+        """
+        Returns the given files that do not exist, in the given order.
+        """
+        self.prefetch(paths)
+        return [path for path in paths if not self.exists(path)]
+
+    def resolve_variant(self, source_texture, target_text_name):
+        """
+        Returns the existing texture that patch_texture derives from source_texture, or None.
+        """
+        texture = _asset_paths.patch_texture(source_texture, target_text_name)
+        directory, name = os.path.split(texture)
+        listing = self.listing(directory)
+        if name in listing.files:
+            return texture
+        stem, extension = _split_name(name)
+        candidates = listing.stems.get(stem)
+        if not candidates:
+            return None
+
+        def preference(candidate):
+            candidate_extension = _split_name(candidate)[1]
+            return (candidate_extension != extension, TEXTURE_EXTENSIONS.index(candidate_extension), candidate)
+
+        return directory + "/" + min(candidates, key=preference)
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+
+
+def extra_texture_names(texture_schema, source_tag, add_extra_tex, add_displacement):
+    """
+    Returns the extra texture names the options add to every material, surface ones first.
+    """
+    if not (add_extra_tex or add_displacement):
+        return []
+    tex_schema_read = _importers.texture_inputs(source_tag, texture_schema)
+    names = []
+    if add_extra_tex:
+        names.extend(tex_schema_read.get("surface", {}))
+    if add_displacement:
+        names.extend(tex_schema_read.get("displacement", {}))
+    return names
+
+
+def missing_textures(resolver, library, geometry_files, extra_names=()):
+    """
+    Returns the missing textures of the given assets keyed by geometry file, for assets missing any.
+    Extra textures that cannot be resolved are reported with the path patch_texture guesses for them.
+    """
+    textures = {}
+    for geometry_file in geometry_files:
+        for material in library[geometry_file]["materials"].values():
+            textures.update(dict.fromkeys(material["textures"].values()))
+    missing = set(resolver.missing(list(textures)))
+
+    report = {}
+    for geometry_file in geometry_files:
+        asset_missing = []
+        for material in library[geometry_file]["materials"].values():
+            material_textures = list(material["textures"].values())
+            asset_missing.extend(texture for texture in material_textures if texture in missing)
+            if not material_textures:
+                continue
+            for name in extra_names:
+                if resolver.resolve_variant(material_textures[0], name) is None:
+                    asset_missing.append(_asset_paths.patch_texture(material_textures[0], name))
+        if asset_missing:
+            report[geometry_file] = list(dict.fromkeys(asset_missing))
+    return report
@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from usd_utils import _catalog, _metadata_store, _record_log
+
+"""
+    Persistent reverse index of the metadata, from texture files to what uses them:
+        texture path -> (source tag, geometry file, material, slot)
+
+    The index is an SQLite file next to the metadata, <stem>.texture_usage.db, looked up by full path or by file name.
+    ExtractMaterialsData and the texture preprocessing update it asset by asset as they write the metadata,
+    and it records the signature of the metadata it matches. Opening it for metadata changed by anything else
+    rebuilds it once, so it is never out of date.
+
+    Which assets use a texture:
+        python -m usd_utils._texture_usage assets_metadata.json KB3D_IRF_AtlasGraphicsA_basecolor.png
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uses (
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source_tag TEXT NOT NULL,
+    geometry_file TEXT NOT NULL,
+    material TEXT NOT NULL,
+    slot TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uses_path ON uses (path);
+CREATE INDEX IF NOT EXISTS uses_name ON uses (name);
+CREATE INDEX IF NOT EXISTS uses_asset ON uses (source_tag, geometry_file);
+
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def index_path(metadata_path):
+    """
+    Returns the texture usage index of a metadata file.
+    """
+    return os.path.splitext(metadata_path)[0] + ".texture_usage.db"
+
+
+def texture_key(path):
+    """
+    Returns the form texture paths are indexed and looked up with.
+    """
+    return os.path.normcase(os.path.normpath(path)).replace("\\", "/")
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def metadata_signature(metadata_path):
+    """
+    Returns the signature of the content of a metadata file: the revision of a catalog,
+    or the mtime and size of a JSON snapshot and its record log.
+    """
+    if _catalog.is_catalog(metadata_path):
+        return json.dumps(["catalog", _metadata_store.open_catalog(metadata_path)[0].revision()])
+    log = _record_log.log_path(metadata_path)
+    return json.dumps([_signature(path) for path in (metadata_path, log + ".compacting", log)])
+
+
+class TextureUsageIndex:
+    """
+    Read and write access to the texture usage index of a metadata file. Created if it does not exist.
+
+    :param metadata_path: Path to the metadata file the index belongs to.
+    """
+
+    def __init__(self, metadata_path):
+        self.metadata_path = metadata_path
+        self.path = index_path(metadata_path)
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        # A commit lost in a crash only leaves the index behind the metadata, which opening it detects
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def is_current(self):
+        """
+        Returns True if the index matches the metadata as it is on disk.
+        """
+        with self._lock:
+            row = self.connection.execute("SELECT value FROM info WHERE key = 'signature'").fetchone()
+        return row is not None and row[0] == metadata_signature(self.metadata_path)
+
+    def mark_current(self):
+        """
+        Records that the index matches the metadata on disk, after the metadata was written without changing
+        what it holds, e.g. compacted.
+        """
+        with self._lock:
+            self._set_signature(self.connection.cursor())
+            self.connection.commit()
+
+    def _set_signature(self, cursor):
+        cursor.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('signature', ?)",
+                       (metadata_signature(self.metadata_path),))
+
+    def _replace(self, cursor, source_tag, geometry_file, entry):
+        cursor.execute("DELETE FROM uses WHERE source_tag = ? AND geometry_file = ?", (source_tag, geometry_file))
+        if entry is None:
+            return
+        rows = []
+        for material, data in entry["materials"].items():
+            for slot, texture in data["textures"].items():
+                key = texture_key(texture)
+                rows.append((key, key.rsplit("/", 1)[-1], source_tag, geometry_file, material, slot))
+        cursor.executemany("INSERT INTO uses (path, name, source_tag, geometry_file, material, slot) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def update_asset(self, source_tag, geometry_file, entry, commit=True):
+        """
+        Replaces the textures of one asset, called right after its entry was written to the metadata.
+        An entry of None removes the asset.
+        Updates left uncommitted by a crash are caught by the signature check of open_index.
+        """
+        with self._lock:
+            cursor = self.connection.cursor()
+            self._replace(cursor, source_tag, geometry_file, entry)
+            self._set_signature(cursor)
+            if commit:
+                self.connection.commit()
+
+    def commit(self):
+        with self._lock:
+            self.connection.commit()
+
+    def rebuild(self):
+        """
+        Indexes every asset of the metadata again, in a single transaction.
+        """
+        metadata = _metadata_store.load_metadata(self.metadata_path)
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.execute("DELETE FROM uses")
+            for source_tag in metadata:
+                library = metadata[source_tag]
+                for geometry_file in library:
+                    self._replace(cursor, source_tag, geometry_file, library[geometry_file])
+            self._set_signature(cursor)
+            self.connection.commit()
+
+    def uses(self, texture, source_tag=None):
+        """
+        Returns the (source tag, geometry file, material, slot) uses of a texture,
+        matched on its full path, or on its file name if it is given without a folder.
+        """
+        key = texture_key(texture)
+        column = "path" if "/" in key else "name"
+        query = "SELECT source_tag, geometry_file, material, slot FROM uses WHERE {} = ?".format(column)
+        parameters = [key]
+        if source_tag is not None:
+            query += " AND source_tag = ?"
+            parameters.append(source_tag)
+        with self._lock:
+            return self.connection.execute(query + " ORDER BY geometry_file, material, slot", parameters).fetchall()
+
+    def assets_using(self, textures, source_tag=None):
+        """
+        Returns the sorted (source tag, geometry file) pairs of the assets using any of the given textures.
+        """
+        assets = set()
+        for texture in textures:
+            assets.update((tag, geometry_file) for tag, geometry_file, material, slot in self.uses(texture, source_tag))
+        return sorted(assets)
+
+
+def open_index(metadata_path):
+    """
+    Returns the texture usage index of a metadata file, rebuilt first if the metadata changed behind its back.
+    """
+    index = TextureUsageIndex(metadata_path)
+    if not index.is_current():
+        index.rebuild()
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List the assets and materials using textures.")
+    parser.add_argument("metadata", help="Path to the assets metadata file.")
+    parser.add_argument("textures", nargs="+", help="Texture paths, or file names to match in any folder.")
+    parser.add_argument("--source-tag", default=None, help="Only list the uses in this library.")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    index = open_index(args.metadata)
+    for texture in args.textures:
+        uses = index.uses(texture, args.source_tag)
+        print("{}: {} use(s)".format(texture, len(uses)))
+        for source_tag, geometry_file, material, slot in uses:
+            print("    {} {} {} {}".format(source_tag, geometry_file, material, slot))
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import argparse
+import importlib
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+import traceback
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from usd_utils import _batch, _hashed_cache, _mesh_decimate, _metadata_store
+
+"""
+    Preview thumbnails of the assets for the browser, rasterised from their geometry in batch worker processes.
+
+    Thumbnails are cached on disk next to the metadata file, in <metadata>.thumbnails, named after the content hash
+    of their geometry file, so a preview is only rendered again once its geometry changes and identical geometry
+    files share one. Content hashes are cached on the mtime and size of the geometry files.
+
+    The rasteriser is plain python: the geometry is reduced to at most max_faces, flat shaded and drawn from
+    a three-quarter view into a PNG. Workers read the geometry with the same readers as the headless writer,
+    so the default one needs hython.
+
+    Example:
+        python -m usd_utils._thumbnails assets_metadata.json --source-tag KB --workers 8 --interpreter hython
+"""
+
+THUMBNAIL_SIZE = 128
+MAX_FACES = 20000
+DEFAULT_READER = "usd_utils._hou_geometry_reader:read_geometry"
+
+
+def cache_dir(json_file):
+    """
+    Returns the thumbnail cache folder of a metadata file.
+    """
+    return os.path.splitext(json_file)[0] + ".thumbnails"
+
+
+class ThumbnailCache(_hashed_cache.HashedCache):
+    """
+    Thumbnails keyed by the content hash of their geometry file.
+
+    :param path: Cache folder.
+    :param size: Thumbnail width and height in pixels.
+    """
+
+    def __init__(self, path, size=THUMBNAIL_SIZE):
+        super(ThumbnailCache, self).__init__(path)
+        self.size = size
+
+    def target_name(self, digest):
+        return "{}_{}.png".format(digest, self.size)
+
+
+def get_reader(name):
+    module_name, _, function_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def merge_partitions(partitions):
+    """
+    Returns the (points, face_vertex_counts, face_vertex_indices) of all the partitions of a geometry reader.
+    """
+    points = []
+    counts = []
+    indices = []
+    for data in partitions.values():
+        offset = len(points)
+        points.extend(tuple(point) for point in data["points"])
+        counts.extend(data["face_vertex_counts"])
+        indices.extend(index + offset for index in data["face_vertex_indices"])
+    return points, counts, indices
+
+
+def rasterise(points, face_vertex_counts, face_vertex_indices, size=THUMBNAIL_SIZE, yaw=45.0, pitch=30.0):
+    """
+    Draws a flat shaded mesh seen from the front right and above, fit to the image.
+    Returns the size * size RGBA pixels as a bytearray, transparent where there is no geometry.
+    """
+    pixels = bytearray(size * size * 4)
+    if not points or not face_vertex_counts:
+        return pixels
+
+    # View space: y up, looking down -z
+    cos_yaw, sin_yaw = math.cos(math.radians(yaw)), math.sin(math.radians(yaw))
+    cos_pitch, sin_pitch = math.cos(math.radians(pitch)), math.sin(math.radians(pitch))
+    view = []
+    for x, y, z in points:
+        x, z = x * cos_yaw - z * sin_yaw, x * sin_yaw + z * cos_yaw
+        y, z = y * cos_pitch - z * sin_pitch, y * sin_pitch + z * cos_pitch
+        view.append((x, y, z))
+
+    min_x = min(point[0] for point in view)
+    max_x = max(point[0] for point in view)
+    min_y = min(point[1] for point in view)
+    max_y = max(point[1] for point in view)
+    margin = 0.05 * size
+    scale = (size - 2 * margin) / (max(max_x - min_x, max_y - min_y) or 1.0)
+    offset_x = (size - (max_x - min_x) * scale) * 0.5
+    offset_y = (size - (max_y - min_y) * scale) * 0.5
+    screen = [((x - min_x) * scale + offset_x, size - ((y - min_y) * scale + offset_y), z) for x, y, z in view]
+
+    light = (0.3, 0.5, 0.81)
+    depth = [float("-inf")] * (size * size)
+    offset = 0
+    for count in face_vertex_counts:
+        face = face_vertex_indices[offset:offset + count]
+        offset += count
+        if count < 3:
+            continue
+        # Flat shading from the face normal in view space
+        a, b, c = view[face[0]], view[face[1]], view[face[2]]
+        normal = ((b[1] - a[1]) * (c[2] - a[2]) - (b[2] - a[2]) * (c[1] - a[1]),
+                  (b[2] - a[2]) * (c[0] - a[0]) - (b[0] - a[0]) * (c[2] - a[2]),
+                  (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0]))
+        length = math.sqrt(normal[0] ** 2 + normal[1] ** 2 + normal[2] ** 2) or 1.0
+        shade = 0.25 + 0.75 * abs(normal[0] * light[0] + normal[1] * light[1] + normal[2] * light[2]) / length
+        color = (int(170 * shade), int(180 * shade), int(195 * shade))
+
+        for corner in range(1, count - 1):
+            _fill_triangle(screen[face[0]], screen[face[corner]], screen[face[corner + 1]], size, depth, pixels,
+                           color)
+    return pixels
+
+
+def _fill_triangle(a, b, c, size, depth, pixels, color):
+    area = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    if area == 0:
+        return
+    min_x = max(0, int(min(a[0], b[0], c[0])))
+    max_x = min(size - 1, int(max(a[0], b[0], c[0])))
+    min_y = max(0, int(min(a[1], b[1], c[1])))
+    max_y = min(size - 1, int(max(a[1], b[1], c[1])))
+    for y in range(min_y, max_y + 1):
+        sample_y = y + 0.5
+        for x in range(min_x, max_x + 1):
+            sample_x = x + 0.5
+            w0 = ((b[0] - sample_x) * (c[1] - sample_y) - (b[1] - sample_y) * (c[0] - sample_x)) / area
+            w1 = ((c[0] - sample_x) * (a[1] - sample_y) - (c[1] - sample_y) * (a[0] - sample_x)) / area
+            w2 = 1.0 - w0 - w1
+            if w0 < 0 or w1 < 0 or w2 < 0:
+                continue
+            z = w0 * a[2] + w1 * b[2] + w2 * c[2]
+            pixel = y * size + x
+            if z <= depth[pixel]:
+                continue
+            depth[pixel] = z
+            pixels[pixel * 4:pixel * 4 + 4] = bytes((color[0], color[1], color[2], 255))
+
+
+def write_png(path, pixels, size):
+    """
+    Writes RGBA pixels to a PNG file, through a temporary file so readers never see a partial one.
+    """
+    def chunk(tag, data):
+        return (struct.pack(">I", len(data)) + tag + data
+                + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+    stride = size * 4
+    raw = b"".join(b"\x00" + bytes(pixels[row * stride:(row + 1) * stride]) for row in range(size))
+    data = (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b""))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as output_file:
+        output_file.write(data)
+    os.replace(tmp_path, path)
+
+
+def render_thumbnail(geometry_file, target, reader, size=THUMBNAIL_SIZE, max_faces=MAX_FACES):
+    """
+    Reads a geometry file, reduces it to at most max_faces and writes its thumbnail to target.
+    """
+    points, counts, indices = merge_partitions(reader(geometry_file))
+    if len(counts) > max_faces:
+        points, counts, indices = _mesh_decimate.decimate(points, counts, indices, max_faces / float(len(counts)))
+    write_png(target, rasterise(points, counts, indices, size), size)
+
+
+def run_shard(spec):
+    """
+    Renders every thumbnail of a shard in the current process, appending one result per asset
+    to the shard results file, the same way the batch conversion workers do.
+    """
+    try:
+        reader = get_reader(spec["reader"])
+        error = None
+    except Exception:
+        reader = None
+        error = traceback.format_exc()
+
+    with open(spec["results_file"], "a") as results_file:
+        for geometry_file in spec["assets"]:
+            result = {"geometry_file": geometry_file, "status": "ok", "error": error, "elapsed": 0.0}
+            start = time.time()
+            if reader is None:
+                result["status"] = "failed"
+            else:
+                try:
+                    render_thumbnail(geometry_file, spec["targets"][geometry_file], reader, spec["size"],
+                                     spec["max_faces"])
+                except Exception:
+                    result["status"] = "failed"
+                    result["error"] = traceback.format_exc()
+            result["elapsed"] = time.time() - start
+            results_file.write(json.dumps(result) + "\n")
+            results_file.flush()
+
+
+def worker_command(interpreter, spec_file):
+    return [interpreter or "hython", "-m", "usd_utils._thumbnails", "--worker", spec_file]
+
+
+def render_thumbnails(cache, geometry_files, workers=1, interpreter=None, reader=DEFAULT_READER,
+                      max_faces=MAX_FACES):
+    """
+    Renders the missing thumbnails of the given assets in a pool of worker processes and returns
+    the per-asset results. Cached thumbnails are not rendered again.
+    """
+    missing = cache.missing(geometry_files)
+    cache.save()
+    assets = sorted(missing)
+    results = []
+    shards = _batch.shard(assets, workers) if assets else []
+    with tempfile.TemporaryDirectory(prefix="usd_thumbnails_") as tmp_dir:
+        jobs = []
+        with ThreadPoolExecutor(max_workers=max(1, len(shards))) as pool:
+            for index, shard_assets in enumerate(shards):
+                spec_file = os.path.join(tmp_dir, "shard_{}.json".format(index))
+                spec = {"reader": reader, "size": cache.size, "max_faces": max_faces, "assets": shard_assets,
+                        "targets": dict((geometry_file, missing[geometry_file]) for geometry_file in shard_assets),
+                        "results_file": os.path.join(tmp_dir, "results_{}.jsonl".format(index))}
+                with open(spec_file, "w") as output_file:
+                    json.dump(spec, output_file)
+                jobs.append(pool.submit(_batch.run_worker, worker_command(interpreter, spec_file), spec))
+            for job in jobs:
+                results.extend(job.result())
+    results.sort(key=lambda result: result["geometry_file"])
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "--worker":
+        with open(argv[1], "r") as read_file:
+            run_shard(json.load(read_file))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Render the preview thumbnails of a metadata library.")
+    parser.add_argument("metadata", help="Path to the assets metadata file.")
+    parser.add_argument("--source-tag", required=True, help="Library tag, e.g. KB.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--interpreter", default=None, help="Interpreter running the workers. Defaults to hython.")
+    parser.add_argument("--reader", default=DEFAULT_READER, help="Geometry reader as module:function.")
+    parser.add_argument("--size", type=int, default=THUMBNAIL_SIZE, help="Thumbnail width and height in pixels.")
+    parser.add_argument("--max-faces", type=int, default=MAX_FACES,
+                        help="Geometry is reduced to at most this many faces before it is drawn.")
+    args = parser.parse_args(argv)
+
+    metadata = _metadata_store.load_metadata(args.metadata)
+    assets = [geometry_file for geometry_file, asset_name in _metadata_store.list_assets(metadata, args.source_tag)]
+    cache = ThumbnailCache(cache_dir(args.metadata), args.size)
+    start = time.time()
+    results = render_thumbnails(cache, assets, args.workers, args.interpreter, args.reader, args.max_faces)
+    failed = [result for result in results if result["status"] != "ok"]
+    for result in failed:
+        print("thumbnail failed {}\n{}".format(result["geometry_file"], result["error"]))
+    print("{} thumbnails rendered, {} failed, {} up to date in {:.2f}s".format(
+        len(results) - len(failed), len(failed), len(assets) - len(results), time.time() - start))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
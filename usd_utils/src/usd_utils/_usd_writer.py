@@ -0,0 +1,586 @@
+import contextlib
+import hashlib
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from pxr import Kind, Sdf, Usd, UsdGeom, UsdShade
+
+from usd_utils import (_assembly, _asset_paths, _build_manifest, _geometry_cache, _importers, _mesh_decimate,
+                       _metadata_store, _profiling, _texture_resolver)
+
+"""
+ Headless writer that builds the same USD layout as KBGeometryImport.create_main_template
+    directly with the USD API, without creating or cooking any LOP nodes:
+
+        /main                                   assembly
+        /main/<asset>/<asset>/<partition>       one mesh per material partition
+        /main/materials/<mat>                   MaterialX standard surface + displacement networks
+
+    Geometry is read separately by geometry_reader, a callable returning the partitions of a geometry
+    file. The default one, _geometry_reader.read_geometry, reads OBJ and USD geometry with plain usd-core
+    and anything else through hou, see _hou_geometry_reader. Passing a custom reader lets the writer read
+    other formats without Houdini.
+
+    With shared_materials, every unique material is written once into a shared materials layer
+    (see _asset_paths.shared_materials_path) and /main/materials/<mat> only references it.
+
+    With proxy_ratios, reduced copies of the geometry are written to a proxy layer (see _asset_paths.proxy_path)
+    as one "lod" variant per ratio and referenced at /main/<asset>/proxy with purpose proxy, while the render
+    geometry gets purpose render. The proxy layer is only rewritten when the geometry file or the ratios change.
+
+    With payload, the meshes are written to a geometry layer (see _asset_paths.payload_path) brought in as a payload
+    at /main/<asset>/<asset>. The asset .usd only keeps the interface: kind, extentsHint, materials and bindings,
+    so stages referencing many assets can be opened unloaded.
+
+    :param json_file: Path to the JSON metadata file.
+    :param import_render: Identifier which render setup to use.
+    :param source_tag: Metadata library tag used to select assets.
+    :param add_displacement: If True, includes displacement textures.
+    :param add_extra_tex: If True, includes additional textures based on schema.
+    :param geometry_reader: Callable taking a geometry file path and returning its partitions.
+    :param shared_materials: If True, references materials from a shared layer instead of writing them per asset.
+    :param materials_layer: Path of the shared materials layer, defaults to one per usd folder.
+    :param proxy_ratios: Ratios of faces kept by the proxy geometry, the first one is selected by default.
+    :param payload: If True, writes the meshes to a separate geometry layer loaded as a payload.
+    :param geometry_cache: If True, or a GeometryCache to share, geometry baked by the geometry pre-pass is read
+        instead of the source files.
+        Only used with readers having a partition_attrib attribute, which are passed partition_attrib="path"
+        for baked geometry. Other readers keep reading the source files.
+"""
+
+# MaterialX input types of the nodes created by the material library
+MTLX_INPUT_TYPES = {
+    "base_color": "color3",
+    "specular_color": "color3",
+    "specular_roughness": "float",
+    "metalness": "float",
+    "opacity": "color3",
+    "emission_color": "color3",
+    "displacement": "float",
+}
+
+_SDF_TYPES = {
+    "color3": Sdf.ValueTypeNames.Color3f,
+    "float": Sdf.ValueTypeNames.Float,
+}
+
+
+class USDWriter:
+    # Cached texture directory listings, shared by all writers
+    texture_resolver = _texture_resolver.TextureResolver()
+
+    def __init__(self, json_file, import_render, source_tag, add_displacement=True, add_extra_tex=False,
+                 geometry_reader=None, shared_materials=False, materials_layer=None, proxy_ratios=None,
+                 payload=False, geometry_cache=False):
+        self.metadata = json_file
+        self.import_render = import_render
+        self.source_tag = source_tag
+        self.add_displacement = add_displacement
+        self.add_extra_tex = add_extra_tex
+        self.shared_materials = shared_materials
+        self.materials_layer = materials_layer
+        self.proxy_ratios = list(proxy_ratios or [])
+        self.payload = payload
+        # Material networks written by this writer, keyed by material_layout. They depend on its options,
+        # so they are not shared with other writers
+        self.material_templates = {}
+        self.template_layer = Sdf.Layer.CreateAnonymous("material_templates")
+        # Bounds of the converted assets, kept for the assembly layout (see _assembly)
+        self.bounds = {}
+
+        script_dir = os.path.dirname(__file__)
+        self.parameters_scheme = os.path.normpath(os.path.join(script_dir, "parameters_schema.json"))
+        self.texture_schema = os.path.normpath(os.path.join(script_dir, "inputs_schema.json"))
+
+        if geometry_reader is None:
+            from usd_utils import _geometry_reader
+            geometry_reader = _geometry_reader.read_geometry
+        self.geometry_reader = geometry_reader
+        # Baked geometry read instead of the source files when available, see _geometry_cache
+        self.geometry_cache = None
+        if geometry_cache and hasattr(geometry_reader, "partition_attrib"):
+            self.geometry_cache = (geometry_cache if isinstance(geometry_cache, _geometry_cache.GeometryCache)
+                                   else _geometry_cache.GeometryCache(_geometry_cache.cache_dir(json_file)))
+            self.wrangle_code = _geometry_cache.library_wrangle_code(source_tag)
+
+        self.metadata_read = _metadata_store.load_metadata(self.metadata)
+
+    def create_main_template(self, geometry_file, output_path=None):
+        """
+        Writes the .usd file of a single geometry asset and returns its path.
+        By default the file goes to the same location the usd_rop of create_usd_rop writes to.
+        """
+        entry = self.metadata_read[self.source_tag][geometry_file]
+        if output_path is None:
+            output_path = _asset_paths.usd_output_path(geometry_file, entry["asset_name"])
+
+        # Missing textures are reported before any prim is created
+        with _profiling.stage("check_textures", geometry_file):
+            for texture in self.check_textures([geometry_file], refresh=False).get(geometry_file, []):
+                print("texture missing {}".format(texture))
+
+        stage = self.create_stage(output_path)
+
+        def prims():
+            return sum(1 for prim in stage.Traverse())
+
+        self.create_prim(stage)
+        with _profiling.stage("read_geometry", geometry_file):
+            partitions = self.read_geometry(geometry_file)
+            self.bounds[geometry_file] = _assembly.mesh_bounds(partitions)
+        with _profiling.stage("create_geometry", geometry_file, prims=prims):
+            if self.payload:
+                meshes = self.create_payload(stage, geometry_file, entry["asset_name"], output_path, partitions)
+            else:
+                meshes = self.create_geometry(stage, geometry_file, entry["asset_name"], partitions)
+        with _profiling.stage("create_materialx_shader", geometry_file, prims=prims):
+            if self.shared_materials:
+                materials = self.reference_shared_materials(stage, geometry_file, output_path)
+            else:
+                materials = self.create_materialx_shader(stage, geometry_file)
+            self.assign_materials(meshes, materials)
+        if self.proxy_ratios:
+            with _profiling.stage("create_proxy", geometry_file, prims=prims):
+                proxies = self.reference_proxy(stage, geometry_file, entry["asset_name"], output_path, partitions)
+                self.assign_materials(proxies, materials)
+        if self.payload:
+            self.set_extents_hint(stage, entry["asset_name"])
+
+        with _profiling.stage("save", geometry_file):
+            stage.GetRootLayer().Save()
+        return output_path
+
+    def read_geometry(self, geometry_file):
+        """
+        Returns the partitions of a geometry file, read from its baked geometry when it is in the geometry cache.
+        Baked geometry is partitioned on its path attribute, so it is only read with readers taking partition_attrib.
+        """
+        if self.geometry_cache is not None:
+            cached = self.geometry_cache.lookup(geometry_file, self.wrangle_code)
+            if cached is not None:
+                return self.geometry_reader(cached, partition_attrib="path")
+        return self.geometry_reader(geometry_file)
+
+    def release_memory(self, full=False):
+        """
+        Called between assets of a batch. The writer keeps nothing per asset but its bounds,
+        with full the cached texture directory listings are dropped as well.
+        """
+        if full:
+            self.texture_resolver.clear()
+
+    def create_stage(self, output_path):
+        """
+        Creates an empty stage writing to output_path with the same stage metadata Houdini writes.
+        Any previous content of the file is discarded.
+        """
+        output_dir = os.path.dirname(output_path)
+        if output_dir and not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+
+        layer = Sdf.Layer.Find(output_path)
+        if layer is None:
+            layer = Sdf.Layer.CreateNew(output_path)
+        else:
+            layer.Clear()
+        stage = Usd.Stage.Open(layer)
+        UsdGeom.SetStageUpAxis(stage, UsdGeom.Tokens.y)
+        UsdGeom.SetStageMetersPerUnit(stage, 1.0)
+        return stage
+
+    def create_prim(self, stage):
+        """
+        Creates the /main assembly prim, the equivalent of the LOP Primitive node.
+        """
+        prim = UsdGeom.Xform.Define(stage, "/main").GetPrim()
+        Usd.ModelAPI(prim).SetKind(Kind.Tokens.assembly)
+        stage.SetDefaultPrim(prim)
+        return prim
+
+    def create_geometry(self, stage, geometry_file, asset_name, partitions=None):
+        """
+        Writes one mesh per partition of the geometry file under /main/<asset>/<asset>,
+        matching the layout the grafted sopcreate node produces.
+        Returns the created meshes keyed by partition name.
+        """
+        root = "/main/{0}/{0}".format(asset_name)
+        UsdGeom.Xform.Define(stage, "/main/" + asset_name)
+        UsdGeom.Xform.Define(stage, root)
+
+        if partitions is None:
+            partitions = self.read_geometry(geometry_file)
+        meshes = {}
+        for name, data in partitions.items():
+            mesh = self.create_mesh(stage, root + "/" + name, data["points"], data["face_vertex_counts"],
+                                    data["face_vertex_indices"])
+            if data.get("st"):
+                primvar = UsdGeom.PrimvarsAPI(mesh).CreatePrimvar("st", Sdf.ValueTypeNames.TexCoord2fArray,
+                                                                  UsdGeom.Tokens.faceVarying)
+                primvar.Set(data["st"])
+            meshes[name] = mesh
+        return meshes
+
+    def write_payload_layer(self, geometry_file, asset_name, output_path, partitions=None):
+        """
+        Writes the meshes of an asset to its geometry layer, with the layout of create_geometry, and returns its path.
+        """
+        layer_path = _asset_paths.payload_path(output_path)
+        geometry_stage = self.create_stage(layer_path)
+        self.create_geometry(geometry_stage, geometry_file, asset_name, partitions)
+        geometry_stage.GetRootLayer().Save()
+        return layer_path
+
+    def create_payload(self, stage, geometry_file, asset_name, output_path, partitions=None):
+        """
+        Writes the geometry layer of an asset and loads it as a payload at /main/<asset>/<asset>.
+        Returns the meshes keyed by partition name, as create_geometry does.
+        """
+        layer_path = self.write_payload_layer(geometry_file, asset_name, output_path, partitions)
+        asset = UsdGeom.Xform.Define(stage, "/main/" + asset_name)
+        Usd.ModelAPI(asset.GetPrim()).SetKind(Kind.Tokens.component)
+        root = UsdGeom.Xform.Define(stage, "/main/{0}/{0}".format(asset_name))
+        root.GetPrim().GetPayloads().AddPayload(_asset_paths.relative_path(layer_path, os.path.dirname(output_path)),
+                                                root.GetPath())
+        return dict((child.GetName(), UsdGeom.Mesh(child)) for child in root.GetPrim().GetChildren())
+
+    def set_extents_hint(self, stage, asset_name):
+        """
+        Stores the bounds of the asset on its prim, so they are known without loading the payload.
+        """
+        model = UsdGeom.ModelAPI(stage.GetPrimAtPath("/main/" + asset_name))
+        bbox_cache = UsdGeom.BBoxCache(Usd.TimeCode.Default(), [UsdGeom.Tokens.default_, UsdGeom.Tokens.render,
+                                                                UsdGeom.Tokens.proxy])
+        model.SetExtentsHint(model.ComputeExtentsHint(bbox_cache))
+
+    def create_mesh(self, stage, path, points, face_vertex_counts, face_vertex_indices):
+        mesh = UsdGeom.Mesh.Define(stage, path)
+        mesh.CreateOrientationAttr(UsdGeom.Tokens.leftHanded)
+        mesh.CreateSubdivisionSchemeAttr(UsdGeom.Tokens.none)
+        mesh.CreatePointsAttr(points)
+        mesh.CreateFaceVertexCountsAttr(face_vertex_counts)
+        mesh.CreateFaceVertexIndicesAttr(face_vertex_indices)
+        mesh.CreateExtentAttr(UsdGeom.PointBased.ComputeExtent(mesh.GetPointsAttr().Get()))
+        return mesh
+
+    def write_proxy_layer(self, geometry_file, output_path, partitions=None):
+        """
+        Writes the proxy geometry of an asset, unless the proxy layer already matches the geometry file
+        and the ratios, and returns the layer path.
+        """
+        layer_path = _asset_paths.proxy_path(output_path)
+        source = json.dumps({"geometry": _build_manifest.file_signature(geometry_file), "ratios": self.proxy_ratios})
+        layer = Sdf.Layer.FindOrOpen(layer_path) if os.path.exists(layer_path) else None
+        if layer is not None:
+            layer.Reload()
+            if layer.customLayerData.get("proxy_source") == source:
+                return layer_path
+
+        if partitions is None:
+            partitions = self.read_geometry(geometry_file)
+        stage = self.create_stage(layer_path)
+        root = UsdGeom.Xform.Define(stage, "/proxy")
+        stage.SetDefaultPrim(root.GetPrim())
+        variant_set = root.GetPrim().GetVariantSets().AddVariantSet("lod")
+        for ratio in self.proxy_ratios:
+            variant = lod_variant_name(ratio)
+            variant_set.AddVariant(variant)
+            variant_set.SetVariantSelection(variant)
+            with variant_set.GetVariantEditContext():
+                for name, data in partitions.items():
+                    points, counts, indices = _mesh_decimate.decimate(data["points"], data["face_vertex_counts"],
+                                                                      data["face_vertex_indices"], ratio)
+                    if counts:
+                        self.create_mesh(stage, "/proxy/" + name, points, counts, indices)
+        variant_set.SetVariantSelection(lod_variant_name(self.proxy_ratios[0]))
+
+        layer = stage.GetRootLayer()
+        layer.customLayerData = {"proxy_source": source}
+        layer.Save()
+        return layer_path
+
+    def reference_proxy(self, stage, geometry_file, asset_name, output_path, partitions=None):
+        """
+        References the proxy geometry of an asset at /main/<asset>/proxy with purpose proxy
+        and gives the render geometry purpose render. Returns the proxy meshes keyed by partition name.
+        """
+        layer_path = self.write_proxy_layer(geometry_file, output_path, partitions)
+        render = UsdGeom.Imageable(stage.GetPrimAtPath("/main/{0}/{0}".format(asset_name)))
+        render.CreatePurposeAttr(UsdGeom.Tokens.render)
+
+        proxy = UsdGeom.Xform.Define(stage, "/main/{}/proxy".format(asset_name))
+        proxy.CreatePurposeAttr(UsdGeom.Tokens.proxy)
+        proxy.GetPrim().GetReferences().AddReference(
+            _asset_paths.relative_path(layer_path, os.path.dirname(output_path)))
+        render.CreateProxyPrimRel().SetTargets([proxy.GetPath()])
+        return dict((child.GetName(), UsdGeom.Mesh(child)) for child in proxy.GetPrim().GetChildren())
+
+    def create_material_lib(self, stage):
+        """
+        Creates the /main/materials scope, the equivalent of the Material Library node.
+        """
+        return UsdGeom.Scope.Define(stage, "/main/materials")
+
+    def create_materialx_shader(self, stage, geometry_file):
+        """
+        Writes a MaterialX network for every material of the asset,
+        wiring textures based on parameters and texture schemas.
+        Materials with a texture slot layout that was already written are stamped from its template
+        and only get their file inputs changed.
+        Returns the created materials keyed by material name.
+        """
+        mat_lib = self.create_material_lib(stage)
+        _materials = self.metadata_read[self.source_tag][geometry_file]["materials"]
+
+        materials = {}
+        for mat in _materials:
+            path = mat_lib.GetPath().AppendChild(mat)
+            materials[mat] = self.write_material(stage, path, _materials[mat]["textures"])
+        return materials
+
+    def write_material(self, stage, path, textures):
+        """
+        Writes a single material, stamping it from the template of its layout when there is one.
+        """
+        layout = self.material_layout(textures)
+        template = self.material_templates.get(layout)
+        if template is None:
+            files = self.build_material(stage, path, textures)
+            template_path = Sdf.Path("/template_{}".format(len(self.material_templates)))
+            Sdf.CopySpec(stage.GetRootLayer(), path, self.template_layer, template_path)
+            self.material_templates[layout] = {"path": template_path, "files": files}
+        else:
+            Sdf.CopySpec(self.template_layer, template["path"], stage.GetRootLayer(), path)
+            for shader_name, source in template["files"].items():
+                stage.GetPrimAtPath(path.AppendChild(shader_name)).GetAttribute("inputs:file").Set(
+                    Sdf.AssetPath(self.template_texture(textures, source)))
+        return UsdShade.Material(stage.GetPrimAtPath(path))
+
+    def shared_materials_path(self, geometry_file, output_path=None):
+        if self.materials_layer:
+            return self.materials_layer
+        if output_path is None:
+            asset_name = self.metadata_read[self.source_tag][geometry_file]["asset_name"]
+            output_path = _asset_paths.usd_output_path(geometry_file, asset_name)
+        return _asset_paths.shared_materials_path(output_path)
+
+    def material_signature(self, textures):
+        """
+        Returns the digest of everything a material is written from: its textures, the extra textures found
+        next to them and the render setup options.
+        """
+        data = [sorted(textures.items()), sorted(self.extra_textures(textures).items()), self.import_render,
+                self.add_extra_tex, self.add_displacement]
+        return hashlib.sha1(json.dumps(data).encode("utf-8")).hexdigest()
+
+    def write_shared_materials(self, geometry_file, output_path=None):
+        """
+        Adds the materials of an asset to its shared materials layer and returns the layer path.
+        Every material carries the signature it was written from in its customData, materials that are missing
+        or whose signature changed, e.g. after their textures were converted, are (re)written.
+        The layer is locked while it is updated, so several worker processes can share it.
+        """
+        layer_path = self.shared_materials_path(geometry_file, output_path)
+        _materials = self.metadata_read[self.source_tag][geometry_file]["materials"]
+
+        layer_dir = os.path.dirname(layer_path)
+        if layer_dir and not os.path.isdir(layer_dir):
+            os.makedirs(layer_dir)
+        with _locked(layer_path):
+            layer = Sdf.Layer.FindOrOpen(layer_path) if os.path.exists(layer_path) else None
+            if layer is None:
+                layer = Sdf.Layer.CreateNew(layer_path)
+            else:
+                layer.Reload()
+            stage = Usd.Stage.Open(layer)
+            mat_lib = UsdGeom.Scope.Define(stage, "/materials")
+            stage.SetDefaultPrim(mat_lib.GetPrim())
+
+            written = 0
+            for mat, material in _materials.items():
+                path = mat_lib.GetPath().AppendChild(mat)
+                signature = self.material_signature(material["textures"])
+                prim = stage.GetPrimAtPath(path)
+                if prim and prim.GetCustomDataByKey(_build_manifest.SIGNATURE_KEY) == signature:
+                    continue
+                if prim:
+                    stage.RemovePrim(path)
+                shader = self.write_material(stage, path, material["textures"])
+                shader.GetPrim().SetCustomDataByKey(_build_manifest.SIGNATURE_KEY, signature)
+                written += 1
+            if written:
+                layer.Save()
+        return layer_path
+
+    def reference_shared_materials(self, stage, geometry_file, output_path):
+        """
+        Writes the materials of an asset to its shared layer and references each of them under /main/materials.
+        """
+        layer_path = self.write_shared_materials(geometry_file, output_path)
+        reference_path = _asset_paths.relative_path(layer_path, os.path.dirname(output_path))
+
+        mat_lib = self.create_material_lib(stage)
+        materials = {}
+        for mat in self.metadata_read[self.source_tag][geometry_file]["materials"]:
+            material = UsdShade.Material.Define(stage, mat_lib.GetPath().AppendChild(mat))
+            material.GetPrim().GetReferences().AddReference(reference_path, "/materials/" + mat)
+            materials[mat] = material
+        return materials
+
+    def build_material(self, stage, path, textures):
+        """
+        Writes a single MaterialX network at the given path.
+        Returns the image shaders and where their file comes from, to reuse the network as a template.
+        """
+        schema = _importers.texture_slots(self.source_tag, self.import_render, self.parameters_scheme)
+        if self.add_extra_tex or self.add_displacement:
+            tex_schema_read = _importers.texture_inputs(self.source_tag, self.texture_schema)
+
+        files = {}
+        material = UsdShade.Material.Define(stage, path)
+        mtlx_st_surface = self.create_shader(material, "mtlxstandard_surface1", "ND_standard_surface_surfaceshader")
+        material.CreateSurfaceOutput("mtlx").ConnectToSource(
+            mtlx_st_surface.CreateOutput("out", Sdf.ValueTypeNames.Token))
+        mtlx_displacement = self.create_shader(material, "mtlxdisplacement1", "ND_displacement_float")
+        material.CreateDisplacementOutput("mtlx").ConnectToSource(
+            mtlx_displacement.CreateOutput("out", Sdf.ValueTypeNames.Token))
+
+        for texture in textures:
+            if texture not in schema:
+                print("texture skipped {}".format(textures[texture]))
+                continue
+            name = "mtlximage{}".format(len(files) + 1)
+            self.add_texture(material, name, textures[texture], mtlx_st_surface, schema[texture])
+            files[name] = ("slot", texture)
+
+        # If add extra textures set to True AO and displacement textures will be created based on texture schema
+        # Only extra textures found on disk are added
+        extras = self.extra_textures(textures)
+        if self.add_extra_tex:
+            tex_schema = tex_schema_read.get("surface", {})
+            for tex_name in tex_schema:
+                if tex_name not in extras:
+                    continue
+                name = "mtlximage{}".format(len(files) + 1)
+                self.add_texture(material, name, extras[tex_name], mtlx_st_surface, tex_schema[tex_name])
+                files[name] = ("extra", tex_name)
+        if self.add_displacement:
+            tex_schema = tex_schema_read.get("displacement", {})
+            for tex_name in tex_schema:
+                if tex_name not in extras:
+                    continue
+                name = "mtlximage{}".format(len(files) + 1)
+                self.add_texture(material, name, extras[tex_name], mtlx_displacement, tex_schema[tex_name])
+                files[name] = ("extra", tex_name)
+                mtlx_displacement.CreateInput("scale", Sdf.ValueTypeNames.Float).Set(0.01)
+        return files
+
+    def material_layout(self, textures):
+        """
+        Key of the material templates: everything but the texture file paths that shapes a material network.
+        """
+        return (self.source_tag, self.import_render, tuple(sorted(textures)), self.add_extra_tex,
+                self.add_displacement, tuple(self.extra_textures(textures)))
+
+    def extra_textures(self, textures):
+        """
+        Returns the extra textures of a material found on disk, keyed by their inputs schema name.
+        They are derived from the first texture of the material.
+        """
+        if not textures:
+            return {}
+        source = list(textures.values())[0]
+        extras = {}
+        for name in _texture_resolver.extra_texture_names(self.texture_schema, self.source_tag, self.add_extra_tex,
+                                                          self.add_displacement):
+            texture = self.texture_resolver.resolve_variant(source, name)
+            if texture is not None:
+                extras[name] = texture
+        return extras
+
+    def check_textures(self, geometry_files, refresh=True):
+        """
+        Checks every texture of the given assets, listing each texture directory once, before anything is written.
+        Returns the missing textures keyed by geometry file.
+
+        :param refresh: If True, the cached directory listings are checked against the disk once first.
+            The checks of single assets during a batch pass False and reuse the listings of the batch.
+        """
+        if refresh:
+            self.texture_resolver.refresh()
+        extra_names = _texture_resolver.extra_texture_names(self.texture_schema, self.source_tag,
+                                                            self.add_extra_tex, self.add_displacement)
+        return _texture_resolver.missing_textures(self.texture_resolver, self.metadata_read[self.source_tag],
+                                                  geometry_files, extra_names)
+
+    def template_texture(self, textures, source):
+        """
+        Returns the file of a template image shader: a texture of the material, or an extra texture
+        derived from its first one.
+        """
+        kind, name = source
+        if kind == "slot":
+            return textures[name]
+        return self.texture_resolver.resolve_variant(list(textures.values())[0], name)
+
+    def create_shader(self, material, name, shader_id):
+        """
+        Defines a MaterialX shader prim inside a material.
+        """
+        shader = UsdShade.Shader.Define(material.GetPrim().GetStage(), material.GetPath().AppendChild(name))
+        shader.CreateIdAttr(shader_id)
+        return shader
+
+    def add_texture(self, material, name, texture, mtlx_node, mtlx_input_name):
+        """
+        Adds an image shader to a MaterialX network and connects it to the given input.
+        """
+        input_type = MTLX_INPUT_TYPES.get(mtlx_input_name, "color3")
+        texture_node = self.create_shader(material, name, "ND_image_" + input_type)
+        texture_node.CreateInput("file", Sdf.ValueTypeNames.Asset).Set(Sdf.AssetPath(texture))
+        output = texture_node.CreateOutput("out", _SDF_TYPES[input_type])
+        mtlx_node.CreateInput(mtlx_input_name, _SDF_TYPES[input_type]).ConnectToSource(output)
+        return texture_node
+
+    def assign_materials(self, meshes, materials):
+        """
+        Binds every material to the partitions starting with its name,
+        the same pattern the assignmaterial node uses.
+        """
+        for mat, material in materials.items():
+            for name, mesh in meshes.items():
+                if name.startswith(mat):
+                    UsdShade.MaterialBindingAPI.Apply(mesh.GetPrim()).Bind(material)
+
+
+def lod_variant_name(ratio):
+    """
+    Returns the "lod" variant of a proxy ratio, e.g. lod_10 for 0.1.
+    """
+    return "lod_" + "{:g}".format(ratio * 100).replace(".", "_")
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """
+    Holds an exclusive lock on path + ".lock" across processes.
+    """
+    with open(path + ".lock", "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
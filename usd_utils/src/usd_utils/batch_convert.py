@@ -0,0 +1,139 @@
+import argparse
+import sys
+import time
+
+from usd_utils import (_assembly, _batch, _build_manifest, _geometry_cache, _metadata_store, _profiling,
+                       _texture_convert, _texture_usage)
+
+"""
+    Command line entry point converting whole libraries to USD in a pool of worker processes.
+
+    Example:
+        python -m usd_utils.batch_convert assets_metadata.json --source-tag KB --asset "KB3D_IRF_Bldg*" --workers 8
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the assets of a metadata library to USD.")
+    parser.add_argument("metadata", help="Path to the assets metadata file.")
+    parser.add_argument("--source-tag", required=True, help="Library tag to convert, e.g. KB.")
+    parser.add_argument("--asset", action="append", dest="assets", default=[],
+                        help="Asset name or geometry path pattern to convert. Can be repeated. Defaults to all.")
+    parser.add_argument("--changed-texture", action="append", dest="changed_textures", default=[],
+                        help="Only convert the assets using this texture, given as a path or a file name. "
+                             "Can be repeated. Combines with --asset.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--backend", choices=_batch.BACKENDS, default="headless",
+                        help="headless writes stages with the USD API, hython builds LOP networks.")
+    parser.add_argument("--interpreter", default=None,
+                        help="Interpreter running the workers. Defaults to this python or hython.")
+    parser.add_argument("--import-render", default="mantra", help="Render setup used to map texture parameters.")
+    parser.add_argument("--add-displacement", action="store_true", help="Add displacement textures.")
+    parser.add_argument("--add-extra-tex", action="store_true", help="Add extra textures based on schema.")
+    parser.add_argument("--shared-materials", action="store_true",
+                        help="Write each material once into a shared materials.usd referenced by the assets.")
+    parser.add_argument("--payload", action="store_true",
+                        help="Write the geometry to a separate layer loaded as a payload, "
+                             "keeping only kind, bounds, materials and bindings in the asset .usd.")
+    parser.add_argument("--proxy-ratio", action="append", type=float, dest="proxy_ratios", default=[],
+                        help="Add reduced proxy geometry keeping this ratio of the faces, e.g. 0.1. "
+                             "Can be repeated, each ratio is a lod variant and the first one is selected.")
+    parser.add_argument("--texture-format", choices=_texture_convert.TEXTURE_FORMATS, default=None,
+                        help="Convert the textures to tiled, mipmapped files of this format first.")
+    parser.add_argument("--texture-converter", default=None,
+                        help="Texture converter name or module:function. Defaults to maketx for tx, imaketx for rat.")
+    parser.add_argument("--geometry-cache", action="store_true",
+                        help="Bake every geometry file once into the geometry cache (path attribute set, unused "
+                             "attributes removed, primitives sorted by material) in hython and convert from it.")
+    parser.add_argument("--force", action="store_true",
+                        help="Convert every selected asset, even the ones whose inputs did not change.")
+    parser.add_argument("--assembly", action="store_true",
+                        help="Write an assembly stage referencing every converted asset of the library, "
+                             "laid out on a grid.")
+    parser.add_argument("--profile", default=None, metavar="PREFIX",
+                        help="Record the time, memory and node or prim counts of every conversion stage "
+                             "to PREFIX.jsonl and PREFIX.trace.json (Chrome trace) and print a per-stage summary.")
+    parser.add_argument("--memory-limit", type=int, default=None, metavar="MB",
+                        help="Recycle a worker once its resident memory stays above this after its caches are "
+                             "cleared, a new worker continues with the remaining assets.")
+    parser.add_argument("--leak-threshold", type=int, default=64, metavar="MB",
+                        help="Report the assets whose conversion left the worker larger by more than this.")
+    parser.add_argument("--report", default=None, help="Write the per-asset JSON report to this path.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    metadata = _metadata_store.load_metadata(args.metadata)
+    if args.changed_textures:
+        # Looked up in the texture usage index, so only the matching assets are read
+        usage = _texture_usage.open_index(args.metadata)
+        assets = [geometry_file for source_tag, geometry_file
+                  in usage.assets_using(args.changed_textures, args.source_tag)]
+        usage.close()
+        assets = _batch.filter_assets(metadata, args.source_tag, assets, args.assets)
+    else:
+        assets = _batch.select_assets(metadata, args.source_tag, args.assets)
+    try:
+        _batch.check_backend(args.backend, assets, args.interpreter)
+    except ValueError as error:
+        print(error)
+        return 2
+    options = {"import_render": args.import_render,
+               "add_displacement": args.add_displacement,
+               "add_extra_tex": args.add_extra_tex,
+               "shared_materials": args.shared_materials,
+               "proxy_ratios": args.proxy_ratios,
+               "payload": args.payload,
+               "geometry_cache": args.geometry_cache}
+
+    # Converted textures are written into the metadata, so it is read again before fingerprinting the assets
+    if args.texture_format:
+        texture_report = _texture_convert.preprocess(args.metadata, args.source_tag, assets, args.texture_format,
+                                                     args.texture_converter, args.workers, args.add_extra_tex,
+                                                     args.add_displacement)
+        print(_texture_convert.format_summary(texture_report))
+        metadata = _metadata_store.load_metadata(args.metadata)
+
+    skipped = []
+    build = _build_manifest.IncrementalBuild(metadata, args.source_tag, options)
+    if not args.force:
+        assets, skipped = build.split(assets)
+
+    if args.geometry_cache:
+        # Baking needs hython, whatever the backend converting the assets
+        interpreter = args.interpreter if args.backend == "hython" else None
+        cache = _geometry_cache.GeometryCache(_geometry_cache.cache_dir(args.metadata))
+        start = time.time()
+        results = _geometry_cache.bake_library(cache, assets, _geometry_cache.library_wrangle_code(args.source_tag),
+                                               args.workers, interpreter)
+        print(_geometry_cache.format_summary(results, len(assets), time.time() - start))
+
+    report = _batch.run_batch(args.metadata, args.source_tag, assets, args.backend, args.workers,
+                              args.interpreter, options, profile=bool(args.profile),
+                              memory_limit=args.memory_limit, leak_threshold=args.leak_threshold)
+    report["skipped"] = skipped
+    for result in report["assets"]:
+        if result["status"] == "ok":
+            build.record(result["geometry_file"], result.get("bounds"))
+    build.save()
+
+    records = [record for result in report["assets"] for record in result.pop("profile", [])]
+    if args.profile:
+        # The stage records go to their own files rather than into the report
+        _profiling.write_jsonl(records, args.profile + ".jsonl")
+        _profiling.write_chrome_trace(records, args.profile + ".trace.json")
+
+    if args.report:
+        _batch.write_report(report, args.report)
+    print(_batch.format_summary(report))
+    if args.profile:
+        print(_profiling.summary_table(records))
+    if args.assembly:
+        assembly_path, count = _assembly.write_assembly(args.metadata, args.source_tag)
+        print("assembly of {} assets written to {}".format(count, assembly_path))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
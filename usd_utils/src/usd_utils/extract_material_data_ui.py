@@ -1,12 +1,9 @@
 import os
-from importlib import reload
 
 import hou
 from PySide2 import QtWidgets, QtCore
 
-from usd_utils import _hou_extract_material_data
-
-reload(_hou_extract_material_data)
+from usd_utils import _hou_extract_material_data, _metadata_store
 
 
 class PublishDialog(QtWidgets.QDialog):
@@ -15,9 +12,7 @@ class PublishDialog(QtWidgets.QDialog):
         self.resize(300, 100)
         self.setWindowTitle('CAT Save metadata')
 
-        script_dir = os.path.dirname(__file__)
-        assets_metadata_path = os.path.join(script_dir, "assets_metadata.json")
-        self.metadata = os.path.normpath(assets_metadata_path)
+        self.metadata = _metadata_store.default_metadata_path()
 
         self.central_layout = QtWidgets.QVBoxLayout()
         self.setLayout(self.central_layout)
@@ -54,8 +49,12 @@ class PublishDialog(QtWidgets.QDialog):
         """
         if self.name_input.text() != "":
             template1 = _hou_extract_material_data.ExtractMaterialsData(self.metadata, self.name_input.text())
-            for node in hou.selectedNodes():
-                template1.get_geometry_data(node)
+            try:
+                for node in hou.selectedNodes():
+                    template1.get_geometry_data(node)
+            finally:
+                # Whatever was read before an interruption is merged as well
+                template1.compact()
             self.close()
         else:
             if hou.isUIAvailable():
@@ -1,24 +1,19 @@
-import json
 import os
-from importlib import reload
+import time
 
 import hou
-from PySide2 import QtWidgets
+from PySide2 import QtCore, QtWidgets
 
-from usd_utils import _houdini_usd
-
-reload(_houdini_usd)
+from usd_utils import (_asset_list_model, _batch, _build_manifest, _geometry_cache, _importers, _job_queue,
+                       _metadata_store, _thumbnails)
 
 
 class PublishDialog(QtWidgets.QDialog):
     def __init__(self, parent=None):
         super(PublishDialog, self).__init__(parent=parent)
 
-        script_dir = os.path.dirname(__file__)
-        assets_metadata_path = os.path.join(script_dir, "assets_metadata.json")
-        self.project_file = os.path.normpath(assets_metadata_path)
+        self.project_file = _metadata_store.default_metadata_path()
 
-        libraries = {"KB": "KitBash"}
         self.selected_assets = []
 
         self.central_layout = QtWidgets.QVBoxLayout()
@@ -26,25 +21,49 @@ class PublishDialog(QtWidgets.QDialog):
         self.resize(700, 600)
         self.setWindowTitle('CAT_USD')
 
-        with open(self.project_file, "r") as read_file:
-            self.read = json.load(read_file)
+        self.read = _metadata_store.load_metadata(self.project_file)
 
         self.lib_list = QtWidgets.QListWidget(self)
-        self.assets_list = QtWidgets.QListWidget(self)
+        # Assets are fetched in pages from the metadata as the list scrolls, their previews load in the background
+        self.thumbnails = _thumbnails.ThumbnailCache(_thumbnails.cache_dir(self.project_file))
+        self.assets_model = _asset_list_model.AssetListModel(self.read, self, thumbnails=self.thumbnails)
+        self.assets_list = QtWidgets.QListView(self)
+        self.assets_list.setModel(self.assets_model)
+        self.assets_list.setUniformItemSizes(True)
+        self.assets_list.setIconSize(QtCore.QSize(64, 64))
         self.assets_list.setSelectionMode(
             QtWidgets.QAbstractItemView.ExtendedSelection
         )
+
+        # The filter is applied once typing pauses
+        self.search_input = QtWidgets.QLineEdit(self)
+        self.search_input.setPlaceholderText("Search assets")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
         self.add_missing_textures = QtWidgets.QCheckBox("Add Missing Textures")
         self.add_missing_textures.setEnabled(False)
 
         self.add_displacement_texture = QtWidgets.QCheckBox("Add Displacement Textures")
         self.add_displacement_texture.setEnabled(False)
 
+        self.shared_materials = QtWidgets.QCheckBox("Share Materials Between Assets")
+        self.shared_materials.setEnabled(False)
+
+        # Proxy geometry keeps a tenth of the faces
+        self.proxy_ratios = [0.1]
+        self.add_proxy_geometry = QtWidgets.QCheckBox("Add Proxy Geometry")
+        self.add_proxy_geometry.setEnabled(False)
+
+        self.payload_geometry = QtWidgets.QCheckBox("Load Geometry as Payload")
+        self.payload_geometry.setEnabled(False)
+
         library_list = self.read.keys()
 
         for i in library_list:
             item = QtWidgets.QListWidgetItem()
-            item.setText(libraries[i])
+            item.setText(_importers.library_label(i))
             item.setData(1, i)
             self.lib_list.addItem(item)
 
@@ -54,29 +73,60 @@ class PublishDialog(QtWidgets.QDialog):
         self.libraries_grp_layout.addWidget(self.lib_list)
 
         self.assets_grp = QtWidgets.QGroupBox('Assets Group')
-        self.assets_grp_layout = QtWidgets.QHBoxLayout()
+        self.assets_grp_layout = QtWidgets.QVBoxLayout()
         self.assets_grp.setLayout(self.assets_grp_layout)
+        self.assets_grp_layout.addWidget(self.search_input)
         self.assets_grp_layout.addWidget(self.assets_list)
 
         self.save_in_bg = QtWidgets.QPushButton("Save to Disk in Background", self)
         self.save_in_bg.setEnabled(False)
         self.load_template = QtWidgets.QPushButton("Load Template", self)
         self.load_template.setEnabled(False)
+        self.render_previews = QtWidgets.QPushButton("Render Previews", self)
+        self.render_previews.setEnabled(False)
+
+        # Background conversion progress
+        self.queue = None
+        self.build = None
+        self.jobs_started = 0.0
+        self.progress_bar = QtWidgets.QProgressBar(self)
+        self.progress_bar.setVisible(False)
+        self.progress_label = QtWidgets.QLabel(self)
+        self.cancel_jobs = QtWidgets.QPushButton("Cancel", self)
+        self.cancel_jobs.setEnabled(False)
+        self.retry_jobs = QtWidgets.QPushButton("Retry Failed", self)
+        self.retry_jobs.setEnabled(False)
+        self.jobs_layout = QtWidgets.QHBoxLayout()
+        self.jobs_layout.addWidget(self.progress_bar)
+        self.jobs_layout.addWidget(self.cancel_jobs)
+        self.jobs_layout.addWidget(self.retry_jobs)
 
         # Add the group box to the central layout
         self.central_layout.addWidget(self.libraries_grp)
         self.central_layout.addWidget(self.assets_grp)
         self.central_layout.addWidget(self.add_missing_textures)
         self.central_layout.addWidget(self.add_displacement_texture)
+        self.central_layout.addWidget(self.shared_materials)
+        self.central_layout.addWidget(self.add_proxy_geometry)
+        self.central_layout.addWidget(self.payload_geometry)
 
         self.central_layout.addWidget(self.save_in_bg)
         self.central_layout.addWidget(self.load_template)
+        self.central_layout.addWidget(self.render_previews)
+        self.central_layout.addLayout(self.jobs_layout)
+        self.central_layout.addWidget(self.progress_label)
 
         self.lib_list.itemSelectionChanged.connect(self.onLibChanged)
-        self.assets_list.itemSelectionChanged.connect(
+        self.assets_list.selectionModel().selectionChanged.connect(
             self.onAssetChanged)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.search_timer.timeout.connect(self.onSearchChanged)
         self.save_in_bg.clicked.connect(self.onSaveInBg)
         self.load_template.clicked.connect(self.onLoadTemplate)
+        self.render_previews.clicked.connect(self.onRenderPreviews)
+        self.assets_model.thumbnailsRendered.connect(self.onPreviewsRendered)
+        self.cancel_jobs.clicked.connect(self.onCancelJobs)
+        self.retry_jobs.clicked.connect(self.onRetryJobs)
 
         # Add Styles:
         script_dir = os.path.dirname(__file__)
@@ -92,69 +142,169 @@ class PublishDialog(QtWidgets.QDialog):
         return selected if selected else None
 
     def selectedAsset(self):
-        items = self.assets_list.selectedItems()
-        for i in range(len(items)):
-            self.selected_assets.append(str(self.assets_list.selectedItems()[i].data(1)))
+        for index in self.assets_list.selectionModel().selectedIndexes():
+            self.selected_assets.append(str(index.data(QtCore.Qt.UserRole)))
         return self.selected_assets if self.selected_assets else None
 
     def onLibChanged(self):
-        self.assets_list.clear()
         lib = self.selectedLibrary()
-        assets_list = sorted(list(self.read[lib].keys()))
         if not lib:
             return
-        for i in assets_list:
-            name = self.read[lib][i]["asset_name"]
+        self.assets_model.setLibrary(lib)
+        self.render_previews.setEnabled(True)
+        self.onAssetChanged()
 
-            item = QtWidgets.QListWidgetItem()
-            item.setText(name)
-            item.setData(1, i)
-            self.assets_list.addItem(item)
+    def onSearchChanged(self):
+        self.assets_model.setFilter(self.search_input.text())
+        self.onAssetChanged()
 
     def onAssetChanged(self):
-        if not self.assets_list.selectedItems():
+        if not self.assets_list.selectionModel().hasSelection():
             self.save_in_bg.setEnabled(False)
             self.load_template.setEnabled(False)
             self.add_missing_textures.setEnabled(False)
             self.add_displacement_texture.setEnabled(False)
+            self.shared_materials.setEnabled(False)
+            self.add_proxy_geometry.setEnabled(False)
+            self.payload_geometry.setEnabled(False)
             return
         self.selected_assets = []
         self.save_in_bg.setEnabled(True)
         self.load_template.setEnabled(True)
         self.add_missing_textures.setEnabled(True)
         self.add_displacement_texture.setEnabled(True)
+        self.shared_materials.setEnabled(True)
+        self.add_proxy_geometry.setEnabled(True)
+        self.payload_geometry.setEnabled(True)
         self.selectedAsset()
 
+    def conversionOptions(self):
+        importer = _importers.registry().get(self.selectedLibrary())
+        return {"import_render": importer.import_render if importer is not None else "mantra",
+                "add_displacement": self.add_displacement_texture.isChecked(),
+                "add_extra_tex": self.add_missing_textures.isChecked(),
+                "shared_materials": self.shared_materials.isChecked(),
+                "proxy_ratios": self.proxy_ratios if self.add_proxy_geometry.isChecked() else [],
+                "payload": self.payload_geometry.isChecked(),
+                # Geometry baked by batch_convert --geometry-cache is used once the cache exists
+                "geometry_cache": os.path.isdir(_geometry_cache.cache_dir(self.project_file))}
+
     def onSaveInBg(self):
-        add_missing_tex = self.add_missing_textures.isChecked()
-        add_displ_tex = self.add_displacement_texture.isChecked()
         lib_tag = self.selectedLibrary()
-        with hou.InterruptableOperation("Performing Tasks", long_operation_name="Assets Name",
-                                        open_interrupt_dialog=True) as op:
-            for i in self.selected_assets:
-                op.updateLongProgress(self.selected_assets.index(i) / float(len(self.selected_assets)),
-                                      "Converting to .usd {}/{}".format(self.selected_assets.index(i) + 1,
-                                                                        len(self.selected_assets)))
-                if lib_tag == "KB":
-                    template1 = _houdini_usd.KBGeometryImport(self.project_file, "mantra", lib_tag, add_displ_tex,
-                                                              add_missing_tex, True)
-                template1.create_main_template(i)
+        if self.queue is not None and self.queue.isRunning():
+            hou.ui.displayMessage("Wait for the current conversion to finish or cancel it")
+            return
+
+        # Only assets whose geometry, textures, schemas or options changed since the last build are converted
+        options = self.conversionOptions()
+        self.build = _build_manifest.IncrementalBuild(self.read, lib_tag, options)
+        stale, skipped = self.build.split(self.selected_assets)
+        if skipped:
+            self.progress_label.setText("{} skipped as unchanged since the last build".format(len(skipped)))
+        if not stale:
+            return
+
+        # Conversions run in hython worker processes so the session stays usable
+        hython = os.path.join(hou.expandString("$HFS"), "bin", "hython")
+        self.queue = _job_queue.ConversionQueue(self.project_file, lib_tag, options, backend="hython",
+                                                interpreter=hython, parent=self)
+        self.queue.progressChanged.connect(self.onJobsProgress)
+        self.queue.jobFinished.connect(self.onJobFinished)
+        self.queue.queueFinished.connect(self.onJobsFinished)
+        self.cancel_jobs.setEnabled(True)
+        self.retry_jobs.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.jobs_started = time.time()
+        self.queue.submit(stale)
+
+    def onJobsProgress(self, finished, total):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(finished)
+        self.progress_bar.setFormat("Converting to .usd {}/{}".format(finished, total))
+
+    def onJobFinished(self, geometry_file):
+        self.build.record(geometry_file, self.queue.jobs[geometry_file].bounds)
+
+    def onJobsFinished(self):
+        self.build.save()
+        counts = self.queue.counts()
+        done = [job for job in self.queue.jobs.values() if job.status == _job_queue.DONE]
+        elapsed = time.time() - self.jobs_started
+        size = sum(job.output_size for job in done)
+        self.progress_label.setText(
+            "{} converted, {} failed, {} cancelled - {:.1f}s, {:.1f} MB, {:.2f} assets/s".format(
+                counts[_job_queue.DONE], counts[_job_queue.FAILED], counts[_job_queue.CANCELLED], elapsed,
+                size / 1048576.0, len(done) / elapsed if elapsed else 0.0))
+        self.cancel_jobs.setEnabled(False)
+        self.retry_jobs.setEnabled(bool(counts[_job_queue.FAILED] or counts[_job_queue.CANCELLED]))
+
+    def onCancelJobs(self):
+        if self.queue is not None:
+            self.queue.cancel()
+
+    def onRetryJobs(self):
+        if self.queue is not None:
+            self.cancel_jobs.setEnabled(True)
+            self.retry_jobs.setEnabled(False)
+            self.jobs_started = time.time()
+            self.queue.retry()
+
+    def onRenderPreviews(self):
+        # Previews of the whole library are rendered in hython workers, only the missing ones
+        lib_tag = self.selectedLibrary()
+        assets = [geometry_file for geometry_file, asset_name in _metadata_store.list_assets(self.read, lib_tag)]
+        hython = os.path.join(hou.expandString("$HFS"), "bin", "hython")
+        self.render_previews.setEnabled(False)
+        self.progress_label.setText("Rendering previews of {} assets".format(len(assets)))
+        self.assets_model.renderThumbnails(assets, workers=max(1, (os.cpu_count() or 2) // 2), interpreter=hython)
+
+    def onPreviewsRendered(self, rendered, failed):
+        self.render_previews.setEnabled(True)
+        self.progress_label.setText("{} previews rendered, {} failed".format(rendered, failed))
 
     def onLoadTemplate(self):
-        add_missing_tex = self.add_missing_textures.isChecked()
-        add_displ_tex = self.add_displacement_texture.isChecked()
         lib_tag = self.selectedLibrary()
+        options = self.conversionOptions()
+        # The importer of the library is only imported the first time one of its assets is loaded
+        try:
+            template1 = _importers.create_importer(self.project_file, lib_tag, options["import_render"],
+                                                   options["add_displacement"], options["add_extra_tex"],
+                                                   execute_rop=True, shared_materials=options["shared_materials"],
+                                                   proxy_ratios=options["proxy_ratios"],
+                                                   payload=options["payload"],
+                                                   geometry_cache=options["geometry_cache"])
+        except ValueError as error:
+            hou.ui.displayMessage(str(error))
+            return
+
+        # Texture directories of the whole selection are listed once, before anything is built
+        missing = template1.check_textures(self.selected_assets)
+        if missing:
+            hou.ui.displayMessage("{} missing textures in {} asset(s)".format(
+                sum(len(textures) for textures in missing.values()), len(missing)),
+                details="\n".join(texture for textures in missing.values() for texture in textures))
+
+        # Only the assets without an up to date .usd are converted, the others are referenced as they are
+        build = _build_manifest.IncrementalBuild(self.read, lib_tag, options)
+        stale, skipped = build.split(self.selected_assets)
+        failed = set()
         with hou.InterruptableOperation("Performing Tasks", long_operation_name="Assets Name",
                                         open_interrupt_dialog=True) as op:
-            for i in self.selected_assets:
-
-                op.updateLongProgress(self.selected_assets.index(i) / float(len(self.selected_assets)),
-                                      "Loading Assets {}/{}".format(self.selected_assets.index(i) + 1,
-                                                                    len(self.selected_assets)))
-                if lib_tag == "KB":
-                    template1 = _houdini_usd.KBGeometryImport(self.project_file, "mantra", lib_tag, add_displ_tex,
-                                                              add_missing_tex)
-                template1.create_main_template(i)
+            for number, geometry_file in enumerate(stale):
+                op.updateLongProgress(number / float(len(stale)),
+                                      "Converting Assets {}/{}".format(number + 1, len(stale)))
+                result = _batch.convert_asset(template1, geometry_file)
+                if result["status"] == "ok":
+                    build.record(geometry_file, result["bounds"])
+                else:
+                    failed.add(geometry_file)
+        build.save()
+        if failed:
+            hou.ui.displayMessage("{} asset(s) could not be converted".format(len(failed)),
+                                  details="\n".join(sorted(failed)))
+
+        template1.create_instance_refs([geometry_file for geometry_file in self.selected_assets
+                                        if geometry_file not in failed])
 
 
 dialog = None
@@ -0,0 +1,98 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from usd_utils import _metadata_store
+
+"""
+    Shared fixtures: a small library on disk and a geometry reader standing in for hou,
+    so every test runs in plain python with usd-core.
+"""
+
+SOURCE_TAG = "KB"
+
+
+def quad(x=0.0):
+    """
+    Returns the partition data of a unit quad with face-varying st.
+    """
+    return {"points": [(x, 0.0, 0.0), (x + 1.0, 0.0, 0.0), (x + 1.0, 1.0, 0.0), (x, 1.0, 0.0)],
+            "face_vertex_counts": [4], "face_vertex_indices": [0, 1, 2, 3],
+            "st": [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]}
+
+
+def grid(size=8):
+    """
+    Returns the partition data of a size x size grid of quads.
+    """
+    points = [(float(x), float(y), 0.0) for y in range(size + 1) for x in range(size + 1)]
+    indices = []
+    for y in range(size):
+        for x in range(size):
+            corner = y * (size + 1) + x
+            indices.extend([corner, corner + 1, corner + size + 2, corner + size + 1])
+    return {"points": points, "face_vertex_counts": [4] * (size * size), "face_vertex_indices": indices, "st": None}
+
+
+class FakeReader:
+    """
+    Geometry reader returning fixed partitions per geometry file and recording what it was asked to read.
+    """
+
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.calls = []
+
+    def __call__(self, geometry_file):
+        self.calls.append(geometry_file)
+        return self.partitions[geometry_file]
+
+
+class Library:
+    """
+    A library written to a temporary folder: geometry files, textures and the metadata JSON describing them.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self.geo_dir = os.path.join(self.root, "geo")
+        self.tex_dir = os.path.join(self.root, "tex")
+        os.makedirs(self.geo_dir)
+        os.makedirs(self.tex_dir)
+        self.json_file = os.path.join(self.root, "assets_metadata.json")
+        self.assets = {}
+
+    def texture(self, name):
+        path = os.path.join(self.tex_dir, name).replace(os.sep, "/")
+        open(path, "w").close()
+        return path
+
+    def add_asset(self, asset_name, materials, extension=".bgeo.sc"):
+        """
+        Adds an asset whose materials map to their texture slots, e.g. {"Metal": {"basecolor_texture": path}}.
+        """
+        geometry_file = os.path.join(self.geo_dir, asset_name + extension).replace(os.sep, "/")
+        with open(geometry_file, "w") as output_file:
+            output_file.write(asset_name)
+        self.assets[geometry_file] = {
+            "asset_name": asset_name,
+            "materials": dict((mat, {"shop_materialpath": "/mat/" + mat, "textures": textures})
+                              for mat, textures in materials.items())}
+        self.save()
+        return geometry_file
+
+    def save(self):
+        with open(self.json_file, "w") as output_file:
+            json.dump({SOURCE_TAG: self.assets}, output_file)
+        _metadata_store.invalidate()
+
+
+@pytest.fixture
+def library(tmp_path):
+    _metadata_store.invalidate()
+    yield Library(tmp_path)
+    _metadata_store.invalidate()
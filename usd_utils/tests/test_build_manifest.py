@@ -0,0 +1,97 @@
+import os
+
+from usd_utils import _asset_paths, _build_manifest, _metadata_store
+
+from tests.conftest import SOURCE_TAG
+
+"""
+    Incremental builds: which assets a build manifest reports as stale, and what it records.
+"""
+
+OPTIONS = {"add_displacement": False, "add_extra_tex": False}
+
+
+def build(library, options=OPTIONS):
+    return _build_manifest.IncrementalBuild(_metadata_store.load_metadata(library.json_file), SOURCE_TAG, options)
+
+
+def built_asset(library, options=OPTIONS):
+    """
+    Adds an asset, writes its output and records it in the manifest, as a successful build does.
+    """
+    texture = library.texture("Metal_basecolor.png")
+    geometry_file = library.add_asset("A", {"Metal": {"basecolor_texture": texture}})
+    incremental = build(library, options)
+    assert incremental.split([geometry_file]) == ([geometry_file], [])
+    output_path = incremental.output_path(geometry_file)
+    os.makedirs(os.path.dirname(output_path))
+    open(output_path, "w").close()
+    incremental.record(geometry_file, bounds=[[0, 0, 0], [1, 1, 1]])
+    incremental.save()
+    return geometry_file, texture
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+
+def test_unchanged_asset_is_skipped(library):
+    geometry_file, texture = built_asset(library)
+    assert build(library).split([geometry_file]) == ([], [geometry_file])
+
+
+def test_bounds_are_recorded(library):
+    geometry_file, texture = built_asset(library)
+    incremental = build(library)
+    assert incremental.manifest(geometry_file).bounds(geometry_file) == [[0, 0, 0], [1, 1, 1]]
+
+
+def test_changed_inputs_make_the_asset_stale(library):
+    geometry_file, texture = built_asset(library)
+    touch(texture)
+    assert build(library).split([geometry_file]) == ([geometry_file], [])
+
+
+def test_changed_geometry_makes_the_asset_stale(library):
+    geometry_file, texture = built_asset(library)
+    touch(geometry_file)
+    assert build(library).split([geometry_file]) == ([geometry_file], [])
+
+
+def test_changed_entry_makes_the_asset_stale(library):
+    geometry_file, texture = built_asset(library)
+    library.assets[geometry_file]["materials"]["Metal"]["shop_materialpath"] = "/mat/Other"
+    library.save()
+    assert build(library).split([geometry_file]) == ([geometry_file], [])
+
+
+def test_changed_options_make_the_asset_stale(library):
+    geometry_file, texture = built_asset(library)
+    assert build(library, dict(OPTIONS, add_displacement=True)).split([geometry_file]) == ([geometry_file], [])
+
+
+def test_new_extra_texture_makes_the_asset_stale(library):
+    options = dict(OPTIONS, add_extra_tex=True)
+    geometry_file, texture = built_asset(library, options)
+    assert build(library, options).split([geometry_file]) == ([], [geometry_file])
+
+    library.texture("Metal_ao.png")
+    assert build(library, options).split([geometry_file]) == ([geometry_file], [])
+
+
+def test_missing_output_makes_the_asset_stale(library):
+    geometry_file, texture = built_asset(library)
+    os.remove(build(library).output_path(geometry_file))
+    assert build(library).split([geometry_file]) == ([geometry_file], [])
+
+
+def test_missing_proxy_layer_makes_the_asset_stale(library):
+    options = dict(OPTIONS, proxy_ratios=[0.5])
+    geometry_file, texture = built_asset(library, options)
+    assert build(library, options).split([geometry_file]) == ([geometry_file], [])
+
+    proxy_layer = _asset_paths.proxy_path(build(library, options).output_path(geometry_file))
+    os.makedirs(os.path.dirname(proxy_layer))
+    open(proxy_layer, "w").close()
+    assert build(library, options).split([geometry_file]) == ([], [geometry_file])
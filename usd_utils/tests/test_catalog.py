@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from usd_utils import _catalog, _metadata_store
+
+"""
+    SQLite asset catalog: round trips of metadata entries and the mapping views used in place of parsed JSON.
+"""
+
+LIBRARY = {
+    "KB": {
+        "/geo/b.bgeo.sc": {"asset_name": "Barrel", "materials": {
+            "Metal": {"shop_materialpath": "/mat/Metal",
+                      "textures": {"basecolor_texture": "/tex/Metal_basecolor.png",
+                                   "rough_texture": "/tex/Metal_rough.png"}},
+            "Empty": {"shop_materialpath": "/mat/Empty", "textures": {}}}},
+        "/geo/a.bgeo.sc": {"asset_name": "Crate_100", "materials": {}}},
+    "MS": {
+        "/geo/c.bgeo.sc": {"asset_name": "Rock", "materials": {}}}}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    json_file = tmp_path / "assets_metadata.json"
+    json_file.write_text(json.dumps(LIBRARY))
+    catalog = _catalog.AssetCatalog(str(tmp_path / "assets_metadata.db"))
+    catalog.import_json(str(json_file))
+    yield catalog
+    catalog.close()
+
+
+def test_entries_round_trip(catalog):
+    assert catalog.libraries() == ["KB", "MS"]
+    for source_tag, library in LIBRARY.items():
+        for geometry_file, entry in library.items():
+            assert catalog.get_asset(source_tag, geometry_file) == entry
+    assert catalog.get_asset("KB", "/geo/missing.bgeo.sc") is None
+
+
+def test_assets_are_sorted_by_geometry_file(catalog):
+    assert catalog.assets("KB") == [("/geo/a.bgeo.sc", "Crate_100"), ("/geo/b.bgeo.sc", "Barrel")]
+    assert catalog.count("KB") == 2
+
+
+def test_search_escapes_wildcards(catalog):
+    assert list(catalog.iter_assets("KB", "crate")) == [("/geo/a.bgeo.sc", "Crate_100")]
+    assert list(catalog.iter_assets("KB", "_1")) == [("/geo/a.bgeo.sc", "Crate_100")]
+    assert list(catalog.iter_assets("KB", "%")) == []
+
+
+def test_add_asset_replaces_the_entry(catalog):
+    revision = catalog.revision()
+    entry = {"asset_name": "Barrel_v2", "materials": {
+        "Wood": {"shop_materialpath": "/mat/Wood", "textures": {"basecolor_texture": "/tex/Wood_basecolor.png"}}}}
+    catalog.add_asset("KB", "/geo/b.bgeo.sc", entry)
+
+    assert catalog.get_asset("KB", "/geo/b.bgeo.sc") == entry
+    assert catalog.count("KB") == 2
+    assert catalog.revision() == revision + 1
+    # Materials and textures of the replaced entry are deleted along with it
+    assert catalog.connection.execute("SELECT COUNT(*) FROM textures").fetchone()[0] == 1
+
+
+def test_views_read_like_the_json_metadata(catalog):
+    view = _catalog.CatalogView(catalog)
+    assert sorted(view) == ["KB", "MS"]
+    assert "XX" not in view
+    library = view["KB"]
+    assert list(library) == ["/geo/a.bgeo.sc", "/geo/b.bgeo.sc"]
+    assert len(library) == 2
+    assert library["/geo/b.bgeo.sc"] == LIBRARY["KB"]["/geo/b.bgeo.sc"]
+    with pytest.raises(KeyError):
+        library["/geo/missing.bgeo.sc"]
+
+
+def test_metadata_store_opens_catalogs(catalog):
+    metadata = _metadata_store.load_metadata(catalog.path)
+    assert _metadata_store.list_assets(metadata, "KB") == catalog.assets("KB")
+    assert list(_metadata_store.iter_assets(metadata, "KB", "barrel")) == [("/geo/b.bgeo.sc", "Barrel")]
@@ -0,0 +1,92 @@
+import pytest
+from pxr import Gf, Usd, UsdGeom, UsdShade
+
+from usd_utils import _batch, _geometry_reader
+
+"""
+    The hou-free geometry reader of the headless writer and the check refusing assets it cannot read.
+"""
+
+OBJ = """v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+v 2 0 0
+v 2 1 0
+vt 0 0
+vt 1 0
+vt 1 1
+vt 0 1
+usemtl Metal
+f 1/1 2/2 3/3 4/4
+usemtl Wood
+f 2/1 5/2 6/3 3/4
+f 2/1 6/3 3/4
+"""
+
+
+def test_read_obj_partitions_by_material(tmp_path):
+    path = tmp_path / "asset.obj"
+    path.write_text(OBJ)
+    partitions = _geometry_reader.read_geometry(str(path))
+
+    assert sorted(partitions) == ["Metal", "Wood"]
+    metal = partitions["Metal"]
+    assert metal["points"] == [(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0), (0.0, 1.0, 0.0)]
+    assert metal["face_vertex_counts"] == [4]
+    assert metal["face_vertex_indices"] == [0, 1, 2, 3]
+    assert metal["st"] == [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]
+    # Points shared by the polygons of a partition are only added once
+    wood = partitions["Wood"]
+    assert len(wood["points"]) == 4
+    assert wood["face_vertex_counts"] == [4, 3]
+    assert wood["face_vertex_indices"] == [0, 1, 2, 3, 0, 2, 3]
+
+
+def write_usd(path):
+    stage = Usd.Stage.CreateNew(path)
+    UsdGeom.Xform.Define(stage, "/root").AddTranslateOp().Set(Gf.Vec3d(0, 5, 0))
+    mesh = UsdGeom.Mesh.Define(stage, "/root/mesh")
+    mesh.CreatePointsAttr([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (2, 0, 0), (2, 1, 0)])
+    mesh.CreateFaceVertexCountsAttr([4, 4])
+    mesh.CreateFaceVertexIndicesAttr([0, 1, 2, 3, 1, 4, 5, 2])
+    metal = UsdShade.Material.Define(stage, "/materials/Metal")
+    wood = UsdShade.Material.Define(stage, "/materials/Wood")
+    UsdShade.MaterialBindingAPI.Apply(mesh.GetPrim()).Bind(metal)
+    subset = UsdShade.MaterialBindingAPI(mesh.GetPrim()).CreateMaterialBindSubset("wood", [1])
+    UsdShade.MaterialBindingAPI.Apply(subset.GetPrim()).Bind(wood)
+    stage.GetRootLayer().Save()
+
+
+def test_read_usd_in_world_space_by_bound_material(tmp_path):
+    path = str(tmp_path / "asset.usda")
+    write_usd(path)
+    partitions = _geometry_reader.read_geometry(path)
+
+    assert sorted(partitions) == ["Metal", "Wood"]
+    assert partitions["Metal"]["points"] == [(0.0, 5.0, 0.0), (1.0, 5.0, 0.0), (1.0, 6.0, 0.0), (0.0, 6.0, 0.0)]
+    assert partitions["Wood"]["points"] == [(1.0, 5.0, 0.0), (2.0, 5.0, 0.0), (2.0, 6.0, 0.0), (1.0, 6.0, 0.0)]
+    assert partitions["Wood"]["st"] is None
+
+
+def test_needs_hou():
+    assert not _geometry_reader.needs_hou("/lib/geo/asset.OBJ")
+    assert not _geometry_reader.needs_hou("/lib/geo/asset.usdc")
+    assert _geometry_reader.needs_hou("/lib/geo/asset.bgeo.sc")
+
+
+def test_read_geometry_without_hou(monkeypatch):
+    monkeypatch.setattr(_geometry_reader, "hou_available", lambda: False)
+    with pytest.raises(ValueError, match="needs Houdini"):
+        _geometry_reader.read_geometry("/lib/geo/asset.bgeo.sc")
+
+
+def test_check_backend(monkeypatch):
+    monkeypatch.setattr(_geometry_reader, "hou_available", lambda: False)
+    assets = ["/lib/geo/a.obj", "/lib/geo/b.bgeo.sc"]
+
+    with pytest.raises(ValueError, match="1 asset"):
+        _batch.check_backend("headless", assets)
+    _batch.check_backend("headless", assets, interpreter="hython")
+    _batch.check_backend("hython", assets)
+    _batch.check_backend("headless", assets[:1])
@@ -0,0 +1,53 @@
+import pytest
+
+from usd_utils import _mesh_decimate
+
+from tests.conftest import grid
+
+"""
+    Proxy mesh reduction: face budgets, valid topology and degenerate inputs.
+"""
+
+
+def decimate(mesh, ratio):
+    return _mesh_decimate.decimate(mesh["points"], mesh["face_vertex_counts"], mesh["face_vertex_indices"], ratio)
+
+
+def assert_valid(points, counts, indices):
+    assert sum(counts) == len(indices)
+    assert all(count >= 3 for count in counts)
+    assert set(indices) == set(range(len(points)))
+    offset = 0
+    for count in counts:
+        assert len(set(indices[offset:offset + count])) == count
+        offset += count
+
+
+@pytest.mark.parametrize("ratio", [0.5, 0.25, 0.1])
+def test_keeps_about_the_ratio_of_the_faces(ratio):
+    mesh = grid(32)
+    points, counts, indices = decimate(mesh, ratio)
+
+    assert_valid(points, counts, indices)
+    assert 0 < len(counts) <= len(mesh["face_vertex_counts"]) * ratio
+    assert len(counts) >= len(mesh["face_vertex_counts"]) * ratio / 4
+    assert len(points) < len(mesh["points"])
+
+
+def test_points_stay_in_the_bounds():
+    mesh = grid(16)
+    points, counts, indices = decimate(mesh, 0.25)
+    for x, y, z in points:
+        assert 0.0 <= x <= 16.0 and 0.0 <= y <= 16.0 and z == 0.0
+
+
+def test_full_ratio_returns_the_mesh_unchanged():
+    mesh = grid(4)
+    assert decimate(mesh, 1.0) == (mesh["points"], mesh["face_vertex_counts"], mesh["face_vertex_indices"])
+
+
+def test_empty_and_tiny_meshes():
+    assert _mesh_decimate.decimate([], [], [], 0.5) == ([], [], [])
+    points, counts, indices = decimate(grid(1), 0.1)
+    assert_valid(points, counts, indices)
+    assert len(counts) <= 1
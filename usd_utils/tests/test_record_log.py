@@ -0,0 +1,78 @@
+import json
+import os
+
+from usd_utils import _metadata_store, _record_log
+
+"""
+    Record log of a JSON metadata snapshot: appends, folding, compaction and recovery from crashes.
+"""
+
+
+def snapshot(tmp_path, data=None):
+    path = str(tmp_path / "assets_metadata.json")
+    with open(path, "w") as output_file:
+        json.dump(data if data is not None else {"KB": {"/geo/a.bgeo.sc": {"asset_name": "a"}}}, output_file)
+    return path
+
+
+def test_fold_applies_records_in_order(tmp_path):
+    json_file = snapshot(tmp_path)
+    record_log = _record_log.RecordLog(json_file)
+    record_log.append("KB", "/geo/a.bgeo.sc", {"asset_name": "a1"})
+    record_log.append("KB", "/geo/b.bgeo.sc", {"asset_name": "b"})
+    record_log.append("KB", "/geo/a.bgeo.sc", {"asset_name": "a2"})
+    record_log.append("MS", "/geo/c.bgeo.sc", {"asset_name": "c"})
+
+    metadata = {"KB": {"/geo/a.bgeo.sc": {"asset_name": "a"}}}
+    view = record_log.fold(metadata)
+    assert view == {"KB": {"/geo/a.bgeo.sc": {"asset_name": "a2"}, "/geo/b.bgeo.sc": {"asset_name": "b"}},
+                    "MS": {"/geo/c.bgeo.sc": {"asset_name": "c"}}}
+    assert metadata == {"KB": {"/geo/a.bgeo.sc": {"asset_name": "a"}}}
+
+
+def test_compact_merges_the_log_into_the_snapshot(tmp_path):
+    json_file = snapshot(tmp_path)
+    record_log = _record_log.RecordLog(json_file)
+    assert not record_log.compact()
+    record_log.append("KB", "/geo/b.bgeo.sc", {"asset_name": "b"})
+
+    assert record_log.compact()
+    assert not record_log.exists()
+    with open(json_file, "r") as read_file:
+        assert json.load(read_file) == {"KB": {"/geo/a.bgeo.sc": {"asset_name": "a"},
+                                               "/geo/b.bgeo.sc": {"asset_name": "b"}}}
+
+
+def test_line_cut_short_by_a_crash_is_skipped(tmp_path):
+    json_file = snapshot(tmp_path)
+    record_log = _record_log.RecordLog(json_file)
+    record_log.append("KB", "/geo/b.bgeo.sc", {"asset_name": "b"})
+    with open(record_log.path, "a") as log_file:
+        log_file.write('{"source_tag": "KB", "geometry_file": "/geo/c')
+    record_log.append("KB", "/geo/d.bgeo.sc", {"asset_name": "d"})
+
+    assert [record["geometry_file"] for record in record_log.records()] == ["/geo/b.bgeo.sc", "/geo/d.bgeo.sc"]
+
+
+def test_interrupted_compaction_is_still_read_and_finished(tmp_path):
+    json_file = snapshot(tmp_path)
+    record_log = _record_log.RecordLog(json_file)
+    record_log.append("KB", "/geo/b.bgeo.sc", {"asset_name": "b"})
+    os.replace(record_log.path, record_log.path + ".compacting")
+    record_log.append("KB", "/geo/b.bgeo.sc", {"asset_name": "b2"})
+
+    assert record_log.fold({})["KB"]["/geo/b.bgeo.sc"] == {"asset_name": "b2"}
+    record_log.compact()
+    assert not os.path.exists(record_log.path + ".compacting")
+    # Records appended during the compaction stay in the new log and still win
+    assert record_log.fold(_metadata_store.load_json(json_file))["KB"]["/geo/b.bgeo.sc"] == {"asset_name": "b2"}
+
+
+def test_load_metadata_folds_the_log(tmp_path):
+    json_file = snapshot(tmp_path)
+    _metadata_store.invalidate()
+    assert list(_metadata_store.load_metadata(json_file)["KB"]) == ["/geo/a.bgeo.sc"]
+
+    _record_log.RecordLog(json_file).append("KB", "/geo/b.bgeo.sc", {"asset_name": "b"})
+    assert sorted(_metadata_store.load_metadata(json_file)["KB"]) == ["/geo/a.bgeo.sc", "/geo/b.bgeo.sc"]
+    _metadata_store.invalidate()
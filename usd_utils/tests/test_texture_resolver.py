@@ -0,0 +1,98 @@
+import os
+
+from usd_utils import _texture_resolver
+
+"""
+    Cached texture directory listings: when the disk is checked again and how extra textures are resolved.
+"""
+
+
+def make_textures(directory, *names):
+    directory.mkdir(exist_ok=True)
+    for name in names:
+        (directory / name).write_text("")
+    return str(directory).replace(os.sep, "/")
+
+
+def count_stats(monkeypatch):
+    """
+    Counts the os.stat calls of the resolver.
+    """
+    calls = []
+    stat = os.stat
+
+    def counted(path, *args, **kwargs):
+        calls.append(path)
+        return stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(_texture_resolver.os, "stat", counted)
+    return calls
+
+
+def test_listings_are_only_checked_again_after_refresh(tmp_path, monkeypatch):
+    directory = make_textures(tmp_path / "tex", "Metal_basecolor.png")
+    resolver = _texture_resolver.TextureResolver()
+    stats = count_stats(monkeypatch)
+
+    assert resolver.missing([directory + "/Metal_basecolor.png", directory + "/Metal_rough.png"]) == [
+        directory + "/Metal_rough.png"]
+    assert resolver.exists(directory + "/Metal_basecolor.png")
+    assert len(stats) == 1
+
+    # New files are not seen until the next refresh, which stats the directory once more
+    make_textures(tmp_path / "tex", "Metal_rough.png")
+    os.utime(directory, ns=(0, os.stat(directory).st_mtime_ns + 1000000000))
+    del stats[:]
+    assert not resolver.exists(directory + "/Metal_rough.png")
+    assert stats == []
+
+    resolver.refresh()
+    assert resolver.exists(directory + "/Metal_rough.png")
+    assert resolver.exists(directory + "/Metal_basecolor.png")
+    assert len(stats) == 1
+
+
+def test_unchanged_directory_is_not_listed_again(tmp_path, monkeypatch):
+    directory = make_textures(tmp_path / "tex", "Metal_basecolor.png")
+    resolver = _texture_resolver.TextureResolver()
+    listing = resolver.listing(directory)
+
+    listed = []
+    listdir = os.listdir
+    monkeypatch.setattr(_texture_resolver.os, "listdir", lambda path: listed.append(path) or listdir(path))
+    resolver.refresh()
+    assert resolver.listing(directory).files is listing.files
+    assert listed == []
+
+
+def test_missing_directory_has_an_empty_listing(tmp_path):
+    resolver = _texture_resolver.TextureResolver()
+    missing = str(tmp_path / "missing").replace(os.sep, "/")
+    assert resolver.missing([missing + "/Metal_basecolor.png"]) == [missing + "/Metal_basecolor.png"]
+
+
+def test_resolve_variant_prefers_the_guessed_name(tmp_path):
+    directory = make_textures(tmp_path / "tex", "Metal_basecolor.png", "Metal_ao.png", "Metal_ao.exr")
+    resolver = _texture_resolver.TextureResolver()
+    assert resolver.resolve_variant(directory + "/Metal_basecolor.png", "ao") == directory + "/Metal_ao.png"
+    assert resolver.resolve_variant(directory + "/Metal_basecolor.png", "height") is None
+
+
+def test_resolve_variant_falls_back_to_texture_extensions_in_order(tmp_path):
+    directory = make_textures(tmp_path / "tex", "Metal_basecolor.png", "Metal_AO.jpg", "Metal_ao.tif", "metal_ao.exr",
+                              "Metal_ao.txt", "Metal_ao.psd")
+    resolver = _texture_resolver.TextureResolver()
+    # No Metal_ao.png: the texture extension listed first in TEXTURE_EXTENSIONS wins, files of other types are ignored
+    assert resolver.resolve_variant(directory + "/Metal_basecolor.png", "ao") == directory + "/metal_ao.exr"
+
+
+def test_resolve_variant_prefers_another_case_of_the_same_extension(tmp_path):
+    directory = make_textures(tmp_path / "tex", "Metal_basecolor.png", "Metal_AO.png", "Metal_ao.exr")
+    resolver = _texture_resolver.TextureResolver()
+    assert resolver.resolve_variant(directory + "/Metal_basecolor.png", "ao") == directory + "/Metal_AO.png"
+
+
+def test_resolve_variant_ignores_other_file_types(tmp_path):
+    directory = make_textures(tmp_path / "tex", "Metal_basecolor.png", "Metal_ao.txt")
+    resolver = _texture_resolver.TextureResolver()
+    assert resolver.resolve_variant(directory + "/Metal_basecolor.png", "ao") is None
@@ -0,0 +1,164 @@
+import os
+
+from pxr import Kind, Sdf, Usd, UsdGeom, UsdShade
+
+from usd_utils import _usd_writer
+
+from tests.conftest import SOURCE_TAG, FakeReader, grid, quad
+
+"""
+    USDWriter driven by a fake geometry reader: prims, material bindings, payloads and proxy variants.
+"""
+
+
+def make_writer(library, reader, **options):
+    options.setdefault("add_displacement", False)
+    return _usd_writer.USDWriter(library.json_file, "mantra", SOURCE_TAG, geometry_reader=reader, **options)
+
+
+def two_materials(library):
+    return library.add_asset("A", {"Metal": {"basecolor_texture": library.texture("Metal_basecolor.png")},
+                                   "Wood": {"basecolor_texture": library.texture("Wood_basecolor.png"),
+                                            "rough_texture": library.texture("Wood_rough.png")}})
+
+
+def bound_material(stage, path):
+    return UsdShade.MaterialBindingAPI(stage.GetPrimAtPath(path)).ComputeBoundMaterial()[0].GetPath()
+
+
+def test_writes_meshes_materials_and_bindings(library):
+    geometry_file = two_materials(library)
+    reader = FakeReader({geometry_file: {"Metal": quad(), "Wood": quad(2.0)}})
+    output_path = make_writer(library, reader).create_main_template(geometry_file)
+
+    assert output_path == os.path.join(library.root, "usd", "A.usd").replace(os.sep, "/")
+    assert reader.calls == [geometry_file]
+    stage = Usd.Stage.Open(output_path)
+    main = stage.GetDefaultPrim()
+    assert main.GetPath() == Sdf.Path("/main")
+    assert Usd.ModelAPI(main).GetKind() == Kind.Tokens.assembly
+
+    metal = UsdGeom.Mesh(stage.GetPrimAtPath("/main/A/A/Metal"))
+    assert metal
+    assert len(metal.GetPointsAttr().Get()) == 4
+    assert list(metal.GetFaceVertexCountsAttr().Get()) == [4]
+    assert UsdGeom.PrimvarsAPI(metal).GetPrimvar("st").GetInterpolation() == UsdGeom.Tokens.faceVarying
+
+    image = stage.GetPrimAtPath("/main/materials/Metal/mtlximage1")
+    assert image.GetAttribute("inputs:file").Get().path == library.tex_dir + "/Metal_basecolor.png"
+    wood_files = sorted(stage.GetPrimAtPath("/main/materials/Wood/" + name).GetAttribute("inputs:file").Get().path
+                        for name in ("mtlximage1", "mtlximage2"))
+    assert wood_files == [library.tex_dir + "/Wood_basecolor.png", library.tex_dir + "/Wood_rough.png"]
+
+    assert bound_material(stage, "/main/A/A/Metal") == Sdf.Path("/main/materials/Metal")
+    assert bound_material(stage, "/main/A/A/Wood") == Sdf.Path("/main/materials/Wood")
+
+
+def test_materials_with_one_layout_are_stamped_from_one_template(library):
+    geometry_file = library.add_asset("A", {
+        "Metal": {"basecolor_texture": library.texture("Metal_basecolor.png")},
+        "Stone": {"basecolor_texture": library.texture("Stone_basecolor.png")}})
+    reader = FakeReader({geometry_file: {"Metal": quad(), "Stone": quad(2.0)}})
+    writer = make_writer(library, reader)
+    stage = Usd.Stage.Open(writer.create_main_template(geometry_file))
+
+    assert len(writer.material_templates) == 1
+    image = stage.GetPrimAtPath("/main/materials/Stone/mtlximage1")
+    assert image.GetAttribute("inputs:file").Get().path == library.tex_dir + "/Stone_basecolor.png"
+    surface = UsdShade.Shader(stage.GetPrimAtPath("/main/materials/Stone/mtlxstandard_surface1"))
+    source = surface.GetInput("base_color").GetConnectedSources()[0][0]
+    assert source.source.GetPath() == image.GetPath()
+
+
+def test_templates_are_kept_per_writer(library):
+    library.texture("Metal_ao.png")
+    geometry_file = library.add_asset("A", {"Metal": {"basecolor_texture": library.texture("Metal_basecolor.png")}})
+    reader = FakeReader({geometry_file: {"Metal": quad()}})
+
+    plain_path = os.path.join(library.root, "usd", "plain.usd")
+    make_writer(library, reader).create_main_template(geometry_file, plain_path)
+    extra_path = os.path.join(library.root, "usd", "extra.usd")
+    make_writer(library, reader, add_extra_tex=True).create_main_template(geometry_file, extra_path)
+
+    plain = Usd.Stage.Open(plain_path)
+    assert not plain.GetPrimAtPath("/main/materials/Metal/mtlximage2")
+    extra = Usd.Stage.Open(extra_path)
+    image = extra.GetPrimAtPath("/main/materials/Metal/mtlximage2")
+    assert image.GetAttribute("inputs:file").Get().path == library.tex_dir + "/Metal_ao.png"
+
+
+def test_payload_holds_the_meshes(library):
+    geometry_file = two_materials(library)
+    reader = FakeReader({geometry_file: {"Metal": quad(), "Wood": quad(2.0)}})
+    output_path = make_writer(library, reader, payload=True).create_main_template(geometry_file)
+
+    layer = Sdf.Layer.FindOrOpen(output_path)
+    # The main layer only binds the meshes of the payload
+    metal = layer.GetPrimAtPath("/main/A/A/Metal")
+    assert metal.specifier == Sdf.SpecifierOver
+    assert "points" not in metal.attributes
+    payloads = layer.GetPrimAtPath("/main/A/A").payloadList.GetAddedOrExplicitItems()
+    assert [payload.assetPath for payload in payloads] == ["./payload/A.usd"]
+
+    stage = Usd.Stage.Open(output_path, Usd.Stage.LoadNone)
+    asset = stage.GetPrimAtPath("/main/A")
+    assert Usd.ModelAPI(asset).GetKind() == Kind.Tokens.component
+    assert list(UsdGeom.ModelAPI(asset).GetExtentsHintAttr().Get()[:2]) == [(0, 0, 0), (3, 1, 0)]
+
+    stage.Load()
+    assert UsdGeom.Mesh(stage.GetPrimAtPath("/main/A/A/Wood"))
+    assert bound_material(stage, "/main/A/A/Wood") == Sdf.Path("/main/materials/Wood")
+
+
+def test_proxy_variants(library):
+    geometry_file = library.add_asset("A", {"Metal": {"basecolor_texture": library.texture("Metal_basecolor.png")}})
+    reader = FakeReader({geometry_file: {"Metal": grid()}})
+    output_path = make_writer(library, reader, proxy_ratios=[0.5, 0.25]).create_main_template(geometry_file)
+
+    stage = Usd.Stage.Open(output_path)
+    render = UsdGeom.Imageable(stage.GetPrimAtPath("/main/A/A"))
+    assert render.GetPurposeAttr().Get() == UsdGeom.Tokens.render
+    proxy = stage.GetPrimAtPath("/main/A/proxy")
+    assert UsdGeom.Imageable(proxy).GetPurposeAttr().Get() == UsdGeom.Tokens.proxy
+    assert render.GetProxyPrimRel().GetTargets() == [proxy.GetPath()]
+    assert bound_material(stage, "/main/A/proxy/Metal") == Sdf.Path("/main/materials/Metal")
+
+    proxy_layer = Usd.Stage.Open(os.path.join(library.root, "usd", "proxy", "A.usd"))
+    variant_set = proxy_layer.GetDefaultPrim().GetVariantSet("lod")
+    assert variant_set.GetVariantNames() == ["lod_25", "lod_50"]
+    assert variant_set.GetVariantSelection() == "lod_50"
+    faces = {}
+    for variant in ("lod_50", "lod_25"):
+        variant_set.SetVariantSelection(variant)
+        faces[variant] = len(UsdGeom.Mesh(proxy_layer.GetPrimAtPath("/proxy/Metal")).GetFaceVertexCountsAttr().Get())
+    assert 64 > faces["lod_50"] > faces["lod_25"] > 0
+
+
+def test_readers_without_partition_attrib_read_the_source_files(library):
+    geometry_file = library.add_asset("A", {"Metal": {"basecolor_texture": library.texture("Metal_basecolor.png")}})
+    reader = FakeReader({geometry_file: {"Metal": quad()}})
+    writer = make_writer(library, reader, geometry_cache=True)
+
+    assert writer.geometry_cache is None
+    writer.create_main_template(geometry_file)
+    assert reader.calls == [geometry_file]
+
+
+def test_shared_materials_are_rewritten_when_their_textures_change(library):
+    geometry_file = library.add_asset("A", {"Metal": {"basecolor_texture": library.texture("Metal_basecolor.png")}})
+    reader = FakeReader({geometry_file: {"Metal": quad()}})
+    output_path = make_writer(library, reader, shared_materials=True).create_main_template(geometry_file)
+
+    stage = Usd.Stage.Open(output_path)
+    assert bound_material(stage, "/main/A/A/Metal") == Sdf.Path("/main/materials/Metal")
+    image = stage.GetPrimAtPath("/main/materials/Metal/mtlximage1")
+    assert image.GetAttribute("inputs:file").Get().path == library.tex_dir + "/Metal_basecolor.png"
+
+    library.assets[geometry_file]["materials"]["Metal"]["textures"]["basecolor_texture"] = library.texture(
+        "Metal_basecolor.exr")
+    library.save()
+    make_writer(library, reader, shared_materials=True).create_main_template(geometry_file)
+
+    materials = Usd.Stage.Open(os.path.join(library.root, "usd", "materials.usd"))
+    image = materials.GetPrimAtPath("/materials/Metal/mtlximage1")
+    assert image.GetAttribute("inputs:file").Get().path == library.tex_dir + "/Metal_basecolor.exr"